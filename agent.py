@@ -1,11 +1,28 @@
 import json
 import os
+import inspect
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 import openai
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from llm_cache import LLMCache, get_default_cache, make_cache_key
+from llm_client import LLMClients, agent_timeout, get_llm_clients
+from llm_scheduler import LLMScheduler, get_scheduler
+from cv_preprocessing import count_tokens
+from skill_matcher import SkillMatcher, SkillMatchResult
+from metrics import AGENT_CALLS, AGENT_SECONDS, record_usage, span
+from response_parsing import (
+    ResponseValidationError,
+    load_json,
+    merge_reask,
+    parse_model,
+    reask_messages,
+    response_format_for,
+    validate,
+)
+
 load_dotenv()
 
 # Configuration
@@ -43,6 +60,11 @@ class GapAnalysis(BaseModel):
     overall_analysis: str
     missing_skills: List[str]
 
+class FusedAnalysis(BaseModel):
+    job_analysis: JobAnalysis
+    profile_analysis: ProfileAnalysis
+    gap_analysis: Optional[GapAnalysis] = None
+
 class CVSection(BaseModel):
     personal: Dict[str, str]
     education: List[Dict[str, str]]
@@ -54,14 +76,220 @@ class CVSection(BaseModel):
 # AGENTS
 # ===============================
 
-class JobAnalyzerAgent:
+MODEL_NAME = "gpt-4-turbo-preview"
+
+def usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+class BaseAgent:
+    """Base commune : client OpenAI synchrone, cache des réponses et appel au modèle"""
+
+    model = MODEL_NAME
+    # Nom partagé par la version sync et async pour qu'elles utilisent les mêmes entrées de cache
+    cache_name = "agent"
+    result_model = None
+    error_message = "Failed to call model"
+    # Pydantic model the reply must follow (defaults to result_model), used for schema-constrained output
+    response_schema = None
+    # Overrides the response_format derived from response_schema when set
+    response_format = None
+    # Request timeout in seconds (LLM_TIMEOUT_<CACHE_NAME> overrides it), None for the client default
+    timeout = None
+    # Completion size reserved in the tokens-per-minute budget before the real usage is known
+    expected_completion_tokens = 1000
+
+    def __init__(
+        self,
+        client=None,
+        cache: Optional[LLMCache] = None,
+        clients: Optional[LLMClients] = None,
+        scheduler: Optional[LLMScheduler] = None
+    ):
+        self.clients = clients or get_llm_clients()
+        self.client = client or self.clients.sync
+        self.cache = cache if cache is not None else get_default_cache()
+        self.scheduler = scheduler or get_scheduler()
+        self.timeout = agent_timeout(self.cache_name, self.timeout)
+
+    def _completion_kwargs(self, messages: List[Dict[str, str]], temperature: float) -> Dict[str, Any]:
+        kwargs = {"model": self.model, "messages": messages, "temperature": temperature}
+        if self.timeout is not None:
+            kwargs["timeout"] = self.timeout
+        response_format = self.response_format or response_format_for(self.model, self.response_schema or self.result_model)
+        if response_format is not None:
+            kwargs["response_format"] = response_format
+        return kwargs
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        return count_tokens("\n".join(message["content"] for message in messages)) + self.expected_completion_tokens
+
+    def _complete(self, messages: List[Dict[str, str]], temperature: float) -> str:
+        kwargs = self._completion_kwargs(messages, temperature)
+        estimated = self._estimate_tokens(messages)
+
+        def attempt():
+            # Every attempt, retries included, counts against the account's rate budget
+            self.scheduler.acquire_sync(estimated)
+            response = self.client.chat.completions.create(**kwargs)
+            self.scheduler.settle(estimated, usage_tokens(response))
+            record_usage(self.cache_name, getattr(response, "usage", None))
+            return response
+
+        response = self.clients.retry.call(attempt)
+        return response.choices[0].message.content
+
+    def _parse_response(self, response_content: str):
+        return parse_model(response_content, self.result_model)
+
+    def _merge_reask(self, error: ResponseValidationError, response_content: str):
+        return merge_reask(error, response_content, self.result_model)
+
+    def _dump_result(self, result) -> Any:
+        return result.model_dump()
+
+    def _load_result(self, data: Any):
+        return self.result_model(**data)
+
+    def _cache_key(self, messages: List[Dict[str, str]], temperature: float) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return make_cache_key(self.cache_name, self.model, messages, temperature)
+
+    def _cache_result(self, data: Any):
+        if data is None:
+            return None
+        print(f"Cache hit for {self.cache_name}")
+        return self._load_result(data)
+
+    def _cache_lookup(self, messages: List[Dict[str, str]], temperature: float):
+        key = self._cache_key(messages, temperature)
+        if key is None:
+            return None, None
+        try:
+            data = self.cache.get(key)
+        except Exception as e:
+            # A cache failure (e.g. "database is locked") is a miss, not a failed request
+            print(f"Cache lookup failed for {self.cache_name}: {e}")
+            return key, None
+        return key, self._cache_result(data)
+
+    def _cache_store(self, key: Optional[str], result) -> None:
+        if self.cache is None or key is None:
+            return
+        try:
+            self.cache.set(key, self.cache_name, self._dump_result(result))
+        except Exception as e:
+            # The model call is already paid for: keep its result even if it cannot be cached
+            print(f"Cache store failed for {self.cache_name}: {e}")
+
+    def _run(self, messages: List[Dict[str, str]], temperature: float):
+        with span("agent", histogram=AGENT_SECONDS, agent=self.cache_name):
+            return self._run_untimed(messages, temperature)
+
+    def _run_untimed(self, messages: List[Dict[str, str]], temperature: float):
+        key, cached = self._cache_lookup(messages, temperature)
+        if cached is not None:
+            AGENT_CALLS.inc(agent=self.cache_name, outcome="cache_hit")
+            return cached
+        try:
+            response_content = self._complete(messages, temperature)
+            try:
+                result = self._parse_response(response_content)
+            except ResponseValidationError as e:
+                # Only the invalid fields are asked again, the rest of the first answer is kept
+                print(f"{self.cache_name}: re-asking for {e.failed_fields}")
+                retry_content = self._complete(reask_messages(messages, response_content, e), temperature)
+                result = self._merge_reask(e, retry_content)
+        except Exception as e:
+            AGENT_CALLS.inc(agent=self.cache_name, outcome="error")
+            print(f"{self.error_message}: {e}")
+            raise Exception(f"{self.error_message}: {e}")
+        AGENT_CALLS.inc(agent=self.cache_name, outcome="model")
+        self._cache_store(key, result)
+        return result
+
+class AsyncAgentMixin:
+    """Remplace le client par openai.AsyncOpenAI pour ne pas bloquer la boucle d'événements"""
+
+    def __init__(
+        self,
+        client=None,
+        cache: Optional[LLMCache] = None,
+        clients: Optional[LLMClients] = None,
+        scheduler: Optional[LLMScheduler] = None
+    ):
+        super().__init__(client, cache, clients, scheduler)
+        self.client = client or self.clients.async_client
+
+    async def _acomplete(self, messages: List[Dict[str, str]], temperature: float) -> str:
+        kwargs = self._completion_kwargs(messages, temperature)
+        estimated = self._estimate_tokens(messages)
+
+        async def attempt():
+            await self.scheduler.acquire(estimated)
+            response = await self.client.chat.completions.create(**kwargs)
+            self.scheduler.settle(estimated, usage_tokens(response))
+            record_usage(self.cache_name, getattr(response, "usage", None))
+            return response
+
+        response = await self.clients.retry.acall(attempt)
+        return response.choices[0].message.content
+
+    async def _arun(self, messages: List[Dict[str, str]], temperature: float):
+        with span("agent", histogram=AGENT_SECONDS, agent=self.cache_name):
+            return await self._arun_untimed(messages, temperature)
+
+    async def _acache_lookup(self, messages: List[Dict[str, str]], temperature: float):
+        """_cache_lookup with the SQLite tier read off the event loop"""
+        key = self._cache_key(messages, temperature)
+        if key is None:
+            return None, None
+        try:
+            data = await self.cache.aget(key)
+        except Exception as e:
+            print(f"Cache lookup failed for {self.cache_name}: {e}")
+            return key, None
+        return key, self._cache_result(data)
+
+    async def _acache_store(self, key: Optional[str], result) -> None:
+        if self.cache is None or key is None:
+            return
+        try:
+            await self.cache.aset(key, self.cache_name, self._dump_result(result))
+        except Exception as e:
+            print(f"Cache store failed for {self.cache_name}: {e}")
+
+    async def _arun_untimed(self, messages: List[Dict[str, str]], temperature: float):
+        key, cached = await self._acache_lookup(messages, temperature)
+        if cached is not None:
+            AGENT_CALLS.inc(agent=self.cache_name, outcome="cache_hit")
+            return cached
+        try:
+            response_content = await self._acomplete(messages, temperature)
+            try:
+                result = self._parse_response(response_content)
+            except ResponseValidationError as e:
+                print(f"{self.cache_name}: re-asking for {e.failed_fields}")
+                retry_content = await self._acomplete(reask_messages(messages, response_content, e), temperature)
+                result = self._merge_reask(e, retry_content)
+        except Exception as e:
+            AGENT_CALLS.inc(agent=self.cache_name, outcome="error")
+            print(f"{self.error_message}: {e}")
+            raise Exception(f"{self.error_message}: {e}")
+        AGENT_CALLS.inc(agent=self.cache_name, outcome="model")
+        await self._acache_store(key, result)
+        return result
+
+class JobAnalyzerAgent(BaseAgent):
     """Agent 1 : Analyse l'offre d'emploi"""
-    
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=openai_api_key)
-        
-    def analyze_job_offer(self, job_text: str) -> JobAnalysis:
-        system_prompt = """
+
+    cache_name = "job_analyzer"
+    timeout = 30
+    result_model = JobAnalysis
+    error_message = "Failed to analyze job offer"
+
+    system_prompt = """
         You are an expert job offer analyzer for tech recruitment. Extract and structure key information from tech job offers.
 
         IMPORTANT: You must respond with ONLY valid JSON, no other text before or after.
@@ -82,44 +310,25 @@ class JobAnalyzerAgent:
             "remote_work_policy": "Unknown"
         }
         """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Analyze this job offer and return JSON only:\n\n{job_text}"}
-                ],
-                temperature=0
-            )
-            
-            response_content = response.choices[0].message.content
-            print(f"DEBUG - Raw API response: {response_content[:500]}...")
-            
-            # Nettoyer la réponse (enlever markdown si présent)
-            if "```json" in response_content:
-                response_content = response_content.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_content:
-                response_content = response_content.split("```")[1].split("```")[0].strip()
-            
-            job_data = json.loads(response_content)
-            return JobAnalysis(**job_data)
-        except json.JSONDecodeError as e:
-            print(f"JSON Decode Error: {e}")
-            print(f"Raw response: {response.choices[0].message.content}")
-            raise Exception(f"Failed to parse job analysis JSON: {e}")
-        except Exception as e:
-            print(f"General error: {e}")
-            raise Exception(f"Failed to analyze job offer: {e}")
 
-class ProfileAnalyzerAgent:
+    def _build_messages(self, job_text: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"Analyze this job offer and return JSON only:\n\n{job_text}"}
+        ]
+
+    def analyze_job_offer(self, job_text: str) -> JobAnalysis:
+        return self._run(self._build_messages(job_text), temperature=0)
+
+class ProfileAnalyzerAgent(BaseAgent):
     """Agent 2 : Analyse le CV contre l'offre"""
-    
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=openai_api_key)
-        
-    def analyze_profile(self, cv_text: str, job_analysis: JobAnalysis) -> ProfileAnalysis:
-        system_prompt = """
+
+    cache_name = "profile_analyzer"
+    timeout = 60
+    result_model = ProfileAnalysis
+    error_message = "Failed to parse profile analysis"
+
+    system_prompt = """
         You are a targeted technical profile analyzer. Analyze CV against job requirements.
         
         IMPORTANT: Respond with ONLY valid JSON, no other text.
@@ -135,7 +344,8 @@ class ProfileAnalyzerAgent:
             "summary": "overall assessment"
         }
         """
-        
+
+    def _build_messages(self, cv_text: str, job_analysis: JobAnalysis) -> List[Dict[str, str]]:
         job_context = f"""
         Job Requirements:
         - Title: {job_analysis.job_title}
@@ -144,46 +354,44 @@ class ProfileAnalyzerAgent:
         - Key responsibilities: {job_analysis.key_responsibilities}
         - Technical domains: {job_analysis.technical_domains}
         """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"{job_context}\n\nCV Content:\n{cv_text}\n\nReturn JSON analysis only."}
-                ],
-                temperature=0
-            )
-            
-            response_content = response.choices[0].message.content
-            
-            # Nettoyer la réponse
-            if "```json" in response_content:
-                response_content = response_content.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_content:
-                response_content = response_content.split("```")[1].split("```")[0].strip()
-                
-            profile_data = json.loads(response_content)
-            return ProfileAnalysis(**profile_data)
-        except Exception as e:
-            print(f"Profile analysis error: {e}")
-            print(f"Raw response: {response.choices[0].message.content}")
-            raise Exception(f"Failed to parse profile analysis: {e}")
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"{job_context}\n\nCV Content:\n{cv_text}\n\nReturn JSON analysis only."}
+        ]
 
-class GapAnalyzerAgent:
+    def analyze_profile(self, cv_text: str, job_analysis: JobAnalysis) -> ProfileAnalysis:
+        return self._run(self._build_messages(cv_text, job_analysis), temperature=0)
+
+class GapAnalyzerAgent(BaseAgent):
     """Agent 3 : Détermine si on a besoin de questions utilisateur"""
-    
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=openai_api_key)
-        
-    def analyze_gaps(self, profile_analysis: ProfileAnalysis, threshold: int = 75) -> tuple[bool, Optional[GapAnalysis]]:
-        """
-        Returns (is_sufficient, gap_analysis)
-        is_sufficient = True si le score est >= threshold
-        
-        IMPROVED: Only show gap analysis when there are significant gaps
+
+    cache_name = "gap_analyzer"
+    timeout = 30
+    expected_completion_tokens = 300
+    error_message = "Gap analysis error"
+    response_schema = GapAnalysis
+
+    system_prompt = """
+        You are a skills gap identifier for CV optimization. 
+
+        Analyze the profile results and identify ONLY truly missing critical skills that would significantly improve the job match.
+
+        IMPORTANT: 
+        - Only suggest 3-5 skills maximum
+        - Focus on skills that are explicitly mentioned in the job requirements but completely absent from the CV
+        - Don't suggest skills the candidate already has some experience with
+        - If there are no significant gaps, return an empty missing_skills array
+
+        Return JSON format:
+        {
+            "overall_analysis": "Brief summary of gaps (1-2 sentences)",
+            "missing_skills": ["only critical missing skills", "max 5 items"]
+        }
         """
-        
+
+    def _precheck(self, profile_analysis: ProfileAnalysis, threshold: int) -> Optional[tuple[bool, Optional[GapAnalysis]]]:
+        """Retourne un résultat sans appel au modèle quand il n'y a pas de vrai gap, sinon None"""
+
         # Higher threshold - only show gaps for lower scores
         score = profile_analysis.relevance_score_overall
         
@@ -208,26 +416,26 @@ class GapAnalyzerAgent:
         if len(significant_gaps) == 0 and score >= 65:
             print(f"No significant gaps found and score {score}% is reasonable, skipping gap analysis")
             return True, None
-        
-        # Generate gap analysis only when there are real gaps
-        system_prompt = """
-        You are a skills gap identifier for CV optimization. 
 
-        Analyze the profile results and identify ONLY truly missing critical skills that would significantly improve the job match.
+        return None
 
-        IMPORTANT: 
-        - Only suggest 3-5 skills maximum
-        - Focus on skills that are explicitly mentioned in the job requirements but completely absent from the CV
-        - Don't suggest skills the candidate already has some experience with
-        - If there are no significant gaps, return an empty missing_skills array
+    def _local_decision(self, skill_match: Optional[SkillMatchResult]) -> Optional[tuple[bool, Optional[GapAnalysis]]]:
+        """Décide sans appel au modèle quand chaque compétence requise est clairement présente ou absente"""
+        if skill_match is None or not skill_match.required_decided:
+            return None
 
-        Return JSON format:
-        {
-            "overall_analysis": "Brief summary of gaps (1-2 sentences)",
-            "missing_skills": ["only critical missing skills", "max 5 items"]
-        }
-        """
-        
+        if skill_match.all_required_present:
+            print("All must-have skills found in the CV, skipping gap analysis")
+            return True, None
+
+        missing_skills = skill_match.must_have_absent[:5]
+        print(f"Must-have skills missing from the CV (local match): {missing_skills}")
+        return False, GapAnalysis(
+            overall_analysis=f"{len(skill_match.must_have_absent)} required skill(s) from the job offer do not appear in the CV.",
+            missing_skills=missing_skills
+        )
+
+    def _build_messages(self, profile_analysis: ProfileAnalysis) -> List[Dict[str, str]]:
         context = f"""
         Profile Analysis Results:
         - Overall Score: {profile_analysis.relevance_score_overall}%
@@ -238,65 +446,86 @@ class GapAnalyzerAgent:
         Only identify truly missing critical skills that would make a significant difference.
         If the candidate already shows good alignment, return empty missing_skills array.
         """
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": context}
+        ]
+
+    def _parse_response(self, response_content: str) -> tuple[bool, Optional[GapAnalysis]]:
+        return self._gap_result(load_json(response_content))
+
+    def _merge_reask(self, error: ResponseValidationError, response_content: str) -> tuple[bool, Optional[GapAnalysis]]:
+        return self._gap_result(merge_reask(error, response_content, GapAnalysis).model_dump())
+
+    def _gap_result(self, gap_data: Dict[str, Any]) -> tuple[bool, Optional[GapAnalysis]]:
+        # If no missing skills identified, don't show gap analysis
+        missing_skills = gap_data.get("missing_skills", [])
+        if not missing_skills or len(missing_skills) == 0:
+            print("No critical missing skills identified by AI")
+            return True, None
+        
+        # Filter out empty or very short skill names
+        valid_missing_skills = [skill.strip() for skill in missing_skills if skill.strip() and len(skill.strip()) > 2]
+        
+        if len(valid_missing_skills) == 0:
+            print("No valid missing skills after filtering")
+            return True, None
         
+        gap_data["missing_skills"] = valid_missing_skills
+        print(f"Found {len(valid_missing_skills)} missing skills: {valid_missing_skills}")
+        
+        return False, validate(gap_data, GapAnalysis)
+
+    def _dump_result(self, result: tuple[bool, Optional[GapAnalysis]]) -> Any:
+        is_sufficient, gap_analysis = result
+        return {
+            "is_sufficient": is_sufficient,
+            "gap_analysis": gap_analysis.model_dump() if gap_analysis else None
+        }
+
+    def _load_result(self, data: Any) -> tuple[bool, Optional[GapAnalysis]]:
+        gap_analysis = GapAnalysis(**data["gap_analysis"]) if data["gap_analysis"] else None
+        return data["is_sufficient"], gap_analysis
+
+    def analyze_gaps(
+        self,
+        profile_analysis: ProfileAnalysis,
+        threshold: int = 75,
+        skill_match: Optional[SkillMatchResult] = None
+    ) -> tuple[bool, Optional[GapAnalysis]]:
+        """
+        Returns (is_sufficient, gap_analysis)
+        is_sufficient = True si le score est >= threshold
+        
+        IMPROVED: Only show gap analysis when there are significant gaps
+        skill_match: résultat du matcher local ; s'il tranche, le modèle n'est pas appelé
+        """
+        precheck = self._precheck(profile_analysis, threshold)
+        if precheck is not None:
+            return precheck
+
+        local_decision = self._local_decision(skill_match)
+        if local_decision is not None:
+            return local_decision
+        
+        # Generate gap analysis only when there are real gaps
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": context}
-                ],
-                temperature=0.2
-            )
-            
-            response_content = response.choices[0].message.content
-            
-            # Clean the response
-            if "```json" in response_content:
-                response_content = response_content.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_content:
-                response_content = response_content.split("```")[1].split("```")[0].strip()
-            
-            gap_data = json.loads(response_content)
-            
-            # If no missing skills identified, don't show gap analysis
-            missing_skills = gap_data.get("missing_skills", [])
-            if not missing_skills or len(missing_skills) == 0:
-                print("No critical missing skills identified by AI")
-                return True, None
-            
-            # Filter out empty or very short skill names
-            valid_missing_skills = [skill.strip() for skill in missing_skills if skill.strip() and len(skill.strip()) > 2]
-            
-            if len(valid_missing_skills) == 0:
-                print("No valid missing skills after filtering")
-                return True, None
-            
-            gap_data["missing_skills"] = valid_missing_skills
-            print(f"Found {len(valid_missing_skills)} missing skills: {valid_missing_skills}")
-            
-            return False, GapAnalysis(**gap_data)
-            
+            return self._run(self._build_messages(profile_analysis), temperature=0.2)
         except Exception as e:
             print(f"Gap analysis error: {e}")
             # If error in analysis, assume profile is sufficient
             return True, None
 
-class CVGeneratorAgent:
+class CVGeneratorAgent(BaseAgent):
     """Agent Final : Génère le CV optimisé"""
-    
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=openai_api_key)
-        
-    def generate_cv_sections(
-        self, 
-        job_analysis: JobAnalysis, 
-        profile_analysis: ProfileAnalysis,
-        user_confirmed_skills: Optional[List[str]] = None,
-        requested_sections: List[str] = None
-    ) -> CVSection:
-        
-        system_prompt = """
+
+    cache_name = "cv_generator"
+    timeout = 90
+    expected_completion_tokens = 1500
+    result_model = CVSection
+    error_message = "Failed to parse CV sections"
+
+    system_prompt = """
         You are a CV section generator. Generate optimized CV data tailored to job requirements.
         
         IMPORTANT: Respond with ONLY valid JSON matching this exact template structure:
@@ -341,7 +570,13 @@ class CVGeneratorAgent:
         - Rewrite experience summaries to highlight relevant achievements
         - Keep the exact JSON structure shown above
         """
-        
+
+    def _build_messages(
+        self,
+        job_analysis: JobAnalysis,
+        profile_analysis: ProfileAnalysis,
+        user_confirmed_skills: Optional[List[str]] = None
+    ) -> List[Dict[str, str]]:
         context = f"""
         Job Analysis:
         Target Role: {job_analysis.job_title}
@@ -360,35 +595,137 @@ class CVGeneratorAgent:
         
         Generate optimized CV data that maximizes relevance to this job offer.
         """
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"{context}\n\nGenerate the optimized CV JSON:"}
+        ]
+
+    def generate_cv_sections(
+        self, 
+        job_analysis: JobAnalysis, 
+        profile_analysis: ProfileAnalysis,
+        user_confirmed_skills: Optional[List[str]] = None,
+        requested_sections: List[str] = None
+    ) -> CVSection:
+        messages = self._build_messages(job_analysis, profile_analysis, user_confirmed_skills)
+        return self._run(messages, temperature=0.1)
+
+class FusedAnalyzerAgent(BaseAgent):
+    """Agents 1 à 3 en un seul appel : offre, profil et gaps dans une même réponse JSON"""
+
+    cache_name = "fused_analyzer"
+    timeout = 120
+    expected_completion_tokens = 2000
+    result_model = FusedAnalysis
+    error_message = "Failed to run fused analysis"
+
+    system_prompt = """
+        You are an expert tech recruiter. In ONE pass:
+        1. Extract the key information of the job offer.
+        2. Analyze the CV against those job requirements.
+        3. Identify ONLY truly missing critical skills (3-5 maximum) that are explicitly required
+           by the job but completely absent from the CV. Set gap_analysis to null if the
+           relevance score is 75 or more, or if there are no significant gaps.
+
+        IMPORTANT: Respond with ONLY valid JSON matching this exact schema:
+        {
+            "job_analysis": {
+                "job_title": "string",
+                "must_have_skills": ["array of strings"],
+                "nice_to_have_skills": ["array of strings"],
+                "company_type": "Unknown",
+                "work_environment": ["array of strings"],
+                "ats_keywords": ["array of critical keywords"],
+                "tone_of_voice": "string description",
+                "key_responsibilities": ["array of main duties"],
+                "company_culture_indicators": ["array of culture signals"],
+                "technical_domains": ["array like Frontend, Backend, DevOps, etc."],
+                "urgency_level": "Normal",
+                "remote_work_policy": "Unknown"
+            },
+            "profile_analysis": {
+                "candidate_name": "string",
+                "relevance_score_overall": 50,
+                "skills_match": {"Python": 7, "Docker": 5},
+                "experience_relevance": [{"role": "string", "company": "string", "period": "string", "relevance_score": 50, "relevance_notes": "string"}],
+                "skills_gaps": ["missing skills"],
+                "recommendations": ["improvement suggestions"],
+                "summary": "overall assessment"
+            },
+            "gap_analysis": {
+                "overall_analysis": "Brief summary of gaps (1-2 sentences)",
+                "missing_skills": ["only critical missing skills", "max 5 items"]
+            }
+        }
+        """
+
+    def _build_messages(self, cv_text: str, job_text: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"Job offer:\n{job_text}\n\nCV Content:\n{cv_text}\n\nReturn JSON analysis only."}
+        ]
+
+    def analyze(self, cv_text: str, job_text: str) -> FusedAnalysis:
+        return self._run(self._build_messages(cv_text, job_text), temperature=0)
+
+# ===============================
+# AGENTS ASYNCHRONES
+# ===============================
+
+class AsyncJobAnalyzerAgent(AsyncAgentMixin, JobAnalyzerAgent):
+    """Agent 1 (async) : même prompt et parsing, appel via openai.AsyncOpenAI"""
+
+    async def analyze_job_offer(self, job_text: str) -> JobAnalysis:
+        return await self._arun(self._build_messages(job_text), temperature=0)
+
+class AsyncProfileAnalyzerAgent(AsyncAgentMixin, ProfileAnalyzerAgent):
+    """Agent 2 (async)"""
+
+    async def analyze_profile(self, cv_text: str, job_analysis: JobAnalysis) -> ProfileAnalysis:
+        return await self._arun(self._build_messages(cv_text, job_analysis), temperature=0)
+
+class AsyncGapAnalyzerAgent(AsyncAgentMixin, GapAnalyzerAgent):
+    """Agent 3 (async)"""
+
+    async def analyze_gaps(
+        self,
+        profile_analysis: ProfileAnalysis,
+        threshold: int = 75,
+        skill_match: Optional[SkillMatchResult] = None
+    ) -> tuple[bool, Optional[GapAnalysis]]:
+        precheck = self._precheck(profile_analysis, threshold)
+        if precheck is not None:
+            return precheck
+
+        local_decision = self._local_decision(skill_match)
+        if local_decision is not None:
+            return local_decision
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4-turbo-preview",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"{context}\n\nGenerate the optimized CV JSON:"}
-                ],
-                temperature=0.1
-            )
-            
-            response_content = response.choices[0].message.content
-            print(f"Raw response: {response_content[:200]}...")
-            
-            # Nettoyer la réponse (enlever markdown si présent)
-            if "```json" in response_content:
-                response_content = response_content.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_content:
-                response_content = response_content.split("```")[1].split("```")[0].strip()
-            
-            cv_data = json.loads(response_content)
-            return CVSection(**cv_data)
-        except json.JSONDecodeError as e:
-            print(f"JSON Decode Error: {e}")
-            print(f"Full raw response: {response.choices[0].message.content}")
-            raise Exception(f"Failed to parse CV sections JSON: {e}")
+            return await self._arun(self._build_messages(profile_analysis), temperature=0.2)
         except Exception as e:
-            print(f"CV generation error: {e}")
-            raise Exception(f"Failed to parse CV sections: {e}")
+            print(f"Gap analysis error: {e}")
+            # If error in analysis, assume profile is sufficient
+            return True, None
+
+class AsyncCVGeneratorAgent(AsyncAgentMixin, CVGeneratorAgent):
+    """Agent Final (async)"""
+
+    async def generate_cv_sections(
+        self, 
+        job_analysis: JobAnalysis, 
+        profile_analysis: ProfileAnalysis,
+        user_confirmed_skills: Optional[List[str]] = None,
+        requested_sections: List[str] = None
+    ) -> CVSection:
+        messages = self._build_messages(job_analysis, profile_analysis, user_confirmed_skills)
+        return await self._arun(messages, temperature=0.1)
+
+class AsyncFusedAnalyzerAgent(AsyncAgentMixin, FusedAnalyzerAgent):
+    """Analyse fusionnée (async)"""
+
+    async def analyze(self, cv_text: str, job_text: str) -> FusedAnalysis:
+        return await self._arun(self._build_messages(cv_text, job_text), temperature=0)
 
 # ===============================
 # ORCHESTRATEUR PRINCIPAL
@@ -397,11 +734,28 @@ class CVGeneratorAgent:
 class CVOptimizer:
     """Orchestrateur principal qui coordonne tous les agents"""
     
-    def __init__(self):
-        self.job_analyzer = JobAnalyzerAgent()
-        self.profile_analyzer = ProfileAnalyzerAgent()
-        self.gap_analyzer = GapAnalyzerAgent()
-        self.cv_generator = CVGeneratorAgent()
+    def __init__(self, clients: Optional[LLMClients] = None, scheduler: Optional[LLMScheduler] = None):
+        # Un seul pool de connexions, une seule politique de retry et un seul budget de débit pour tous les agents
+        self.clients = clients or get_llm_clients()
+        self.scheduler = scheduler or get_scheduler()
+
+        self.job_analyzer = JobAnalyzerAgent(clients=self.clients, scheduler=self.scheduler)
+        self.profile_analyzer = ProfileAnalyzerAgent(clients=self.clients, scheduler=self.scheduler)
+        self.gap_analyzer = GapAnalyzerAgent(clients=self.clients, scheduler=self.scheduler)
+        self.cv_generator = CVGeneratorAgent(clients=self.clients, scheduler=self.scheduler)
+
+        # Variantes async utilisées par l'API FastAPI
+        self.async_job_analyzer = AsyncJobAnalyzerAgent(clients=self.clients, scheduler=self.scheduler)
+        self.async_profile_analyzer = AsyncProfileAnalyzerAgent(clients=self.clients, scheduler=self.scheduler)
+        self.async_gap_analyzer = AsyncGapAnalyzerAgent(clients=self.clients, scheduler=self.scheduler)
+        self.async_cv_generator = AsyncCVGeneratorAgent(clients=self.clients, scheduler=self.scheduler)
+        self.async_fused_analyzer = AsyncFusedAnalyzerAgent(clients=self.clients, scheduler=self.scheduler)
+
+        # Index local des compétences, construit une seule fois
+        self.skill_matcher = SkillMatcher()
+
+    def match_skills(self, cv_text: str, job_analysis: JobAnalysis) -> SkillMatchResult:
+        return self.skill_matcher.match(cv_text, job_analysis.must_have_skills, job_analysis.nice_to_have_skills)
         
     def optimize_cv(
         self, 
@@ -426,7 +780,8 @@ class CVOptimizer:
         print(f"📊 Initial relevance score: {profile_analysis.relevance_score_overall}%")
         
         print("🎯 Checking if additional input needed...")
-        is_sufficient, gap_analysis = self.gap_analyzer.analyze_gaps(profile_analysis)
+        skill_match = self.match_skills(cv_text, job_analysis)
+        is_sufficient, gap_analysis = self.gap_analyzer.analyze_gaps(profile_analysis, skill_match=skill_match)
         
         user_confirmed_skills = None
         
@@ -458,6 +813,113 @@ class CVOptimizer:
             "success": True
         }
 
+    # Méthodes awaitables : les appels au modèle ne bloquent pas la boucle d'événements
+
+    async def analyze_job_offer(self, job_offer_text: str) -> JobAnalysis:
+        return await self.async_job_analyzer.analyze_job_offer(job_offer_text)
+
+    async def analyze_profile(self, cv_text: str, job_analysis: JobAnalysis) -> ProfileAnalysis:
+        return await self.async_profile_analyzer.analyze_profile(cv_text, job_analysis)
+
+    async def analyze_gaps(
+        self,
+        profile_analysis: ProfileAnalysis,
+        cv_text: Optional[str] = None,
+        job_analysis: Optional[JobAnalysis] = None,
+        match_text: Optional[str] = None
+    ) -> tuple[bool, Optional[GapAnalysis]]:
+        """match_text : texte complet du CV pour le matcher local, si cv_text a été tronqué pour les prompts"""
+        skill_match = None
+        if cv_text is not None and job_analysis is not None:
+            skill_match = self.match_skills(match_text or cv_text, job_analysis)
+        return await self.async_gap_analyzer.analyze_gaps(profile_analysis, skill_match=skill_match)
+
+    async def analyze_fused(
+        self,
+        job_offer_text: str,
+        cv_text: str,
+        threshold: int = 75,
+        match_text: Optional[str] = None
+    ) -> tuple[JobAnalysis, ProfileAnalysis, bool, Optional[GapAnalysis]]:
+        """
+        Mode fusionné : offre, profil et gaps en un seul appel au modèle
+        Les règles de l'agent de gaps (seuil, matcher local, filtrage) s'appliquent au résultat
+        match_text : texte complet du CV pour le matcher local, si cv_text a été tronqué
+        """
+        fused = await self.async_fused_analyzer.analyze(cv_text, job_offer_text)
+        gap_rules = self.async_gap_analyzer
+
+        decision = gap_rules._precheck(fused.profile_analysis, threshold)
+        if decision is None:
+            decision = gap_rules._local_decision(self.match_skills(match_text or cv_text, fused.job_analysis))
+        if decision is None:
+            if fused.gap_analysis is None:
+                decision = True, None
+            else:
+                decision = gap_rules._gap_result(fused.gap_analysis.model_dump())
+
+        is_sufficient, gap_analysis = decision
+        return fused.job_analysis, fused.profile_analysis, is_sufficient, gap_analysis
+
+    async def generate_cv_sections(
+        self,
+        job_analysis: JobAnalysis,
+        profile_analysis: ProfileAnalysis,
+        user_confirmed_skills: Optional[List[str]] = None,
+        requested_sections: List[str] = None
+    ) -> CVSection:
+        return await self.async_cv_generator.generate_cv_sections(
+            job_analysis,
+            profile_analysis,
+            user_confirmed_skills,
+            requested_sections
+        )
+
+    async def optimize_cv_async(
+        self, 
+        job_offer_text: str, 
+        cv_text: str,
+        user_callback=None,
+        requested_sections: List[str] = None,
+        fused: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Version async de optimize_cv
+        
+        user_callback peut être une fonction classique ou une coroutine
+        fused=True remplace les trois analyses par un seul appel (analyze_fused)
+        """
+        
+        if fused:
+            job_analysis, profile_analysis, is_sufficient, gap_analysis = await self.analyze_fused(job_offer_text, cv_text)
+        else:
+            job_analysis = await self.analyze_job_offer(job_offer_text)
+            profile_analysis = await self.analyze_profile(cv_text, job_analysis)
+            is_sufficient, gap_analysis = await self.analyze_gaps(profile_analysis, cv_text, job_analysis)
+        
+        user_confirmed_skills = None
+        
+        if not is_sufficient and gap_analysis and user_callback:
+            user_confirmed_skills = user_callback(gap_analysis)
+            if inspect.isawaitable(user_confirmed_skills):
+                user_confirmed_skills = await user_confirmed_skills
+        
+        cv_sections = await self.generate_cv_sections(
+            job_analysis,
+            profile_analysis, 
+            user_confirmed_skills,
+            requested_sections
+        )
+        
+        return {
+            "job_analysis": job_analysis,
+            "profile_analysis": profile_analysis,
+            "gap_analysis": gap_analysis,
+            "user_confirmed_skills": user_confirmed_skills,
+            "cv_sections": cv_sections,
+            "success": True
+        }
+
 # ===============================
 # EXEMPLE D'UTILISATION
 # ===============================
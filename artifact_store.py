@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# CACHE DES PDF GÉNÉRÉS
+# ===============================
+#
+# Les PDF sont adressés par hash(données du CV, template, contenu du .docx)
+# et gardés sur disque dans un LRU borné en taille (l'mtime sert d'horodatage
+# de dernier accès). Plusieurs workers du même nœud peuvent partager le dossier.
+
+DEFAULT_ARTIFACT_DIR = ".cache/artifacts"
+
+
+
+class ArtifactTooLarge(ValueError):
+    """A single artifact is larger than the whole store: it would be evicted as soon as stored"""
+
+
+_file_digests: Dict[str, tuple] = {}
+_file_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file, recomputed only when its mtime or size changes"""
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _file_digests_lock:
+        cached = _file_digests.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    digest = hashlib.sha256(Path(key).read_bytes()).hexdigest()
+    with _file_digests_lock:
+        _file_digests[key] = (signature, digest)
+    return digest
+
+
+def make_artifact_key(cv_data: Dict[str, Any], template_id: str, template_path: str) -> str:
+    payload = json.dumps(
+        [cv_data, template_id, file_digest(template_path)],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """Size-bounded LRU of rendered PDFs on disk"""
+
+    def __init__(self, directory: str = DEFAULT_ARTIFACT_DIR, max_bytes: int = 512 * 1024 * 1024, suffix: str = ".pdf"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        try:
+            # Refresh mtime so the entry counts as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put_file(self, key: str, source_path: str) -> Path:
+        """Move an existing file into the store"""
+        self._check_size(os.path.getsize(source_path))
+        path = self.path_for(key)
+        shutil.move(source_path, path)
+        self._after_store()
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> Path:
+        self._check_size(len(data))
+        path = self.path_for(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._after_store()
+        return path
+
+    def _check_size(self, size: int) -> None:
+        if size > self.max_bytes:
+            raise ArtifactTooLarge(f"artifact of {size} bytes exceeds the store limit of {self.max_bytes} bytes")
+
+    def _after_store(self) -> None:
+        with self._lock:
+            self.stores += 1
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+            logger.info(f"Evicted cached artifact {path.name}")
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+            }
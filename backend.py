@@ -1,17 +1,19 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, Union
+import io
 import json
 import os
 import uuid
+import zipfile
 import asyncio
+import hashlib
 from pathlib import Path
-import PyPDF2
-import io
 import traceback
 import logging
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -19,6 +21,25 @@ logger = logging.getLogger(__name__)
 
 # Import your agent classes
 from agent import CVOptimizer, JobAnalysis, ProfileAnalysis, GapAnalysis, CVSection
+from llm_cache import get_default_cache
+from response_parsing import parse_stats
+from llm_scheduler import BULK, priority
+from cv_rendering import TEMPLATES, DEFAULT_TEMPLATE
+from artifact_store import ArtifactStore, ArtifactTooLarge, file_digest, make_artifact_key
+from session_store import StoreValueTooLarge, create_store
+from pdf_text import PdfTextExtractor, PdfExtractionError, ExtractionResult
+from cv_preprocessing import create_preprocessor
+from render_queue import RenderQueue, RenderQueueFull, DONE, FAILED
+from metrics import HTTP_REQUEST_SECONDS, Trace, current_trace, render_prometheus, span
+from cv_preview import (
+    DEFAULT_PREVIEW_SIZE,
+    PREVIEW_SIZES,
+    PreviewUnavailable,
+    etag_matches,
+    preview_key,
+    rasterize_first_page,
+    resolve_static_previews,
+)
 
 app = FastAPI(title="CV Optimizer API", version="1.0.0")
 
@@ -29,16 +50,106 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace", "Server-Timing"],
 )
 
-# In-memory storage (replace with database in production)
-sessions = {}
-uploaded_files = {}
+# Per-request JSON trace (spans + token usage) in the X-Trace response header:
+# on demand with an "X-Trace: 1" header or ?trace=1, or on every response with TRACE_RESPONSES=1
+TRACE_RESPONSES = os.getenv("TRACE_RESPONSES", "0") == "1"
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """Record request latency by route template and attach the trace when asked for"""
+    trace = None
+    if TRACE_RESPONSES or request.headers.get("x-trace") == "1" or request.query_params.get("trace") == "1":
+        trace = Trace()
+    token = current_trace.set(trace)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        current_trace.reset(token)
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            # The route template, not the raw path, so ids do not multiply the series
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+    if trace is not None:
+        # Streamed responses only carry the spans finished before the headers were sent
+        response.headers["X-Trace"] = json.dumps(trace.to_dict(), separators=(",", ":"))
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
+# Raw uploaded PDFs are not needed after text extraction: "drop" (default), "spill" to disk or "keep" in memory
+UPLOAD_RAW_PDF = os.getenv("UPLOAD_RAW_PDF", "drop")
+UPLOAD_SPILL_DIR = Path(os.getenv("UPLOAD_SPILL_DIR", ".cache/uploads"))
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def remove_spilled_pdf(content_hash: str, cv_content: Dict[str, Any]):
+    """Delete the spilled PDF of a CV content entry evicted from the store"""
+    content_path = cv_content.get("content_path")
+    if content_path:
+        try:
+            os.remove(content_path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to clean up {content_path}: {e}")
+
+# Session storage, bounded by idle TTL and bytes (LRU eviction).
+# SESSION_BACKEND=sqlite shares it between uvicorn workers on one node.
+sessions = create_store(
+    "sessions",
+    max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "7200"))
+)
+uploaded_files = create_store(
+    "uploaded_files",
+    max_bytes=int(os.getenv("UPLOAD_STORE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("UPLOAD_TTL_SECONDS", "7200"))
+)
+# Extracted text (and raw PDF, if kept) per distinct file content, shared by every cv_id uploading it
+cv_contents = create_store(
+    "cv_contents",
+    max_bytes=int(os.getenv("CV_CONTENT_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("UPLOAD_TTL_SECONDS", "7200")),
+    on_evict=remove_spilled_pdf
+)
+upload_dedup_stats = {"hits": 0, "misses": 0}
+
+def get_cv_content(cv_id: str) -> Optional[Dict[str, Any]]:
+    """Content entry of an uploaded CV, or None if the upload (or its content) has expired"""
+    upload = uploaded_files.get(cv_id)
+    if upload is None:
+        return None
+    return cv_contents.get(upload["content_hash"])
+
+def get_cv_text(cv_id: str) -> Optional[str]:
+    """Preprocessed text of an uploaded CV, as sent to the agents"""
+    cv_content = get_cv_content(cv_id)
+    if cv_content is None:
+        return None
+    return cv_content.get("prepared_text", cv_content["text"])
+
+def get_cv_full_text(cv_id: str) -> Optional[str]:
+    """Full extracted text of an uploaded CV, for the local skill matcher"""
+    cv_content = get_cv_content(cv_id)
+    if cv_content is None:
+        return None
+    return cv_content["text"]
 
 # Pydantic models for API
 class JobDescriptionRequest(BaseModel):
     cv_id: str
     job_description: str
+    # "staged": three model calls (job, profile, gaps); "fused": one call for all three
+    mode: Optional[Literal["staged", "fused"]] = None
 
 class UserAnswersRequest(BaseModel):
     analysis_id: str
@@ -48,114 +159,118 @@ class TemplateRequest(BaseModel):
     analysis_id: str
     template_id: str
 
+class TemplateBundleRequest(BaseModel):
+    analysis_id: str
+    # Defaults to every registered template
+    template_ids: Optional[List[str]] = None
+    # "handles": 202 with one download handle per template; "zip": wait and return all PDFs in one zip
+    format: Literal["handles", "zip"] = "handles"
+
+class BatchAnalyzeRequest(BaseModel):
+    cv_id: str
+    job_descriptions: List[str]
+
 # Initialize CV Optimizer
+# Its LLM rate budget (LLM_RPM, LLM_TPM) is enforced per process: when running several
+# workers, start uvicorn with WEB_CONCURRENCY=N rather than --workers N so each worker
+# takes 1/N of the account limits; with --workers alone the effective budget is N times the limit
 optimizer = CVOptimizer()
 
+# Rendered PDFs, content-addressed by CV data + template
+artifact_store = ArtifactStore(
+    directory=os.getenv("ARTIFACT_CACHE_DIR", ".cache/artifacts"),
+    max_bytes=int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+)
+
+# First-page PNG previews of rendered CVs, keyed by the PDF's artifact key (CV data + template) + size
+preview_store = ArtifactStore(
+    directory=os.getenv("PREVIEW_CACHE_DIR", ".cache/previews"),
+    max_bytes=int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    suffix=".png"
+)
+# Concurrent requests for the same preview share one rasterization
+preview_tasks: Dict[str, asyncio.Future] = {}
+
+# Sample template images, located once at startup: template_id -> (path, ETag)
+STATIC_PREVIEWS = {
+    template_id: (path, f'"{file_digest(str(path))[:32]}"')
+    for template_id, path in resolve_static_previews(
+        {'template1': 'cv1.png', 'template2': 'cv2.png'},
+        ["frontend/public/template", "template", "static/template", "public/template"]
+    ).items()
+}
+
+# Final CV rendering runs in a bounded process pool
+render_queue = RenderQueue(
+    max_workers=int(os.getenv("RENDER_WORKERS", "0")) or None,
+    max_pending=int(os.getenv("RENDER_MAX_PENDING", "64")),
+    artifact_store=artifact_store,
+    # A conversion running longer is failed and its worker pool restarted (0: no limit)
+    job_timeout=float(os.getenv("RENDER_JOB_TIMEOUT", "300")) or None,
+    job_store=create_store(
+        "render_jobs",
+        max_bytes=8 * 1024 * 1024,
+        ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "7200"))
+    )
+)
+
+# Longest a bundle request waits for its renders before giving up
+RENDER_BUNDLE_TIMEOUT = float(os.getenv("RENDER_BUNDLE_TIMEOUT", "180"))
+
+# A preview GET may start a render: at most PREVIEW_RENDER_LIMIT per analysis per window,
+# so crawlers or a polling loop on a failing CV cannot fill the render queue
+PREVIEW_RENDER_LIMIT = int(os.getenv("PREVIEW_RENDER_LIMIT", "6"))
+PREVIEW_RENDER_WINDOW = float(os.getenv("PREVIEW_RENDER_WINDOW", "300"))
+
+# Default analysis mode when a request does not pick one
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "staged")
+
+# Batch analysis limits
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "5"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "30"))
+
+# PDF text extraction runs in worker threads, or page-parallel in a process pool for long documents
+pdf_extractor = PdfTextExtractor(
+    max_pages=int(os.getenv("PDF_MAX_PAGES", "50")),
+    page_timeout=float(os.getenv("PDF_PAGE_TIMEOUT", "5")),
+    parallel_min_pages=int(os.getenv("PDF_PARALLEL_MIN_PAGES", "12"))
+)
+
+# Extracted text is normalised and trimmed to CV_TOKEN_BUDGET before reaching the agents
+cv_preprocessor = create_preprocessor()
+
 # Helper function to extract text from PDF
-def extract_text_from_pdf(file_content: bytes) -> str:
+async def extract_text_from_pdf(file_content: bytes) -> ExtractionResult:
     try:
-        pdf_file = io.BytesIO(file_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        
-        return text
-    except Exception as e:
+        with span("extract_text_from_pdf"):
+            extraction = await pdf_extractor.extract(file_content)
+    except PdfExtractionError as e:
         raise HTTPException(status_code=400, detail=f"Failed to extract text from PDF: {str(e)}")
-
-def cleanup_temp_files(file_paths: List[str]):
-    """Clean up temporary files after processing"""
-    for file_path in file_paths:
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logger.info(f"Cleaned up: {file_path}")
-        except Exception as e:
-            logger.error(f"Failed to clean up {file_path}: {e}")
-
-def generate_cv_with_template(cv_data: Dict, template_id: str, analysis_id: str) -> str:
-    """Generate CV using the template system and return PDF path"""
-    
-    logger.info(f"Starting CV generation with template_id: {template_id}, analysis_id: {analysis_id}")
-    logger.info(f"CV data keys: {list(cv_data.keys())}")
     
-    # Template mapping - FIXED: Added full path
-    template_mapping = {
-        'template1': 'create_cv/template1.docx',  # Added create_cv/ prefix
-        'template2': 'create_cv/template2.docx'   # Added create_cv/ prefix
+    logger.info(f"Extracted {extraction.pages_extracted}/{extraction.page_count} pages in {extraction.elapsed_seconds * 1000:.0f}ms ({extraction.mode})")
+    if not extraction.text.strip():
+        raise HTTPException(status_code=400, detail="Failed to extract text from PDF: no text found")
+    return extraction
+
+def store_analysis(
+    cv_id: str,
+    job_description: str,
+    job_analysis: JobAnalysis,
+    profile_analysis: ProfileAnalysis,
+    gap_analysis: Optional[GapAnalysis],
+    is_sufficient: Optional[bool]
+) -> str:
+    """Store an analysis in the session store and return its analysis_id"""
+    analysis_id = str(uuid.uuid4())
+    sessions[analysis_id] = {
+        "cv_id": cv_id,
+        "job_description": job_description,
+        "job_analysis": job_analysis.model_dump(),
+        "profile_analysis": profile_analysis.model_dump(),
+        "gap_analysis": gap_analysis.model_dump() if gap_analysis else None,
+        "is_sufficient": is_sufficient
     }
-    
-    template_file = template_mapping.get(template_id, 'create_cv/template1.docx')
-    logger.info(f"Using template file: {template_file}")
-    
-    # Create file names with full paths
-    json_file = f"temp_cv_data_{analysis_id}.json"
-    output_docx = f"temp_output_{analysis_id}.docx"
-    output_pdf = f"temp_output_{analysis_id}.pdf"
-    
-    try:
-        # Check if template exists BEFORE importing
-        if not Path(template_file).exists():
-            logger.error(f"Template file not found: {template_file}")
-            logger.info(f"Current working directory: {os.getcwd()}")
-            logger.info(f"Files in create_cv/: {list(Path('create_cv').glob('*')) if Path('create_cv').exists() else 'create_cv directory not found'}")
-            raise Exception(f"Template {template_file} not found. Please ensure template files are in the create_cv/ directory")
-        
-        # Import the CV generation functions AFTER checking template exists
-        try:
-            from create_cv.python_cv_templates import render_template, convert_to_pdf
-            logger.info("Successfully imported CV template functions")
-        except ImportError as e:
-            logger.error(f"Import error: {e}")
-            logger.info(f"Python path: {os.sys.path}")
-            logger.info(f"Current directory contents: {os.listdir('.')}")
-            raise Exception(f"CV template functions not found. Error: {str(e)}. Make sure python_cv_templates.py is in create_cv/ folder and dependencies are installed.")
-        
-        # Save CV data to JSON file
-        logger.info(f"Saving CV data to {json_file}")
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(cv_data, f, indent=2, ensure_ascii=False)
-        logger.info("CV data saved successfully")
-        
-        # Generate CV using your functions
-        logger.info("Rendering template...")
-        render_template(template_file, cv_data, output_docx)
-        logger.info(f"Template rendered to {output_docx}")
-        
-        # Check if DOCX was created
-        if not os.path.exists(output_docx):
-            raise Exception(f"DOCX file was not created: {output_docx}")
-        
-        logger.info("Converting to PDF...")
-        convert_to_pdf(output_docx, output_pdf)
-        logger.info(f"PDF created: {output_pdf}")
-        
-        # Verify PDF was created
-        if not os.path.exists(output_pdf):
-            raise Exception(f"PDF generation failed - file not found: {output_pdf}")
-        
-        # Check PDF file size
-        pdf_size = os.path.getsize(output_pdf)
-        logger.info(f"Generated PDF size: {pdf_size} bytes")
-        
-        if pdf_size == 0:
-            raise Exception("PDF file is empty")
-        
-        # Clean up intermediate files
-        cleanup_temp_files([json_file])  # Keep DOCX for debugging, only clean JSON
-        
-        logger.info(f"CV generation completed successfully: {output_pdf}")
-        return output_pdf
-        
-    except Exception as e:
-        logger.error(f"Error in CV generation: {str(e)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        
-        # Clean up files in case of error
-        cleanup_temp_files([json_file, output_docx, output_pdf])
-        raise Exception(f"Failed to generate CV: {str(e)}")
+    return analysis_id
 
 @app.get("/")
 async def root():
@@ -173,95 +288,182 @@ async def upload_cv(cv_file: UploadFile = File(...)):
     cv_id = str(uuid.uuid4())
     
     try:
-        # Read file content
-        content = await cv_file.read()
+        # Read file content, hashing it as it arrives
+        digest = hashlib.sha256()
+        chunks = []
+        while True:
+            chunk = await cv_file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            chunks.append(chunk)
+        content_hash = digest.hexdigest()
         
-        # Extract text from PDF
-        cv_text = extract_text_from_pdf(content)
+        # Same file already uploaded: reuse its extracted text instead of parsing the PDF again
+        cv_content = cv_contents.get(content_hash)
+        if cv_content is not None:
+            upload_dedup_stats["hits"] += 1
+            logger.info(f"Duplicate CV upload {content_hash[:12]}, reusing extracted text")
+        else:
+            upload_dedup_stats["misses"] += 1
+            content = b"".join(chunks)
+            
+            # Extract text from PDF
+            extraction = await extract_text_from_pdf(content)
+            preprocessing = await asyncio.to_thread(cv_preprocessor.process, extraction.text)
+            cv_content = {
+                "text": extraction.text,
+                "prepared_text": preprocessing.text,
+                "extraction": extraction.summary(),
+                "preprocessing": preprocessing.summary(),
+                "size": len(content)
+            }
+            if UPLOAD_RAW_PDF == "keep":
+                cv_content["content"] = content
+            elif UPLOAD_RAW_PDF == "spill":
+                UPLOAD_SPILL_DIR.mkdir(parents=True, exist_ok=True)
+                content_path = UPLOAD_SPILL_DIR / f"{content_hash}.pdf"
+                content_path.write_bytes(content)
+                cv_content["content_path"] = str(content_path)
+        
+        # Re-assign on hits too, so the shared content stays as fresh as its newest upload
+        try:
+            cv_contents[content_hash] = cv_content
+        except StoreValueTooLarge as e:
+            # Stored anyway, it would be evicted at once and the analysis would get "CV not found"
+            remove_spilled_pdf(content_hash, cv_content)
+            logger.warning(f"CV upload rejected: {e}")
+            raise HTTPException(status_code=413, detail="CV is too large to keep: its extracted content exceeds CV_CONTENT_STORE_MAX_BYTES")
         
         # Store in memory (replace with database in production)
         uploaded_files[cv_id] = {
             "filename": cv_file.filename,
-            "content": content,
-            "text": cv_text,
+            "content_hash": content_hash,
             "upload_time": str(asyncio.get_event_loop().time())
         }
         
         return {
             "cv_id": cv_id,
             "message": "CV uploaded successfully",
-            "filename": cv_file.filename
+            "filename": cv_file.filename,
+            "extraction": cv_content["extraction"],
+            "preprocessing": cv_content.get("preprocessing")
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process CV: {str(e)}")
 
-@app.post("/api/analyze")
-async def analyze_job_description(request: JobDescriptionRequest):
-    """Analyze job description against uploaded CV"""
+async def run_analysis_stages(cv_id: str, cv_text: str, job_description: str, mode: Optional[str] = None):
+    """
+    Run the Step 1/2/3 analysis pipeline, yielding (event, data) after each stage.
+    The last event is "result" with the same payload /api/analyze returns.
+    In "fused" mode one model call produces all three stages, which are then yielded together.
+    """
+    mode = mode or ANALYSIS_MODE
+    started = time.perf_counter()
+    # cv_text may be trimmed to the token budget; skills are matched against everything extracted
+    match_text = get_cv_full_text(cv_id) or cv_text
     
-    # Check if CV exists
-    if request.cv_id not in uploaded_files:
-        raise HTTPException(status_code=404, detail="CV not found")
-    
-    cv_data = uploaded_files[request.cv_id]
-    cv_text = cv_data["text"]
-    
-    try:
+    if mode == "fused":
+        logger.info("Steps 1-3: Fused job, profile and gap analysis...")
+        job_analysis, profile_analysis, is_sufficient, gap_analysis = await optimizer.analyze_fused(job_description, cv_text, match_text=match_text)
+        logger.info(f"Fused analysis completed for role: {job_analysis.job_title} - Score: {profile_analysis.relevance_score_overall}%")
+        yield "job_analysis", {"job_title": job_analysis.job_title}
+        yield "profile_analysis", {"overall_match": profile_analysis.relevance_score_overall}
+    else:
         # Step 1: Analyze job offer
         logger.info("Step 1: Analyzing job offer...")
-        job_analysis = optimizer.job_analyzer.analyze_job_offer(request.job_description)
+        job_analysis = await optimizer.analyze_job_offer(job_description)
         logger.info(f"Job analysis completed for role: {job_analysis.job_title}")
+        yield "job_analysis", {"job_title": job_analysis.job_title}
         
         # Step 2: Analyze profile
         logger.info("Step 2: Analyzing profile against job...")
-        profile_analysis = optimizer.profile_analyzer.analyze_profile(cv_text, job_analysis)
+        profile_analysis = await optimizer.analyze_profile(cv_text, job_analysis)
         logger.info(f"Profile analysis completed - Score: {profile_analysis.relevance_score_overall}%")
+        yield "profile_analysis", {"overall_match": profile_analysis.relevance_score_overall}
         
         # Step 3: Check if additional input needed (IMPROVED LOGIC)
         logger.info("Step 3: Analyzing gaps...")
-        is_sufficient, gap_analysis = optimizer.gap_analyzer.analyze_gaps(profile_analysis)
-        
-        # Generate analysis ID
-        analysis_id = str(uuid.uuid4())
-        
-        # Store session data
-        sessions[analysis_id] = {
-            "cv_id": request.cv_id,
-            "job_description": request.job_description,
-            "job_analysis": job_analysis.model_dump(),
-            "profile_analysis": profile_analysis.model_dump(),
-            "gap_analysis": gap_analysis.model_dump() if gap_analysis else None,
-            "is_sufficient": is_sufficient
-        }
-        
-        # Calculate more realistic scores
-        overall_score = profile_analysis.relevance_score_overall
-        skills_score = max(profile_analysis.skills_match.values()) if profile_analysis.skills_match else max(50, overall_score - 10)
-        experience_score = min(overall_score + 10, 95)  # Experience usually scores higher
-        
-        # Prepare base response
-        response_data = {
-            "analysis_id": analysis_id,
-            "overall_match": overall_score,
-            "skills_match": skills_score,
-            "experience_match": experience_score,
-            "recommendations": profile_analysis.recommendations[:4] if profile_analysis.recommendations else []
-        }
-        
-        # IMPROVED: Only add gap analysis if there are real gaps AND not sufficient
-        if not is_sufficient and gap_analysis and gap_analysis.missing_skills:
-            logger.info(f"Gap analysis needed - Missing skills: {gap_analysis.missing_skills}")
-            response_data.update({
-                "overall_analysis": gap_analysis.overall_analysis,
-                "missing_skills": gap_analysis.missing_skills,
-                "needs_user_input": True
-            })
-        else:
-            logger.info(f"No gap analysis needed - Score: {overall_score}%, is_sufficient: {is_sufficient}")
-            response_data["needs_user_input"] = False
-        
-        logger.info(f"Returning response - needs_user_input: {response_data.get('needs_user_input', False)}")
+        is_sufficient, gap_analysis = await optimizer.analyze_gaps(profile_analysis, cv_text, job_analysis, match_text=match_text)
+    
+    yield "gap_analysis", {
+        "missing_skills": gap_analysis.missing_skills if gap_analysis else [],
+        "is_sufficient": is_sufficient
+    }
+    elapsed = time.perf_counter() - started
+    logger.info(f"Analysis ({mode}) completed in {elapsed:.2f}s")
+    
+    # Store session data
+    analysis_id = store_analysis(
+        cv_id, job_description, job_analysis, profile_analysis, gap_analysis, is_sufficient
+    )
+    
+    response_data = build_analysis_response(analysis_id, profile_analysis, gap_analysis, is_sufficient)
+    response_data["analysis_mode"] = mode
+    response_data["analysis_seconds"] = round(elapsed, 3)
+    cv_content = get_cv_content(cv_id)
+    if cv_content is not None and cv_content.get("preprocessing"):
+        preprocessing = cv_content["preprocessing"]
+        logger.info(f"Analysis {analysis_id}: {preprocessing['tokens_saved']} CV tokens saved by preprocessing")
+        response_data["preprocessing"] = preprocessing
+    
+    yield "result", response_data
+
+def build_analysis_response(
+    analysis_id: str,
+    profile_analysis: ProfileAnalysis,
+    gap_analysis: Optional[GapAnalysis],
+    is_sufficient: bool
+) -> Dict[str, Any]:
+    # Calculate more realistic scores
+    overall_score = profile_analysis.relevance_score_overall
+    skills_score = max(profile_analysis.skills_match.values()) if profile_analysis.skills_match else max(50, overall_score - 10)
+    experience_score = min(overall_score + 10, 95)  # Experience usually scores higher
+    
+    # Prepare base response
+    response_data = {
+        "analysis_id": analysis_id,
+        "overall_match": overall_score,
+        "skills_match": skills_score,
+        "experience_match": experience_score,
+        "recommendations": profile_analysis.recommendations[:4] if profile_analysis.recommendations else []
+    }
+    
+    # IMPROVED: Only add gap analysis if there are real gaps AND not sufficient
+    if not is_sufficient and gap_analysis and gap_analysis.missing_skills:
+        logger.info(f"Gap analysis needed - Missing skills: {gap_analysis.missing_skills}")
+        response_data.update({
+            "overall_analysis": gap_analysis.overall_analysis,
+            "missing_skills": gap_analysis.missing_skills,
+            "needs_user_input": True
+        })
+    else:
+        logger.info(f"No gap analysis needed - Score: {overall_score}%, is_sufficient: {is_sufficient}")
+        response_data["needs_user_input"] = False
+    
+    logger.info(f"Returning response - needs_user_input: {response_data.get('needs_user_input', False)}")
+    return response_data
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/analyze")
+async def analyze_job_description(request: JobDescriptionRequest):
+    """Analyze job description against uploaded CV"""
+    
+    # Check if CV exists
+    cv_text = get_cv_text(request.cv_id)
+    if cv_text is None:
+        raise HTTPException(status_code=404, detail="CV not found")
+    
+    try:
+        response_data = None
+        async for event, data in run_analysis_stages(request.cv_id, cv_text, request.job_description, request.mode):
+            if event == "result":
+                response_data = data
         return response_data
         
     except Exception as e:
@@ -269,6 +471,90 @@ async def analyze_job_description(request: JobDescriptionRequest):
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Failed to analyze job: {str(e)}")
 
+@app.post("/api/analyze-stream")
+async def analyze_job_description_stream(request: JobDescriptionRequest):
+    """Same analysis as /api/analyze, streamed as Server-Sent Events as each step finishes"""
+    
+    cv_text = get_cv_text(request.cv_id)
+    if cv_text is None:
+        raise HTTPException(status_code=404, detail="CV not found")
+    
+    async def event_stream():
+        try:
+            async for event, data in run_analysis_stages(request.cv_id, cv_text, request.job_description, request.mode):
+                yield format_sse(event, data)
+        except Exception as e:
+            logger.error(f"Error in analyze_job_description_stream: {str(e)}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
+            yield format_sse("error", {"detail": f"Failed to analyze job: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/analyze-batch")
+async def analyze_job_descriptions_batch(request: BatchAnalyzeRequest):
+    """Analyze one uploaded CV against many job descriptions and rank them by relevance"""
+    
+    cv_text = get_cv_text(request.cv_id)
+    if cv_text is None:
+        raise HTTPException(status_code=404, detail="CV not found")
+    
+    if not request.job_descriptions:
+        raise HTTPException(status_code=400, detail="No job descriptions provided")
+    
+    if len(request.job_descriptions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} job descriptions per batch")
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    started = time.perf_counter()
+    
+    async def analyze_one(index: int, job_description: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                job_analysis = await optimizer.analyze_job_offer(job_description)
+                profile_analysis = await optimizer.analyze_profile(cv_text, job_analysis)
+            except Exception as e:
+                logger.error(f"Batch item {index} failed: {str(e)}")
+                return {"index": index, "error": str(e)}
+        
+        # Gap analysis is not run in batch mode; it is only needed once the user picks a job
+        analysis_id = store_analysis(request.cv_id, job_description, job_analysis, profile_analysis, None, None)
+        return {
+            "index": index,
+            "analysis_id": analysis_id,
+            "job_title": job_analysis.job_title,
+            "relevance_score_overall": profile_analysis.relevance_score_overall
+        }
+    
+    logger.info(f"Batch analysis of {len(request.job_descriptions)} jobs (concurrency {BATCH_CONCURRENCY})")
+    # Batch calls queue behind interactive ones for the shared rate budget
+    with priority(BULK):
+        outcomes = await asyncio.gather(
+            *(analyze_one(index, job_description) for index, job_description in enumerate(request.job_descriptions))
+        )
+    
+    results = sorted(
+        (outcome for outcome in outcomes if "error" not in outcome),
+        key=lambda outcome: outcome["relevance_score_overall"],
+        reverse=True
+    )
+    for rank, outcome in enumerate(results, start=1):
+        outcome["rank"] = rank
+    failed = [outcome for outcome in outcomes if "error" in outcome]
+    
+    elapsed = time.perf_counter() - started
+    logger.info(f"Batch analysis completed in {elapsed:.2f}s - {len(results)} ok, {len(failed)} failed")
+    
+    return {
+        "cv_id": request.cv_id,
+        "results": results,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 3)
+    }
+
 @app.post("/api/generate-resume")
 async def generate_optimized_resume(request: UserAnswersRequest):
     """Generate optimized resume with user confirmed skills"""
@@ -285,7 +571,7 @@ async def generate_optimized_resume(request: UserAnswersRequest):
         profile_analysis = ProfileAnalysis(**session_data["profile_analysis"])
         
         # Generate CV sections
-        cv_sections = optimizer.cv_generator.generate_cv_sections(
+        cv_sections = await optimizer.generate_cv_sections(
             job_analysis=job_analysis,
             profile_analysis=profile_analysis,
             user_confirmed_skills=request.confirmed_skills
@@ -294,8 +580,9 @@ async def generate_optimized_resume(request: UserAnswersRequest):
         # Save optimized CV data
         optimized_cv_data = cv_sections.model_dump()
         
-        # Store for template generation
-        sessions[request.analysis_id]["optimized_cv"] = optimized_cv_data
+        # Store for template generation (re-assign so the store re-counts the session size)
+        session_data["optimized_cv"] = optimized_cv_data
+        sessions[request.analysis_id] = session_data
         
         return {
             "status": "success",
@@ -306,9 +593,69 @@ async def generate_optimized_resume(request: UserAnswersRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate CV: {str(e)}")
 
-@app.post("/api/generate-final-cv")
-async def generate_final_cv(request: TemplateRequest, background_tasks: BackgroundTasks):
-    """Generate final CV with selected template"""
+def submit_render(cv_data: Dict[str, Any], template_id: str, analysis_id: str):
+    """Queue one render, served from the artifact cache when this CV was already rendered with this template"""
+    template_file = TEMPLATES.get(template_id, TEMPLATES[DEFAULT_TEMPLATE])
+    artifact_key = make_artifact_key(cv_data, template_id, template_file)
+    return render_queue.submit(cv_data, template_id, analysis_id, artifact_key)
+
+def read_rendered_pdf(job) -> Optional[bytes]:
+    """PDF bytes of a finished render job, None if it is no longer available"""
+    if job.pdf_bytes is not None:
+        return job.pdf_bytes
+    pdf_path = artifact_store.get(job.artifact_key) if job.artifact_key is not None else None
+    return pdf_path.read_bytes() if pdf_path is not None else None
+
+def take_preview_render_slot(session_data: Dict[str, Any]) -> float:
+    """Count one preview-triggered render against the analysis; 0 if allowed, else seconds until a slot frees"""
+    now = time.time()
+    recent = [started for started in session_data.get("preview_renders", []) if now - started < PREVIEW_RENDER_WINDOW]
+    if len(recent) >= PREVIEW_RENDER_LIMIT:
+        return PREVIEW_RENDER_WINDOW - (now - recent[0])
+    session_data["preview_renders"] = recent + [now]
+    return 0.0
+
+async def wait_for_renders(job_ids: List[str], timeout: float) -> List[Any]:
+    """Poll the render jobs until none is queued or running, or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while True:
+        jobs = render_queue.get_many(job_ids)
+        if all(job.current_status() in (DONE, FAILED) for job in jobs) or time.monotonic() >= deadline:
+            return jobs
+        await asyncio.sleep(0.1)
+
+def build_bundle_zip(jobs: List[Any]) -> bytes:
+    """One PDF per finished template, plus errors.json for the ones that failed"""
+    buffer = io.BytesIO()
+    errors = {}
+    # PDFs are already compressed: store them as is
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as bundle:
+        for job in jobs:
+            status = job.current_status()
+            if status != DONE:
+                errors[job.template_id] = job.error if status == FAILED else f"Render job is {status}"
+                continue
+            pdf_bytes = read_rendered_pdf(job)
+            if pdf_bytes is None:
+                errors[job.template_id] = "Generated PDF is no longer available"
+                continue
+            bundle.writestr(f"optimized_cv_{job.template_id}.pdf", pdf_bytes)
+        if errors:
+            bundle.writestr("errors.json", json.dumps(errors, indent=2))
+    return buffer.getvalue()
+
+def bundle_zip_response(jobs: List[Any], bundle_id: str) -> Response:
+    if not any(job.current_status() == DONE for job in jobs):
+        raise HTTPException(status_code=500, detail=f"Failed to generate final CVs: {[job.error for job in jobs]}")
+    return Response(
+        content=build_bundle_zip(jobs),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=optimized_cv_{bundle_id[:8]}.zip"}
+    )
+
+@app.post("/api/generate-final-cv", status_code=202)
+async def generate_final_cv(request: TemplateRequest):
+    """Submit a final CV render job with the selected template"""
     
     logger.info(f"Received final CV generation request for analysis_id: {request.analysis_id}, template_id: {request.template_id}")
     
@@ -320,40 +667,127 @@ async def generate_final_cv(request: TemplateRequest, background_tasks: Backgrou
     if "optimized_cv" not in session_data:
         raise HTTPException(status_code=400, detail="No optimized CV data found. Please generate resume first.")
     
+    cv_data = session_data["optimized_cv"]
+    logger.info(f"Retrieved CV data with keys: {list(cv_data.keys())}")
+    
     try:
-        cv_data = session_data["optimized_cv"]
-        logger.info(f"Retrieved CV data with keys: {list(cv_data.keys())}")
-        
-        # Generate PDF using template system
-        pdf_path = generate_cv_with_template(cv_data, request.template_id, request.analysis_id)
-        logger.info(f"PDF generated successfully at: {pdf_path}")
-        
-        # Verify PDF was created and is accessible
-        if not os.path.exists(pdf_path):
-            raise HTTPException(status_code=500, detail="PDF file was not created")
-        
-        # Check file permissions
-        if not os.access(pdf_path, os.R_OK):
-            raise HTTPException(status_code=500, detail="Cannot read generated PDF file")
-        
-        # Schedule cleanup of temporary files after response is sent
-        temp_files = [pdf_path]  # Only cleanup PDF after sending
-        background_tasks.add_task(cleanup_temp_files, temp_files)
-        
-        # Return PDF file
-        return FileResponse(
-            path=pdf_path,
-            filename=f"optimized_cv_{request.template_id}.pdf",
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=optimized_cv_{request.template_id}.pdf"
-            }
-        )
+        job = submit_render(cv_data, request.template_id, request.analysis_id)
         
+        # Remember the job on the session so any worker can report its status
+        session_data["render_job_ids"] = session_data.get("render_job_ids", []) + [job.job_id]
+        sessions[request.analysis_id] = session_data
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Render queue is full, please retry later: {str(e)}")
     except Exception as e:
         logger.error(f"Error in generate_final_cv: {str(e)}")
         logger.error(f"Full traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Failed to generate final CV: {str(e)}")
+    
+    return {
+        **job.to_dict(),
+        "status_url": f"/api/analysis-status/{request.analysis_id}",
+        "download_url": f"/api/download-cv/{job.job_id}"
+    }
+
+@app.get("/api/download-cv/{job_id}")
+async def download_final_cv(job_id: str):
+    """Download the PDF produced by a finished render job"""
+    
+    job = render_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Render job not found")
+    
+    status = job.current_status()
+    if status == FAILED:
+        raise HTTPException(status_code=500, detail=f"Failed to generate final CV: {job.error}")
+    if status != DONE:
+        raise HTTPException(status_code=409, detail=f"Render job is {status}")
+    
+    headers = {"Content-Disposition": f"attachment; filename=optimized_cv_{job.template_id}.pdf"}
+    
+    # Rendered in memory and not cached on disk: stream straight from the job's buffer
+    if job.pdf_bytes is not None:
+        return Response(content=job.pdf_bytes, media_type="application/pdf", headers=headers)
+    
+    pdf_path = artifact_store.get(job.artifact_key) if job.artifact_key is not None else None
+    if pdf_path is None:
+        raise HTTPException(status_code=410, detail="Generated PDF is no longer available")
+    
+    return FileResponse(
+        path=str(pdf_path),
+        filename=f"optimized_cv_{job.template_id}.pdf",
+        media_type="application/pdf",
+        headers=headers
+    )
+
+@app.post("/api/generate-final-cv-bundle", status_code=202)
+async def generate_final_cv_bundle(request: TemplateBundleRequest):
+    """Render the optimized CV into every template at once; handles to poll, or one zip once all are done"""
+    
+    if request.analysis_id not in sessions:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    session_data = sessions[request.analysis_id]
+    if "optimized_cv" not in session_data:
+        raise HTTPException(status_code=400, detail="No optimized CV data found. Please generate resume first.")
+    
+    template_ids = list(dict.fromkeys(request.template_ids or TEMPLATES))
+    unknown = [template_id for template_id in template_ids if template_id not in TEMPLATES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown template(s): {unknown}")
+    # All or nothing: a half-submitted bundle would still cost the renders that got in
+    if render_queue.pending_count() + len(template_ids) > render_queue.max_pending:
+        raise HTTPException(status_code=503, detail="Render queue is full, please retry later")
+    
+    cv_data = session_data["optimized_cv"]
+    try:
+        # The jobs run side by side in the render pool
+        jobs = [submit_render(cv_data, template_id, request.analysis_id) for template_id in template_ids]
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Render queue is full, please retry later: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error in generate_final_cv_bundle: {str(e)}")
+        logger.error(f"Full traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate final CVs: {str(e)}")
+    
+    bundle_id = str(uuid.uuid4())
+    job_ids = [job.job_id for job in jobs]
+    session_data["render_job_ids"] = session_data.get("render_job_ids", []) + job_ids
+    session_data["render_bundles"] = {**session_data.get("render_bundles", {}), bundle_id: job_ids}
+    sessions[request.analysis_id] = session_data
+    
+    if request.format == "zip":
+        jobs = await wait_for_renders(job_ids, RENDER_BUNDLE_TIMEOUT)
+        if any(job.current_status() not in (DONE, FAILED) for job in jobs):
+            raise HTTPException(status_code=504, detail=f"Renders not finished after {RENDER_BUNDLE_TIMEOUT:.0f}s, download the bundle later")
+        return bundle_zip_response(jobs, bundle_id)
+    
+    return {
+        "bundle_id": bundle_id,
+        "analysis_id": request.analysis_id,
+        "jobs": [{**job.to_dict(), "download_url": f"/api/download-cv/{job.job_id}"} for job in jobs],
+        "status_url": f"/api/analysis-status/{request.analysis_id}",
+        "bundle_url": f"/api/download-cv-bundle/{request.analysis_id}/{bundle_id}"
+    }
+
+@app.get("/api/download-cv-bundle/{analysis_id}/{bundle_id}")
+async def download_final_cv_bundle(analysis_id: str, bundle_id: str, wait: bool = False):
+    """Zip of a bundle's PDFs; 409 while renders are running unless wait=true"""
+    
+    if analysis_id not in sessions:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    job_ids = sessions[analysis_id].get("render_bundles", {}).get(bundle_id)
+    if job_ids is None:
+        raise HTTPException(status_code=404, detail="Render bundle not found")
+    
+    jobs = await wait_for_renders(job_ids, RENDER_BUNDLE_TIMEOUT) if wait else render_queue.get_many(job_ids)
+    if len(jobs) != len(job_ids):
+        raise HTTPException(status_code=410, detail="Render jobs of this bundle are no longer available")
+    running = {job.template_id: job.current_status() for job in jobs if job.current_status() not in (DONE, FAILED)}
+    if running:
+        raise HTTPException(status_code=409, detail=f"Render jobs still running: {running}")
+    
+    return bundle_zip_response(jobs, bundle_id)
 
 # Add a debug endpoint to check template files
 @app.get("/api/debug/templates")
@@ -364,10 +798,7 @@ async def debug_templates():
         create_cv_exists = Path("create_cv").exists()
         create_cv_files = list(Path("create_cv").glob("*")) if create_cv_exists else []
         
-        template_files = {
-            "template1.docx": Path("create_cv/template1.docx").exists(),
-            "template2.docx": Path("create_cv/template2.docx").exists(),
-        }
+        template_files = {Path(path).name: Path(path).exists() for path in TEMPLATES.values()}
         
         return {
             "current_directory": current_dir,
@@ -379,6 +810,59 @@ async def debug_templates():
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/api/debug/cache")
+async def debug_cache():
+    """Hit/miss counters of the LLM response cache"""
+    cache = get_default_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@app.get("/api/debug/parsing")
+async def debug_parsing():
+    """How model responses were obtained and parsed: schema/JSON mode, direct, repaired, re-asked"""
+    return parse_stats()
+
+@app.get("/api/debug/llm-client")
+async def debug_llm_client():
+    """Connection pool usage and retry counters of the shared LLM client"""
+    return optimizer.clients.stats()
+
+@app.get("/api/debug/llm-scheduler")
+async def debug_llm_scheduler():
+    """Rate budget left, queue depth and wait times of outbound LLM calls, by priority"""
+    return optimizer.scheduler.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request, stage, agent and token metrics in the Prometheus text format (this process only)"""
+    return Response(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/debug/stores")
+async def debug_stores():
+    """Live entry counts and estimated memory usage of the session and upload stores"""
+    lookups = upload_dedup_stats["hits"] + upload_dedup_stats["misses"]
+    return {
+        "sessions": sessions.stats(),
+        "uploaded_files": uploaded_files.stats(),
+        "cv_contents": cv_contents.stats(),
+        "upload_dedup": {
+            **upload_dedup_stats,
+            "hit_rate": round(upload_dedup_stats["hits"] / lookups, 4) if lookups else 0.0
+        },
+        "upload_raw_pdf": UPLOAD_RAW_PDF
+    }
+
+@app.get("/api/debug/render-queue")
+async def debug_render_queue():
+    """Render job counts and PDF conversion throughput/latency reported by the render workers"""
+    return render_queue.stats()
+
+@app.get("/api/debug/artifacts")
+async def debug_artifacts():
+    """Hit/miss counters and disk usage of the rendered PDF cache"""
+    return artifact_store.stats()
+
 @app.get("/api/download/{analysis_id}")
 async def download_optimized_cv(analysis_id: str):
     """Download the optimized CV JSON file"""
@@ -391,26 +875,16 @@ async def download_optimized_cv(analysis_id: str):
     if "optimized_cv" not in session_data:
         raise HTTPException(status_code=404, detail="No optimized CV data found")
     
-    # Create temporary JSON file
-    json_file = f"download_cv_{analysis_id}.json"
-    
     try:
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(session_data["optimized_cv"], f, indent=2, ensure_ascii=False)
-        
-        return FileResponse(
-            path=json_file,
-            filename=f"optimized_cv_{analysis_id}.json",
-            media_type="application/json"
+        content = json.dumps(session_data["optimized_cv"], indent=2, ensure_ascii=False)
+        return Response(
+            content=content.encode("utf-8"),
+            media_type="application/json",
+            headers={"Content-Disposition": f"attachment; filename=optimized_cv_{analysis_id}.json"}
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create download file: {str(e)}")
-    
-    finally:
-        # Clean up the temporary file after a delay
-        if os.path.exists(json_file):
-            os.remove(json_file)
 
 @app.get("/api/analysis-status/{analysis_id}")
 async def get_analysis_status(analysis_id: str):
@@ -425,38 +899,134 @@ async def get_analysis_status(analysis_id: str):
         "analysis_id": analysis_id,
         "status": "completed",
         "has_optimized_cv": "optimized_cv" in session_data,
-        "timestamp": session_data.get("timestamp", "")
+        "timestamp": session_data.get("timestamp", ""),
+        "render_jobs": [job.to_dict() for job in render_queue.get_many(session_data.get("render_job_ids", []))]
     }
 
+def build_preview(key: str, pdf: Union[Path, bytes], size: str) -> Path:
+    """Rasterize a rendered PDF's first page (cached file or bytes) into the preview store (blocking)"""
+    with span("rasterize_preview"):
+        png_bytes = rasterize_first_page(pdf.read_bytes() if isinstance(pdf, Path) else pdf, size)
+    try:
+        return preview_store.put_bytes(key, png_bytes)
+    except ArtifactTooLarge as e:
+        raise PreviewUnavailable(f"preview image too large to cache: {e}")
+
+async def get_or_build_preview(key: str, pdf: Union[Path, bytes], size: str) -> Path:
+    task = preview_tasks.get(key)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(build_preview, key, pdf, size))
+        preview_tasks[key] = task
+        task.add_done_callback(lambda _: preview_tasks.pop(key, None))
+    # A client going away must not cancel the rasterization others wait on
+    return await asyncio.shield(task)
+
 @app.get("/api/template-preview/{template_id}")
-async def get_template_preview(template_id: str):
-    image_mapping = {
-        'template1': 'cv1.png',
-        'template2': 'cv2.png'
-    }
+async def get_template_preview(template_id: str, request: Request, analysis_id: Optional[str] = None, size: str = DEFAULT_PREVIEW_SIZE):
+    """
+    First page of the user's CV rendered with this template when analysis_id is given,
+    else the template's sample image. Both carry an ETag and answer 304 to If-None-Match.
+    """
+    if analysis_id is None:
+        if template_id not in STATIC_PREVIEWS:
+            raise HTTPException(status_code=404, detail="Template preview not found")
+        image_path, etag = STATIC_PREVIEWS[template_id]
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path=str(image_path), media_type="image/png", headers=headers)
+    
+    if template_id not in TEMPLATES:
+        raise HTTPException(status_code=404, detail="Template not found")
+    if size not in PREVIEW_SIZES:
+        raise HTTPException(status_code=400, detail=f"Unknown preview size, expected one of {list(PREVIEW_SIZES)}")
+    if analysis_id not in sessions:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    session_data = sessions[analysis_id]
+    if "optimized_cv" not in session_data:
+        raise HTTPException(status_code=400, detail="No optimized CV data found. Please generate resume first.")
     
-    image_file = image_mapping.get(template_id)
-    if not image_file:
-        raise HTTPException(status_code=404, detail="Template preview not found")
+    cv_data = session_data["optimized_cv"]
+    artifact_key = make_artifact_key(cv_data, template_id, TEMPLATES[template_id])
+    key = preview_key(artifact_key, size)
+    etag = f'"{key[:32]}"'
+    # Personal data: browsers may keep it but must revalidate, shared proxies must not store it
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
     
-    # Check multiple possible paths for the image
-    possible_paths = [
-        Path(f"frontend/public/template/{image_file}"),
-        Path(f"template/{image_file}"),
-        Path(f"static/template/{image_file}"),
-        Path(f"public/template/{image_file}")
-    ]
+    # The ETag derives from the CV data and template alone: revalidation touches neither the PDF nor the PNG
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
     
-    image_path = None
-    for path in possible_paths:
-        if path.exists():
-            image_path = path
-            break
+    cached_path = preview_store.get(key)
+    if cached_path is not None:
+        return FileResponse(path=str(cached_path), media_type="image/png", headers=headers)
     
-    if not image_path:
-        raise HTTPException(status_code=404, detail=f"Preview image not found. Searched: {[str(p) for p in possible_paths]}")
+    pdf = artifact_store.get(artifact_key)
+    if pdf is None:
+        # Too large for the artifact cache, the PDF stayed in the render job's memory
+        job = find_render_job(session_data, artifact_key)
+        if job is not None and job.current_status() == DONE and job.pdf_bytes is not None:
+            pdf = job.pdf_bytes
+    if pdf is not None:
+        try:
+            preview_path = await get_or_build_preview(key, pdf, size)
+            return FileResponse(path=str(preview_path), media_type="image/png", headers=headers)
+        except FileNotFoundError:
+            # The PDF was evicted between the lookup and the rasterization: render it again
+            logger.info(f"Rendered PDF {artifact_key[:12]} evicted before its preview, re-rendering")
+        except PreviewUnavailable as e:
+            raise HTTPException(status_code=503, detail=f"Preview not available: {str(e)}")
     
-    return FileResponse(path=str(image_path), media_type="image/png")
+    return queue_preview_render(analysis_id, session_data, template_id, artifact_key)
+
+def find_render_job(session_data: Dict[str, Any], artifact_key: str):
+    """Newest render job of the analysis for these CV data and template, None if there is none"""
+    jobs = render_queue.get_many(session_data.get("render_job_ids", []))
+    return next((job for job in reversed(jobs) if job.artifact_key == artifact_key), None)
+
+def queue_preview_render(analysis_id: str, session_data: Dict[str, Any], template_id: str, artifact_key: str) -> JSONResponse:
+    """
+    202 for a preview whose PDF is not rendered yet: reuse this CV's pending render job, or start one
+    (a failed job is retried too) within the analysis' preview render budget, and let the client retry
+    """
+    job_ids = session_data.get("render_job_ids", [])
+    job = find_render_job(session_data, artifact_key)
+    status = job.current_status() if job is not None else None
+    if status in (None, DONE, FAILED):
+        retry_after = take_preview_render_slot(session_data)
+        if retry_after:
+            detail = "Too many preview renders for this analysis, please retry later"
+            if status == FAILED:
+                detail = f"Failed to generate final CV: {job.error}. {detail}"
+            raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(int(retry_after) + 1)})
+        try:
+            job = submit_render(session_data["optimized_cv"], template_id, analysis_id)
+        except RenderQueueFull as e:
+            # Nothing was queued: give the slot back
+            session_data["preview_renders"].pop()
+            raise HTTPException(status_code=503, detail=f"Render queue is full, please retry later: {str(e)}")
+        session_data["render_job_ids"] = job_ids + [job.job_id]
+        sessions[analysis_id] = session_data
+    return JSONResponse(
+        status_code=202,
+        content={**job.to_dict(), "download_url": f"/api/download-cv/{job.job_id}"},
+        headers={"Retry-After": "2", "Cache-Control": "no-store"}
+    )
+
+@app.get("/api/debug/previews")
+async def debug_previews():
+    """Hit/miss counters and disk usage of the preview cache, and the resolved sample images"""
+    return {
+        **preview_store.stats(),
+        "in_progress": len(preview_tasks),
+        "static_previews": {template_id: str(path) for template_id, (path, _) in STATIC_PREVIEWS.items()},
+    }
+
+@app.on_event("shutdown")
+async def shutdown_render_queue():
+    render_queue.shutdown()
+    pdf_extractor.shutdown()
+    await optimizer.clients.aclose()
 
 # Health check endpoint
 @app.get("/health")
@@ -0,0 +1,222 @@
+"""
+Load-test the backend over HTTP: upload-cv -> analyze -> generate-resume -> generate-final-cv.
+
+    python benchmarks/load_test.py [--concurrency 1,4,16,32] [--duration 30] [--latency lognormal:1500,0.4]
+                                   [--stub-render 0.3] [--url http://host:port] [--output results.json]
+
+Without --url, a stub backend (benchmarks/stub_backend.py) is started on a
+free port with the given agent latency. Each virtual user runs the whole
+flow in a loop for --duration seconds at each concurrency level; "render"
+is the time from generate-final-cv until the PDF can be downloaded.
+Reports p50/p95/p99 latency, errors and throughput per endpoint and level,
+and writes them as JSON (default benchmarks/results/load_<timestamp>.json).
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from sample_pdf import SAMPLE_CV_LINES, make_pdf
+
+JOB_DESCRIPTION = (
+    "Senior Data Engineer - Microsoft Fabric Specialist. Requirements: 5+ years in data engineering, "
+    "strong Python, Microsoft Fabric and Medallion Architecture, data pipelines and ETL, CI/CD, "
+    "team mentoring. Nice to have: Azure, Power BI, Docker."
+)
+ENDPOINTS = ["upload-cv", "analyze", "generate-resume", "generate-final-cv", "render"]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, endpoint: str, request):
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.errors[endpoint] += 1
+            return None
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(elapsed)
+        return response
+
+
+async def run_flow(client: httpx.AsyncClient, recorder: Recorder, user: int, iteration: int, template_id: str, render_timeout: float):
+    # A distinct PDF per flow, so uploads are not all dedup hits
+    pdf = make_pdf(SAMPLE_CV_LINES + [f"Load test user {user} run {iteration}"])
+    response = await recorder.call(
+        "upload-cv", client.post("/api/upload-cv", files={"cv_file": ("cv.pdf", pdf, "application/pdf")})
+    )
+    if response is None:
+        return
+    cv_id = response.json()["cv_id"]
+
+    response = await recorder.call("analyze", client.post("/api/analyze", json={"cv_id": cv_id, "job_description": JOB_DESCRIPTION}))
+    if response is None:
+        return
+    analysis_id = response.json()["analysis_id"]
+
+    response = await recorder.call(
+        "generate-resume", client.post("/api/generate-resume", json={"analysis_id": analysis_id, "confirmed_skills": []})
+    )
+    if response is None:
+        return
+
+    submitted = time.perf_counter()
+    response = await recorder.call(
+        "generate-final-cv", client.post("/api/generate-final-cv", json={"analysis_id": analysis_id, "template_id": template_id})
+    )
+    if response is None:
+        return
+    download_url = response.json()["download_url"]
+
+    while time.perf_counter() - submitted < render_timeout:
+        download = await client.get(download_url)
+        if download.status_code == 200:
+            recorder.latencies["render"].append(time.perf_counter() - submitted)
+            return
+        if download.status_code != 409:
+            break
+        await asyncio.sleep(0.1)
+    recorder.errors["render"] += 1
+
+
+async def run_level(base_url: str, concurrency: int, duration: float, template_id: str, render_timeout: float):
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def user(number: int):
+            iteration = 0
+            while time.perf_counter() < deadline:
+                await run_flow(client, recorder, number, iteration, template_id, render_timeout)
+                iteration += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(number) for number in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        samples = recorder.latencies[endpoint]
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "errors": recorder.errors[endpoint],
+            "throughput_rps": round(len(samples) / elapsed, 3),
+            **{
+                f"p{int(fraction * 100)}_ms": round(1000 * value, 1) if (value := percentile(samples, fraction)) is not None else None
+                for fraction in (0.5, 0.95, 0.99)
+            },
+        }
+    return {
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 2),
+        "flows_completed": len(recorder.latencies["render"]),
+        "endpoints": endpoints,
+    }
+
+
+def start_stub_backend(args) -> tuple:
+    port = free_port()
+    command = [sys.executable, str(Path(__file__).resolve().parent / "stub_backend.py"), "--port", str(port), "--latency", args.latency]
+    if args.stub_render is not None:
+        command += ["--stub-render", str(args.stub_render)]
+    process = subprocess.Popen(command, cwd=str(Path(__file__).resolve().parent.parent))
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError("Stub backend exited during startup")
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Stub backend did not become healthy")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="test an already running backend instead of starting a stub one")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="comma-separated virtual user counts")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--latency", default="lognormal:1500,0.4", help="stub agent latency spec (ms)")
+    parser.add_argument("--stub-render", type=float, default=None, metavar="SECONDS", help="stub rendering with a fixed delay")
+    parser.add_argument("--template", default="template1")
+    parser.add_argument("--render-timeout", type=float, default=120)
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_stub_backend(args)
+
+    levels = []
+    try:
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            print(f"Concurrency {concurrency} for {args.duration:.0f}s...")
+            level = asyncio.run(run_level(base_url, concurrency, args.duration, args.template, args.render_timeout))
+            levels.append(level)
+            print(f"{'endpoint':<20}{'reqs':>7}{'err':>6}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+            for endpoint, row in level["endpoints"].items():
+                print(
+                    f"{endpoint:<20}{row['requests']:>7}{row['errors']:>6}{row['throughput_rps']:>8.2f}"
+                    + "".join(f"{row[key] if row[key] is not None else '-':>10}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+                )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "target": args.url or "stub",
+        "agent_latency": None if args.url else args.latency,
+        "stub_render_seconds": args.stub_render,
+        "duration_per_level": args.duration,
+        "levels": levels,
+    }
+    output = Path(args.output or Path(__file__).resolve().parent / "results" / f"load_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Time the analysis/generation pipeline offline against recorded model responses.
+
+    # once, with network access and an API key: record fixtures
+    python benchmarks/pipeline_replay.py --record
+
+    # any time after, offline: replay them
+    python benchmarks/pipeline_replay.py [--runs 50] [--latency none] [--profile] [--output results.json]
+
+Replay runs LLM_TRANSPORT=replay with the LLM cache disabled, so every stage
+goes through the client, parsing and validation. With --latency none the
+timings are the pipeline's own overhead; other specs (fixed:MS,
+uniform:LOW,HIGH, normal:MEAN,STD, lognormal:MEDIAN,SIGMA, recorded) add
+synthetic model latency.
+"""
+import argparse
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+JOB_OFFER = """
+Senior Data Engineer - Microsoft Fabric Specialist
+We are seeking an experienced Data Engineer with expertise in Microsoft Fabric
+to join our growing data team.
+
+Requirements:
+- 5+ years experience in data engineering
+- Strong Python programming skills
+- Experience with Microsoft Fabric and Medallion Architecture
+- Knowledge of data pipelines and ETL processes
+- DevOps experience with CI/CD
+- Team mentoring and coaching abilities
+
+Nice to have:
+- Azure certifications
+- Experience with Power BI
+- Docker and containerization
+"""
+
+CV_TEXT = """
+Martin Dupont
+Développeur Full-Stack
+
+Expérience:
+TechWave Solutions – Bruxelles (Janvier 2021 – Aujourd'hui)
+- Développement d'applications Python
+- Utilisation de Docker et GitLab CI/CD
+- Mentorat de 2 développeurs juniors
+
+DigitalFactory – Bruxelles (Juillet 2018 – Décembre 2020)
+- Développement web avec Python et JavaScript
+- Gestion de bases de données
+"""
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+
+async def run_once(optimizer, preprocessor, timings):
+    def timed(stage, started):
+        timings.setdefault(stage, []).append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    cv_text = preprocessor.process(CV_TEXT).text
+    timed("preprocess", started)
+
+    started = time.perf_counter()
+    job_analysis = await optimizer.analyze_job_offer(JOB_OFFER)
+    timed("job_analysis", started)
+
+    started = time.perf_counter()
+    profile_analysis = await optimizer.analyze_profile(cv_text, job_analysis)
+    timed("profile_analysis", started)
+
+    started = time.perf_counter()
+    is_sufficient, gap_analysis = await optimizer.analyze_gaps(profile_analysis, cv_text, job_analysis)
+    timed("gap_analysis", started)
+
+    started = time.perf_counter()
+    confirmed = gap_analysis.missing_skills[:1] if gap_analysis else None
+    await optimizer.generate_cv_sections(job_analysis, profile_analysis, confirmed)
+    timed("generate_cv_sections", started)
+
+
+async def main_async(args):
+    from agent import CVOptimizer
+    from cv_preprocessing import create_preprocessor
+
+    optimizer = CVOptimizer()
+    preprocessor = create_preprocessor()
+    runs = 1 if args.record else args.runs
+    timings = {}
+
+    profiler = cProfile.Profile() if args.profile else None
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    for _ in range(runs):
+        await run_once(optimizer, preprocessor, timings)
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - started
+    await optimizer.clients.aclose()
+
+    report = {
+        "mode": os.environ["LLM_TRANSPORT"],
+        "latency": os.environ.get("LLM_REPLAY_LATENCY"),
+        "runs": runs,
+        "elapsed_seconds": round(elapsed, 3),
+        "pipelines_per_second": round(runs / elapsed, 2) if elapsed else None,
+        "stages": {
+            stage: {
+                "mean_ms": round(1000 * sum(samples) / len(samples), 2),
+                "p50_ms": round(1000 * percentile(samples, 0.5), 2),
+                "p95_ms": round(1000 * percentile(samples, 0.95), 2),
+            }
+            for stage, samples in timings.items()
+        },
+        "fixtures": optimizer.clients.stats()["fixtures"],
+    }
+
+    print(f"{'stage':<22}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage, row in report["stages"].items():
+        print(f"{stage:<22}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+    print(f"{runs} runs in {elapsed:.2f}s ({report['pipelines_per_second']} pipelines/s), fixtures {report['fixtures']}")
+
+    if profiler:
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(25)
+        print(stream.getvalue())
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Results written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="call the real API once and save fixtures")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--latency", default="none", help="synthetic latency spec for replay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile", action="store_true", help="print the top cProfile entries")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    # Configured before the agents build the shared clients
+    os.environ["LLM_TRANSPORT"] = "record" if args.record else "replay"
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.environ["LLM_REPLAY_LATENCY"] = args.latency
+    os.environ["LLM_REPLAY_SEED"] = str(args.seed)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
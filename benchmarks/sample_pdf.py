@@ -0,0 +1,44 @@
+"""Minimal one-page text PDFs for benchmarks, without any PDF library."""
+from typing import List
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(lines: List[str]) -> bytes:
+    """A valid PDF whose text PyPDF2 can extract, one Helvetica line per entry (Latin-1 only)"""
+    content = "BT /F1 11 Tf 50 800 Td 14 TL " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        f"<< /Length {len(content.encode('latin-1'))} >>\nstream\n{content}\nendstream",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    out += b"".join(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+    return out
+
+
+SAMPLE_CV_LINES = [
+    "Martin Dupont",
+    "Developpeur Full-Stack",
+    "Experience",
+    "TechWave Solutions - Bruxelles (Janvier 2021 - Aujourd'hui)",
+    "- Developpement d'applications Python",
+    "- Utilisation de Docker et GitLab CI/CD",
+    "- Mentorat de 2 developpeurs juniors",
+    "DigitalFactory - Bruxelles (Juillet 2018 - Decembre 2020)",
+    "- Developpement web avec Python et JavaScript",
+    "- Gestion de bases de donnees",
+    "Skills",
+    "Python, JavaScript, Docker, GitLab CI/CD, PostgreSQL",
+]
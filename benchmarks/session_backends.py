@@ -0,0 +1,94 @@
+"""
+Compare session backends on a realistic analyze -> generate-resume session.
+
+    python benchmarks/session_backends.py [sessions]
+
+Reports set/get throughput and stored bytes per session for a plain dict,
+the in-process BoundedStore and the SQLite (WAL) store.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from session_store import BoundedStore, SQLiteStore, encode_value
+
+
+def sample_session() -> dict:
+    return {
+        "cv_id": str(uuid.uuid4()),
+        "job_description": "Senior Data Engineer - Microsoft Fabric Specialist. " * 40,
+        "job_analysis": {
+            "job_title": "Senior Data Engineer",
+            "must_have_skills": ["Python", "Microsoft Fabric", "ETL", "CI/CD", "Mentoring"],
+            "nice_to_have_skills": ["Azure", "Power BI", "Docker"],
+            "company_type": "Unknown",
+            "work_environment": ["Hybrid", "Agile"],
+            "ats_keywords": ["data pipelines", "medallion architecture", "DevOps"],
+            "tone_of_voice": "Professional",
+            "key_responsibilities": ["Build data pipelines", "Coach the team"] * 3,
+            "company_culture_indicators": ["Growth"],
+            "technical_domains": ["Data", "DevOps"],
+            "urgency_level": "Normal",
+            "remote_work_policy": "Unknown",
+        },
+        "profile_analysis": {
+            "candidate_name": "Martin Dupont",
+            "relevance_score_overall": 62,
+            "skills_match": {"Python": 8, "Docker": 6, "Microsoft Fabric": 1},
+            "experience_relevance": [
+                {"role": "Développeur Full-Stack", "company": "TechWave", "period": "2021-", "relevance_score": 70, "relevance_notes": "Python, CI/CD " * 10}
+            ] * 3,
+            "skills_gaps": ["Microsoft Fabric", "Power BI"],
+            "recommendations": ["Highlight data pipeline work " * 5] * 4,
+            "summary": "Solid Python developer moving towards data engineering. " * 5,
+        },
+        "gap_analysis": None,
+        "is_sufficient": False,
+        "optimized_cv": {
+            "personal": {"name": "Martin Dupont", "title": "Data Engineer", "summary": "Python developer. " * 20},
+            "education": [{"degree": "Master", "school": "ULB", "start": "2013", "end": "2018"}],
+            "experience": [{"title": "Data Engineer", "company": "TechWave", "start": "2021", "end": "Present", "summary": "Pipelines. " * 40}] * 3,
+            "skills": ["Python", "Docker", "CI/CD", "SQL"],
+            "links": {"linkedin": "linkedin.com/in/martin", "github": "github.com/martin"},
+        },
+    }
+
+
+def run(name: str, store, count: int, session: dict) -> None:
+    keys = [str(uuid.uuid4()) for _ in range(count)]
+
+    started = time.perf_counter()
+    for key in keys:
+        store[key] = session
+    set_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for key in keys:
+        store[key]
+    get_seconds = time.perf_counter() - started
+
+    print(f"{name:<14} set {count / set_seconds:>10.0f}/s  get {count / get_seconds:>10.0f}/s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    session = sample_session()
+
+    plain_json = len(json.dumps(session).encode("utf-8"))
+    compact = len(encode_value(session))
+    print(f"Session payload: {plain_json} bytes with json.dumps, {compact} bytes encoded ({compact / plain_json:.0%})")
+
+    run("dict", {}, count, session)
+    run("BoundedStore", BoundedStore("bench", max_bytes=1 << 34), count, session)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run("SQLiteStore", SQLiteStore("bench", path=os.path.join(tmp_dir, "bench.sqlite3"), max_bytes=1 << 34), count, session)
+
+
+if __name__ == "__main__":
+    main()
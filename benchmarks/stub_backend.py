@@ -0,0 +1,134 @@
+"""
+Run backend.py with stub agents: no model calls, configurable latency.
+
+    python benchmarks/stub_backend.py [--port 8001] [--latency lognormal:1500,0.4] [--stub-render 0.3]
+
+Every agent call sleeps for a delay drawn from --latency (same specs as
+LLM_REPLAY_LATENCY) and returns a canned, valid JSON answer, so parsing,
+validation, sessions and rendering run as in production. --stub-render
+replaces DOCX rendering + PDF conversion with a fixed delay, for machines
+without LibreOffice/Word.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Every request must reach the stubs, and the SDK wants a key even though nothing is sent
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from sample_pdf import make_pdf
+
+STUB_RESPONSES = {
+    "job_analyzer": {
+        "job_title": "Senior Data Engineer",
+        "must_have_skills": ["Python", "Microsoft Fabric", "ETL", "CI/CD", "Team mentoring"],
+        "nice_to_have_skills": ["Azure", "Power BI", "Docker"],
+        "company_type": "Unknown",
+        "work_environment": ["Hybrid"],
+        "ats_keywords": ["data pipelines", "medallion architecture", "DevOps"],
+        "tone_of_voice": "Professional",
+        "key_responsibilities": ["Build data pipelines", "Coach the team"],
+        "company_culture_indicators": ["Growth"],
+        "technical_domains": ["Data", "DevOps"],
+        "urgency_level": "Normal",
+        "remote_work_policy": "Unknown",
+    },
+    "profile_analyzer": {
+        "candidate_name": "Martin Dupont",
+        "relevance_score_overall": 62,
+        "skills_match": {"Python": 8, "Docker": 6, "Microsoft Fabric": 1},
+        "experience_relevance": [
+            {"role": "Full-Stack Developer", "company": "TechWave", "period": "2021-", "relevance_score": 70, "relevance_notes": "Python, CI/CD"}
+        ],
+        "skills_gaps": ["Microsoft Fabric", "Power BI"],
+        "recommendations": ["Highlight data pipeline work"],
+        "summary": "Solid Python developer moving towards data engineering.",
+    },
+    "gap_analyzer": {
+        "overall_analysis": "Microsoft Fabric experience is missing.",
+        "missing_skills": ["Microsoft Fabric", "Medallion Architecture"],
+    },
+    "cv_generator": {
+        "personal": {"name": "Martin Dupont", "title": "Data Engineer", "email": "martin@example.com", "phone": "", "location": "Brussels", "summary": "Python developer moving to data engineering."},
+        "education": [{"degree": "Master", "school": "ULB", "start": "2013", "end": "2018"}],
+        "experience": [{"title": "Full-Stack Developer", "company": "TechWave", "start": "2021", "end": "Present", "summary": "Python services, Docker, GitLab CI/CD."}],
+        "skills": ["Python", "Docker", "CI/CD", "SQL"],
+        "links": {"linkedin": "linkedin.com/in/martin", "github": "github.com/martin"},
+    },
+}
+STUB_RESPONSES["fused_analyzer"] = {
+    "job_analysis": STUB_RESPONSES["job_analyzer"],
+    "profile_analysis": STUB_RESPONSES["profile_analyzer"],
+    "gap_analysis": STUB_RESPONSES["gap_analyzer"],
+}
+
+STUB_PDF = make_pdf(["Stub rendered CV"])
+
+
+def stub_response(agent_name: str) -> str:
+    data = json.loads(json.dumps(STUB_RESPONSES[agent_name]))
+    if agent_name == "cv_generator":
+        # Distinct CV data per call, so renders are not all artifact cache hits
+        data["personal"]["summary"] += f" ({uuid.uuid4().hex[:8]})"
+    return json.dumps(data)
+
+
+def stub_render_worker(cv_data, template_id, job_id):
+    """Runs in the render pool in place of the DOCX render + PDF conversion"""
+    started_at = time.time()
+    time.sleep(float(os.getenv("STUB_RENDER_SECONDS", "0.3")))
+    return {"pdf_bytes": STUB_PDF, "started_at": started_at, "finished_at": time.time()}
+
+
+def install_stubs(latency_spec: str, seed: int, stub_render_seconds=None) -> None:
+    from agent import AsyncAgentMixin, BaseAgent
+    from llm_replay import parse_latency
+    import render_queue
+
+    sample = parse_latency(latency_spec, seed)
+
+    async def stub_acomplete(self, messages, temperature):
+        await asyncio.sleep(sample(None))
+        return stub_response(self.cache_name)
+
+    def stub_complete(self, messages, temperature):
+        time.sleep(sample(None))
+        return stub_response(self.cache_name)
+
+    AsyncAgentMixin._acomplete = stub_acomplete
+    BaseAgent._complete = stub_complete
+
+    if stub_render_seconds is not None:
+        # Set before the render pool forks so the workers see it too
+        os.environ["STUB_RENDER_SECONDS"] = str(stub_render_seconds)
+        render_queue._render_worker = stub_render_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="lognormal:1500,0.4", help="agent latency spec (ms)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-render", type=float, default=None, metavar="SECONDS", help="replace rendering with a fixed delay")
+    args = parser.parse_args()
+
+    install_stubs(args.latency, args.seed, args.stub_render)
+
+    import uvicorn
+    from backend import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Render many CV contexts x templates through a process pool.
+
+    python -m create_cv.batch_render INPUT --templates create_cv/template1.docx,create_cv/template2.docx
+                                     [--out out/batch] [--workers N] [--docx] [--no-pdf] [--fresh]
+
+INPUT is a directory of *.json contexts (the file name is the CV id) or a
+JSONL file with one context per line (its "id" field, or the line number).
+Every worker reads and prepares each template once at startup (file bytes,
+patched XML, compiled Jinja) and reuses it for all its renders; only the
+.docx package itself is re-opened per render, as docxtpl renders into it. Output goes to OUT/<cv id>/<template>.pdf (and .docx with --docx).
+
+A failed render is logged and the run goes on. Each finished pair is
+appended to OUT/manifest.jsonl, so running the same command again resumes
+an interrupted run: pairs already rendered are skipped, failed ones are
+retried. --fresh ignores the manifest.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    from create_cv.python_cv_templates import convert_docx_bytes_to_pdf, get_template, render_template_to_bytes
+except ImportError:
+    # Run as a script from inside create_cv/
+    from python_cv_templates import convert_docx_bytes_to_pdf, get_template, render_template_to_bytes
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def _safe_id(cv_id: str) -> str:
+    # CV ids become directory names
+    return "".join(char if char.isalnum() or char in "-_." else "_" for char in cv_id).strip(".") or "_"
+
+
+def iter_contexts(source: Path, id_field: str = "id") -> Iterator[Tuple[str, Optional[dict], Optional[str]]]:
+    """Yield (cv_id, context, error) lazily; unreadable entries come with an error instead of a context"""
+    if source.is_dir():
+        for path in sorted(source.glob("*.json")):
+            try:
+                yield path.stem, json.loads(path.read_text(encoding="utf-8")), None
+            except (OSError, ValueError) as e:
+                yield path.stem, None, f"Invalid context: {e}"
+        return
+
+    with source.open("r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                context = json.loads(line)
+            except ValueError as e:
+                yield f"line{number:06d}", None, f"Invalid context: {e}"
+                continue
+            cv_id = context.get(id_field) if isinstance(context, dict) else None
+            yield _safe_id(str(cv_id)) if cv_id is not None else f"line{number:06d}", context, None
+
+
+def count_contexts(source: Path) -> int:
+    if source.is_dir():
+        return sum(1 for _ in source.glob("*.json"))
+    with source.open("r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def load_manifest(path: Path) -> Set[Tuple[str, str]]:
+    """Pairs rendered successfully by a previous run"""
+    done = set()
+    if not path.exists():
+        return done
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Last line cut short by an interruption
+                continue
+            if entry.get("status") == "ok":
+                done.add((entry["cv_id"], entry["template"]))
+    return done
+
+
+def _init_worker(template_paths: List[str]) -> None:
+    # Read and patch every template once in this process; each render then only
+    # re-opens the .docx package (docxtpl renders into it) and runs the compiled Jinja templates
+    for template_path in template_paths:
+        get_template(template_path).prepare()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".part")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _render_one(cv_id: str, context: dict, template_path: str, out_dir: str, keep_docx: bool, make_pdf: bool) -> Dict:
+    """Runs in a worker process: render one context with one template and write the outputs"""
+    started = time.perf_counter()
+    target_dir = Path(out_dir) / cv_id
+    target_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(template_path).stem
+
+    docx_bytes = render_template_to_bytes(template_path, context)
+    rendered = time.perf_counter()
+    if keep_docx or not make_pdf:
+        _write_atomic(target_dir / f"{stem}.docx", docx_bytes)
+    if make_pdf:
+        _write_atomic(target_dir / f"{stem}.pdf", convert_docx_bytes_to_pdf(docx_bytes))
+    finished = time.perf_counter()
+    return {"render_seconds": round(rendered - started, 3), "convert_seconds": round(finished - rendered, 3) if make_pdf else None}
+
+
+class Progress:
+    """One status line: done/total, failures, throughput and ETA"""
+
+    def __init__(self, total: int, interval: float = 1.0):
+        self.total = total
+        self.skipped = 0
+        self.interval = interval
+        self.ok = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self._last_print = 0.0
+
+    @property
+    def finished(self) -> int:
+        return self.ok + self.failed
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.finished / elapsed if elapsed else 0.0
+
+    def update(self, force: bool = False) -> None:
+        now = time.perf_counter()
+        if not force and now - self._last_print < self.interval:
+            return
+        self._last_print = now
+        rate = self.rate()
+        remaining = self.total - self.skipped - self.finished
+        eta = f"{remaining / rate:.0f}s" if rate else "-"
+        done = self.skipped + self.finished
+        sys.stderr.write(
+            f"\r[{done}/{self.total}] ok={self.ok} failed={self.failed} skipped={self.skipped} {rate:.2f}/s eta {eta}   "
+        )
+        sys.stderr.flush()
+
+
+def run(args) -> int:
+    source = Path(args.input)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_NAME
+
+    template_paths = [str(Path(path).resolve()) for path in args.templates.split(",") if path]
+    missing = [path for path in template_paths if not Path(path).exists()]
+    if missing:
+        print(f"Template(s) not found: {missing}", file=sys.stderr)
+        return 2
+
+    template_names = [Path(path).stem for path in template_paths]
+    if len(set(template_names)) != len(template_names):
+        print(f"Template names must be unique, they name the output files: {template_names}", file=sys.stderr)
+        return 2
+
+    if args.fresh and manifest_path.exists():
+        manifest_path.unlink()
+    done = load_manifest(manifest_path)
+    progress = Progress(count_contexts(source) * len(template_paths))
+
+    workers = args.workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    in_flight = {}
+
+    with manifest_path.open("a", encoding="utf-8") as manifest, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(template_paths,)
+    ) as executor:
+
+        def record(cv_id: str, template: str, status: str, **extra) -> None:
+            manifest.write(json.dumps({"cv_id": cv_id, "template": template, "status": status, **extra}) + "\n")
+            manifest.flush()
+            if status == "ok":
+                progress.ok += 1
+            else:
+                progress.failed += 1
+                print(f"\n{cv_id} x {template} failed: {extra.get('error')}", file=sys.stderr)
+            progress.update()
+
+        def drain(block_until: int) -> None:
+            while len(in_flight) > block_until:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    cv_id, template = in_flight.pop(future)
+                    try:
+                        record(cv_id, template, "ok", **future.result())
+                    except Exception as e:
+                        record(cv_id, template, "failed", error=str(e))
+
+        try:
+            for cv_id, context, error in iter_contexts(source, args.id_field):
+                for template_path, template in zip(template_paths, template_names):
+                    if (cv_id, template) in done:
+                        progress.skipped += 1
+                        continue
+                    if error is not None:
+                        record(cv_id, template, "failed", error=error)
+                        continue
+                    future = executor.submit(
+                        _render_one, cv_id, context, template_path, str(out_dir), args.docx, not args.no_pdf
+                    )
+                    in_flight[future] = (cv_id, template)
+                    # Bounded look-ahead: contexts are streamed, never all held in memory
+                    drain(max_in_flight)
+            drain(0)
+        except KeyboardInterrupt:
+            for future in in_flight:
+                future.cancel()
+            progress.update(force=True)
+            print(f"\nInterrupted; run the same command again to resume ({manifest_path})", file=sys.stderr)
+            return 130
+
+    progress.update(force=True)
+    elapsed = time.perf_counter() - progress.started
+    print(
+        f"\n{progress.ok} rendered, {progress.failed} failed, {progress.skipped} skipped in {elapsed:.1f}s "
+        f"({progress.rate():.2f} renders/s with {workers} workers)",
+        file=sys.stderr,
+    )
+    return 1 if progress.failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="directory of *.json contexts or a JSONL file")
+    parser.add_argument("--templates", default="create_cv/template1.docx,create_cv/template2.docx", help="comma-separated .docx templates")
+    parser.add_argument("--out", default="out/batch", help="output directory (holds the resume manifest)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--id-field", default="id", help="JSONL field naming each CV")
+    parser.add_argument("--docx", action="store_true", help="keep the rendered .docx next to the PDF")
+    parser.add_argument("--no-pdf", action="store_true", help="only render .docx, skip the PDF conversion")
+    parser.add_argument("--fresh", action="store_true", help="ignore the manifest of a previous run")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
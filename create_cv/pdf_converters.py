@@ -0,0 +1,315 @@
+import atexit
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional
+
+# DOCX -> PDF conversion backends.
+#
+# - docx2pdf: drives Microsoft Word, only works on Windows/macOS.
+# - libreoffice: a pool of warm headless LibreOffice processes served by
+#   unoserver; DOCX bytes go in over unoconvert's stdin and the PDF comes back
+#   on stdout, so there is no cold soffice start per document.
+#
+# Select with PDF_CONVERTER=docx2pdf|libreoffice (default: auto).
+
+
+class ConversionError(Exception):
+    pass
+
+
+class PdfConverter:
+    name = "base"
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=512)
+        self.conversions = 0
+        self.failures = 0
+        self.first_conversion_at: Optional[float] = None
+
+    def convert_bytes(self, docx_bytes: bytes) -> bytes:
+        raise NotImplementedError
+
+    def convert_file(self, input_docx: str, output_pdf: str) -> None:
+        pdf_bytes = self.convert_bytes(Path(input_docx).read_bytes())
+        Path(output_pdf).write_bytes(pdf_bytes)
+
+    def _record(self, started: float, ok: bool) -> None:
+        with self._stats_lock:
+            if self.first_conversion_at is None:
+                self.first_conversion_at = started
+            if ok:
+                self.conversions += 1
+                self._latencies.append(time.perf_counter() - started)
+            else:
+                self.failures += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            elapsed = time.perf_counter() - self.first_conversion_at if self.first_conversion_at else 0.0
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        return {
+            "backend": self.name,
+            "conversions": self.conversions,
+            "failures": self.failures,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_max": round(latencies[-1], 3) if latencies else None,
+            "throughput_per_second": round(self.conversions / elapsed, 3) if elapsed else None,
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class Docx2PdfConverter(PdfConverter):
+    """Microsoft Word through docx2pdf (Windows/macOS only)"""
+
+    name = "docx2pdf"
+
+    def convert_file(self, input_docx: str, output_pdf: str) -> None:
+        from docx2pdf import convert
+
+        started = time.perf_counter()
+        try:
+            convert(input_docx, output_pdf)
+        except Exception:
+            self._record(started, ok=False)
+            raise
+        self._record(started, ok=True)
+
+    def convert_bytes(self, docx_bytes: bytes) -> bytes:
+        # Private per-job directory: concurrent conversions never share files
+        with tempfile.TemporaryDirectory(prefix="cv_convert_", dir=private_tmp_root()) as tmp_dir:
+            input_docx = os.path.join(tmp_dir, "input.docx")
+            output_pdf = os.path.join(tmp_dir, "output.pdf")
+            Path(input_docx).write_bytes(docx_bytes)
+            self.convert_file(input_docx, output_pdf)
+            return Path(output_pdf).read_bytes()
+
+
+def private_tmp_root() -> Optional[str]:
+    """tmpfs (/dev/shm) when available, so per-job scratch files stay in memory"""
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return None
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LibreOfficeWorker:
+    """One warm soffice process behind an unoserver listening on a local port"""
+
+    def __init__(self, startup_timeout: float = 30.0):
+        self.startup_timeout = startup_timeout
+        self.port = _free_port()
+        self.uno_port = _free_port()
+        self.profile_dir = tempfile.mkdtemp(prefix="cv_lo_profile_")
+        self.jobs = 0
+        self.process = subprocess.Popen(
+            [
+                "unoserver",
+                "--interface", "127.0.0.1",
+                "--port", str(self.port),
+                "--uno-interface", "127.0.0.1",
+                "--uno-port", str(self.uno_port),
+                "--user-installation", Path(self.profile_dir).as_uri(),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self._wait_until_ready()
+
+    def _wait_until_ready(self) -> None:
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self.stop()
+                raise ConversionError(f"unoserver exited during startup with code {self.process.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise ConversionError(f"unoserver did not start within {self.startup_timeout}s")
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def convert(self, docx_bytes: bytes, timeout: float) -> bytes:
+        result = subprocess.run(
+            [
+                "unoconvert",
+                "--host", "127.0.0.1",
+                "--port", str(self.port),
+                "--convert-to", "pdf",
+                "-", "-",
+            ],
+            input=docx_bytes,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
+        )
+        self.jobs += 1
+        if result.returncode != 0 or not result.stdout:
+            raise ConversionError(f"unoconvert failed ({result.returncode}): {result.stderr.decode(errors='replace')[-500:]}")
+        return result.stdout
+
+    def stop(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class LibreOfficePoolConverter(PdfConverter):
+    """
+    Pool of warm headless LibreOffice workers.
+    A worker is recycled after max_jobs conversions, or right away if it
+    crashes or a conversion fails.
+    """
+
+    name = "libreoffice"
+
+    def __init__(self, size: int = 1, max_jobs: int = 200, timeout: float = 60.0):
+        super().__init__()
+        self.size = size
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.recycles = 0
+        self._idle: "queue.Queue[Optional[LibreOfficeWorker]]" = queue.Queue()
+        # Workers start lazily on first use; None marks a free slot
+        for _ in range(size):
+            self._idle.put(None)
+        self._all_workers = set()
+        self._closed = False
+
+    def _start_worker(self) -> LibreOfficeWorker:
+        worker = LibreOfficeWorker()
+        self._all_workers.add(worker)
+        return worker
+
+    def _retire(self, worker: LibreOfficeWorker) -> None:
+        self._all_workers.discard(worker)
+        worker.stop()
+        with self._stats_lock:
+            self.recycles += 1
+
+    def convert_bytes(self, docx_bytes: bytes) -> bytes:
+        if self._closed:
+            raise ConversionError("Converter pool is closed")
+        worker = self._idle.get()
+        started = time.perf_counter()
+        try:
+            if worker is not None and not worker.is_alive():
+                self._retire(worker)
+                worker = None
+            if worker is None:
+                worker = self._start_worker()
+            pdf_bytes = worker.convert(docx_bytes, self.timeout)
+        except Exception:
+            self._record(started, ok=False)
+            if worker is not None:
+                self._retire(worker)
+            self._idle.put(None)
+            raise
+
+        self._record(started, ok=True)
+        if worker.jobs >= self.max_jobs:
+            self._retire(worker)
+            worker = None
+        self._idle.put(worker)
+        return pdf_bytes
+
+    def stats(self) -> Dict[str, object]:
+        stats = super().stats()
+        stats.update({"pool_size": self.size, "recycles": self.recycles, "live_workers": len(self._all_workers)})
+        return stats
+
+    def close(self) -> None:
+        self._closed = True
+        for worker in list(self._all_workers):
+            worker.stop()
+        self._all_workers.clear()
+
+
+_converter: Optional[PdfConverter] = None
+_converter_lock = threading.Lock()
+
+
+def create_converter(backend: Optional[str] = None) -> PdfConverter:
+    backend = backend or os.getenv("PDF_CONVERTER", "auto")
+    if backend == "auto":
+        backend = "libreoffice" if sys.platform.startswith("linux") and shutil.which("unoserver") else "docx2pdf"
+    if backend == "libreoffice":
+        return LibreOfficePoolConverter(
+            size=int(os.getenv("LIBREOFFICE_WORKERS", "1")),
+            max_jobs=int(os.getenv("LIBREOFFICE_MAX_JOBS", "200")),
+            timeout=float(os.getenv("LIBREOFFICE_TIMEOUT", "60")),
+        )
+    if backend == "docx2pdf":
+        return Docx2PdfConverter()
+    raise ValueError(f"Unknown PDF_CONVERTER backend: {backend}")
+
+
+def current_converter() -> Optional[PdfConverter]:
+    """This process's converter if one was created, without starting it"""
+    return _converter
+
+
+def get_converter() -> PdfConverter:
+    """Process-wide converter, created on first use (one pool per render process)"""
+    global _converter
+    with _converter_lock:
+        if _converter is None:
+            _converter = create_converter()
+            atexit.register(_converter.close)
+        return _converter
+
+
+def main():
+    """Benchmark: python -m create_cv.pdf_converters sample.docx [conversions] [threads]"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    docx_path = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    docx_bytes = Path(docx_path).read_bytes()
+
+    converter = get_converter()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: converter.convert_bytes(docx_bytes), range(count)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{count} conversions in {elapsed:.2f}s with {threads} thread(s)")
+    for key, value in converter.stats().items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,156 @@
 from docxtpl import DocxTemplate
-from docx2pdf import convert
+from jinja2 import Environment
+import io
 import json
+import os
+import threading
 from pathlib import Path
 
+try:
+    from create_cv.pdf_converters import get_converter
+except ImportError:
+    # Run as a script from inside create_cv/
+    from pdf_converters import get_converter
+
+class CachingEnvironment(Environment):
+    """Jinja environment that compiles each template XML source only once"""
+
+    def __init__(self, max_entries: int = 64, **kwargs):
+        super().__init__(**kwargs)
+        self._compiled = {}
+        self._compiled_lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals or template_class:
+            return super().from_string(source, globals, template_class)
+        with self._compiled_lock:
+            template = self._compiled.get(source)
+        if template is None:
+            template = super().from_string(source)
+            with self._compiled_lock:
+                if len(self._compiled) >= self.max_entries:
+                    self._compiled.pop(next(iter(self._compiled)))
+                self._compiled[source] = template
+        return template
+
+FOOTNOTES_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.footnotes+xml"
+
+class PreparedDocxTemplate(DocxTemplate):
+    """
+    DocxTemplate that reuses the patched XML sources of its template file.
+    docxtpl's render_init re-opens the .docx package for every render, because rendering
+    replaces the document's body and header/footer parts in place: the package parse
+    cannot be shared. What can is the work done on the untouched template before Jinja
+    runs (serializing each part and patch_xml's regex cleanup), kept in `patched` per
+    template file and shared by every render of it. Relies on docxtpl's build_xml,
+    build_headers_footers_xml and render_footnotes hooks (checked against docxtpl 0.20).
+    """
+
+    def __init__(self, template_file, patched: dict):
+        super().__init__(template_file)
+        self._patched = patched
+
+    def _body_source(self) -> str:
+        source = self._patched.get("body")
+        if source is None:
+            source = self._patched["body"] = self.patch_xml(self.get_xml())
+        return source
+
+    def _part_source(self, part) -> tuple:
+        key = str(part.partname)
+        entry = self._patched.get(key)
+        if entry is None:
+            xml = self.get_part_xml(part)
+            entry = self._patched[key] = (self.get_headers_footers_encoding(xml), self.patch_xml(xml))
+        return entry
+
+    def _footnotes_source(self, part) -> str:
+        key = str(part.partname)
+        source = self._patched.get(key)
+        if source is None:
+            blob = part.blob.decode("utf-8") if isinstance(part.blob, bytes) else part.blob
+            source = self._patched[key] = self.patch_xml(blob)
+        return source
+
+    def _footnotes_parts(self):
+        return [part for part in self.docx.part.package.parts if part.content_type == FOOTNOTES_CONTENT_TYPE]
+
+    def prepare(self) -> "PreparedDocxTemplate":
+        """Fill the shared sources without rendering, e.g. when a worker starts"""
+        self.init_docx()
+        self._body_source()
+        for uri in (self.HEADER_URI, self.FOOTER_URI):
+            for _, part in self.get_headers_footers(uri):
+                self._part_source(part)
+        for part in self._footnotes_parts():
+            self._footnotes_source(part)
+        return self
+
+    def build_xml(self, context, jinja_env=None):
+        return self.render_xml_part(self._body_source(), self.docx._part, context, jinja_env)
+
+    def build_headers_footers_xml(self, context, uri, jinja_env=None):
+        for relKey, part in self.get_headers_footers(uri):
+            encoding, source = self._part_source(part)
+            yield relKey, self.render_xml_part(source, part, context, jinja_env).encode(encoding)
+
+    def render_footnotes(self, context, jinja_env=None):
+        jinja_env = jinja_env or Environment()
+        for part in self._footnotes_parts():
+            part._blob = self.render_xml_part(self._footnotes_source(part), part, context, jinja_env).encode("utf-8")
+
+# Template files keyed by absolute path: (mtime_ns, size, bytes, patched XML sources)
+_template_cache = {}
+_template_cache_lock = threading.Lock()
+_jinja_env = CachingEnvironment()
+
+def get_template(template_path: str) -> PreparedDocxTemplate:
+    """
+    Return a fresh template ready to render, reading the file only when it changes.
+    DocxTemplate cannot be deep-copied (its __getattr__ forwards to the docx), so each
+    call builds its own from the cached bytes; concurrent renders never share document
+    state, while the patched XML sources and their compiled Jinja templates (_jinja_env)
+    are prepared once per template file.
+    """
+    key = os.path.abspath(template_path)
+    stat = os.stat(key)
+    with _template_cache_lock:
+        entry = _template_cache.get(key)
+    if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+        with open(key, "rb") as f:
+            entry = (stat.st_mtime_ns, stat.st_size, f.read(), {})
+        with _template_cache_lock:
+            _template_cache[key] = entry
+    return PreparedDocxTemplate(io.BytesIO(entry[2]), entry[3])
+
+def clear_template_cache() -> None:
+    with _template_cache_lock:
+        _template_cache.clear()
+
 def load_context(json_path: str) -> dict:
     with open(json_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 def render_template(template_path: str, context: dict, output_docx: str) -> None:
-    doc = DocxTemplate(template_path)
-    doc.render(context)
+    doc = get_template(template_path)
+    doc.render(context, jinja_env=_jinja_env)
     doc.save(output_docx)
 
+def render_template_to_bytes(template_path: str, context: dict) -> bytes:
+    # Render into memory instead of a file in the working directory
+    doc = get_template(template_path)
+    doc.render(context, jinja_env=_jinja_env)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
 def convert_to_pdf(input_docx: str, output_pdf: str) -> None:
-    # Convert the docx to PDF
-    convert(input_docx, output_pdf)
+    # Convert the docx to PDF with the configured backend (PDF_CONVERTER)
+    get_converter().convert_file(input_docx, output_pdf)
+
+def convert_docx_bytes_to_pdf(docx_bytes: bytes) -> bytes:
+    return get_converter().convert_bytes(docx_bytes)
 
 def main():
     # templates = ["template1.docx", "template2.docx", "template3.docx"]
@@ -0,0 +1,220 @@
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# PRÉPARATION DU TEXTE DU CV
+# ===============================
+#
+# Entre l'extraction PyPDF2 et ProfileAnalyzerAgent : normalisation, suppression
+# des en-têtes/pieds de page répétés, découpage en sections et troncature à un
+# budget de tokens compté localement, sans appel réseau.
+
+DEFAULT_TOKEN_BUDGET = 3000
+
+# Canonical section -> headings that open it (compared after normalize_heading)
+SECTION_HEADINGS: Dict[str, List[str]] = {
+    "summary": ["summary", "profile", "professional summary", "about me", "objective", "profil", "resume", "a propos"],
+    "skills": ["skills", "technical skills", "core competencies", "competencies", "technologies", "tech stack", "competences", "competences techniques"],
+    "experience": ["experience", "experiences", "work experience", "professional experience", "employment history", "experience professionnelle", "experiences professionnelles", "parcours professionnel"],
+    "projects": ["projects", "personal projects", "key projects", "projets"],
+    "education": ["education", "formation", "formations", "academic background", "diplomes", "etudes"],
+    "certifications": ["certifications", "certificates", "certificats"],
+    "languages": ["languages", "langues"],
+    "interests": ["interests", "hobbies", "centres d interet", "loisirs"],
+}
+
+# Sections kept first when the text exceeds the budget; "header" is the text before the first heading
+SECTION_PRIORITY = ["header", "summary", "skills", "experience", "projects", "certifications", "education", "languages", "other", "interests"]
+
+_HEADING_LOOKUP = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+_PAGE_MARKER = re.compile(r"^(page\s*)?\d{1,3}(\s*(/|of|sur)\s*\d{1,3})?$", re.IGNORECASE)
+_BULLETS = re.compile(r"^[•●▪■‣⁃∙·➢✓*-]+\s*")
+# Lines repeated at least this often are headers/footers; shorter ones (dates, "Python") may legitimately repeat
+REPEATED_LINE_MIN_LENGTH = 12
+
+
+def _load_token_counter() -> Tuple[str, Callable[[str], int]]:
+    """tiktoken when it is installed and its encoding is available offline, else a local estimate"""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return "tiktoken", lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        # ~1 token per word piece, long words count once per 4 characters
+        pieces = re.compile(r"\w+|[^\w\s]")
+        return "estimate", lambda text: sum(-(-len(piece) // 4) for piece in pieces.findall(text))
+
+
+_token_counter: Optional[Tuple[str, Callable[[str], int]]] = None
+
+
+def count_tokens(text: str) -> int:
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = _load_token_counter()
+    return _token_counter[1](text)
+
+
+def token_counter_name() -> str:
+    count_tokens("")
+    return _token_counter[0]
+
+
+def normalize_heading(line: str) -> str:
+    line = unicodedata.normalize("NFKD", line.lower())
+    line = "".join(char for char in line if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^a-z]+", " ", line).split())
+
+
+def normalize_text(text: str) -> str:
+    """Fix ligatures, hyphenation and broken whitespace left by PDF extraction"""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace(" ", " ")
+    # "develop-\nment" -> "development"
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    lines = []
+    for line in text.split("\n"):
+        line = _BULLETS.sub("- ", line.strip())
+        line = re.sub(r"[ \t\f\v]+", " ", line)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def remove_noise_lines(lines: List[str]) -> List[str]:
+    """Drop page numbers, repeated headers/footers and consecutive duplicates"""
+    counts = Counter(line.casefold() for line in lines if len(line) >= REPEATED_LINE_MIN_LENGTH)
+    seen_repeated = set()
+    kept: List[str] = []
+    for line in lines:
+        if _PAGE_MARKER.match(line):
+            continue
+        key = line.casefold()
+        if counts.get(key, 0) > 1:
+            if key in seen_repeated:
+                continue
+            seen_repeated.add(key)
+        if line and kept and kept[-1].casefold() == key:
+            continue
+        if not line and (not kept or not kept[-1]):
+            continue
+        kept.append(line)
+    while kept and not kept[-1]:
+        kept.pop()
+    return kept
+
+
+def split_sections(lines: List[str]) -> List[Tuple[str, List[str]]]:
+    """Split on recognised headings; returns (section name, lines) in document order"""
+    sections: List[Tuple[str, List[str]]] = [("header", [])]
+    for line in lines:
+        section = _HEADING_LOOKUP.get(normalize_heading(line)) if len(line) <= 40 else None
+        if section is not None:
+            sections.append((section, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(name, body) for name, body in sections if any(body)]
+
+
+@dataclass
+class PreprocessResult:
+    text: str
+    original_tokens: int
+    tokens: int
+    token_budget: int
+    counter: str
+    sections: List[str] = field(default_factory=list)
+    truncated_sections: List[str] = field(default_factory=list)
+    dropped_sections: List[str] = field(default_factory=list)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "original_tokens": self.original_tokens,
+            "tokens": self.tokens,
+            "tokens_saved": self.tokens_saved,
+            "token_budget": self.token_budget,
+            "counter": self.counter,
+            "sections": self.sections,
+            "truncated_sections": self.truncated_sections,
+            "dropped_sections": self.dropped_sections,
+        }
+
+
+class CVPreprocessor:
+    """Normalise extracted CV text and fit it into token_budget, keeping the most useful sections"""
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+
+    def _fit(self, sections: List[Tuple[str, List[str]]]) -> Tuple[Dict[int, List[str]], List[str], List[str]]:
+        """Pick, per section index, the lines that fit in the budget, highest-priority sections first"""
+        order = sorted(
+            range(len(sections)),
+            key=lambda index: (SECTION_PRIORITY.index(sections[index][0]) if sections[index][0] in SECTION_PRIORITY else SECTION_PRIORITY.index("other"), index)
+        )
+        remaining = self.token_budget
+        kept: Dict[int, List[str]] = {}
+        truncated, dropped = [], []
+        for index in order:
+            name, body = sections[index]
+            body_tokens = count_tokens("\n".join(body))
+            if body_tokens <= remaining:
+                kept[index] = body
+                remaining -= body_tokens
+                continue
+            partial = []
+            for line in body:
+                line_tokens = count_tokens(line) + 1
+                if line_tokens > remaining:
+                    break
+                partial.append(line)
+                remaining -= line_tokens
+            # A lone heading is not worth its tokens
+            if len(partial) > 1 or (partial and index == 0):
+                kept[index] = partial
+                truncated.append(name)
+            else:
+                remaining += sum(count_tokens(line) + 1 for line in partial)
+                dropped.append(name)
+        return kept, truncated, dropped
+
+    def process(self, text: str) -> PreprocessResult:
+        original_tokens = count_tokens(text)
+        lines = remove_noise_lines(normalize_text(text).split("\n"))
+        sections = split_sections(lines)
+
+        kept, truncated, dropped = {index: body for index, (_, body) in enumerate(sections)}, [], []
+        if count_tokens("\n".join(lines)) > self.token_budget:
+            kept, truncated, dropped = self._fit(sections)
+
+        prepared = "\n".join("\n".join(kept[index]) for index in sorted(kept)).strip()
+        result = PreprocessResult(
+            text=prepared,
+            original_tokens=original_tokens,
+            tokens=count_tokens(prepared),
+            token_budget=self.token_budget,
+            counter=token_counter_name(),
+            sections=[name for name, _ in sections],
+            truncated_sections=truncated,
+            dropped_sections=dropped,
+        )
+        logger.info(
+            f"CV text preprocessed: {result.original_tokens} -> {result.tokens} tokens "
+            f"({result.tokens_saved} saved, budget {self.token_budget}, {result.counter})"
+        )
+        return result
+
+
+def create_preprocessor() -> CVPreprocessor:
+    """Preprocessor configured by CV_TOKEN_BUDGET"""
+    return CVPreprocessor(token_budget=int(os.getenv("CV_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET))))
@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from create_cv.pdf_converters import private_tmp_root
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# APERÇUS PNG DES CV RENDUS
+# ===============================
+#
+# Première page du PDF rendu, rastérisée en PNG à quelques largeurs fixes.
+# La clé (clé d'artefact du PDF, dérivée des données du CV et du template,
+# + taille) sert à la fois de nom dans le cache disque et d'ETag : une
+# revalidation se règle sans rendre, relire ni rastériser le PDF.
+# Backend : PyMuPDF s'il est installé, sinon pdftoppm (poppler-utils).
+
+# Preview widths in pixels
+PREVIEW_SIZES = {"small": 240, "medium": 480, "large": 960}
+DEFAULT_PREVIEW_SIZE = "medium"
+
+PDFTOPPM_TIMEOUT = float(os.getenv("PREVIEW_RASTER_TIMEOUT", "30"))
+
+
+class PreviewUnavailable(Exception):
+    """No rasterizer is installed, or it failed on this PDF"""
+
+
+def preview_key(source_key: str, size: str) -> str:
+    """Cache key and ETag of one preview: the rendered PDF's artifact key (CV data + template) plus the width"""
+    return hashlib.sha256(f"{source_key}:{PREVIEW_SIZES[size]}".encode("utf-8")).hexdigest()
+
+
+def _rasterize_pymupdf(pdf_bytes: bytes, width: int) -> Optional[bytes]:
+    try:
+        import fitz
+    except ImportError:
+        return None
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as document:
+        if document.page_count == 0:
+            raise PreviewUnavailable("PDF has no pages")
+        page = document[0]
+        zoom = width / page.rect.width
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("png")
+
+
+def _rasterize_pdftoppm(pdf_bytes: bytes, width: int) -> Optional[bytes]:
+    if shutil.which("pdftoppm") is None:
+        return None
+    with tempfile.TemporaryDirectory(prefix="cv_preview_", dir=private_tmp_root()) as tmp_dir:
+        input_pdf = os.path.join(tmp_dir, "input.pdf")
+        output_root = os.path.join(tmp_dir, "page")
+        Path(input_pdf).write_bytes(pdf_bytes)
+        result = subprocess.run(
+            ["pdftoppm", "-png", "-f", "1", "-l", "1", "-singlefile", "-scale-to-x", str(width), "-scale-to-y", "-1", input_pdf, output_root],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=PDFTOPPM_TIMEOUT,
+        )
+        output_png = Path(output_root + ".png")
+        if result.returncode != 0 or not output_png.exists():
+            raise PreviewUnavailable(f"pdftoppm failed ({result.returncode}): {result.stderr.decode(errors='replace')[-300:]}")
+        return output_png.read_bytes()
+
+
+def rasterize_first_page(pdf_bytes: bytes, size: str) -> bytes:
+    """PNG of the PDF's first page at the width of the given size name (blocking)"""
+    width = PREVIEW_SIZES[size]
+    for rasterize in (_rasterize_pymupdf, _rasterize_pdftoppm):
+        png_bytes = rasterize(pdf_bytes, width)
+        if png_bytes is not None:
+            return png_bytes
+    raise PreviewUnavailable("No PDF rasterizer available: install PyMuPDF or poppler-utils (pdftoppm)")
+
+
+def resolve_static_previews(images: Dict[str, str], search_dirs: List[str]) -> Dict[str, Path]:
+    """Locate each template's sample image once, in the first search directory that has it"""
+    resolved = {}
+    for template_id, image_file in images.items():
+        for directory in search_dirs:
+            path = Path(directory) / image_file
+            if path.is_file():
+                resolved[template_id] = path.resolve()
+                break
+        else:
+            logger.warning(f"Preview image {image_file} for {template_id} not found in {search_dirs}")
+    return resolved
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers etag (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return etag.removeprefix("W/") in (candidate.removeprefix("W/") for candidate in candidates)
@@ -0,0 +1,69 @@
+import logging
+import os
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Registered templates, relative to the project root
+TEMPLATES = {
+    'template1': 'create_cv/template1.docx',
+    'template2': 'create_cv/template2.docx'
+}
+DEFAULT_TEMPLATE = 'template1'
+
+def generate_cv_with_template(cv_data: Dict, template_id: str, render_id: str, timings: Optional[Dict[str, float]] = None) -> bytes:
+    """Generate CV using the template system and return the PDF bytes (nothing is written to the CWD).
+    
+    When given, timings receives the render_template and convert_to_pdf durations in seconds.
+    """
+    
+    logger.info(f"Starting CV generation with template_id: {template_id}, render_id: {render_id}")
+    logger.info(f"CV data keys: {list(cv_data.keys())}")
+    
+    template_file = TEMPLATES.get(template_id, TEMPLATES[DEFAULT_TEMPLATE])
+    logger.info(f"Using template file: {template_file}")
+    
+    try:
+        # Check if template exists BEFORE importing
+        if not Path(template_file).exists():
+            logger.error(f"Template file not found: {template_file}")
+            logger.info(f"Current working directory: {os.getcwd()}")
+            logger.info(f"Files in create_cv/: {list(Path('create_cv').glob('*')) if Path('create_cv').exists() else 'create_cv directory not found'}")
+            raise Exception(f"Template {template_file} not found. Please ensure template files are in the create_cv/ directory")
+        
+        # Import the CV generation functions AFTER checking template exists
+        try:
+            from create_cv.python_cv_templates import render_template_to_bytes, convert_docx_bytes_to_pdf
+            logger.info("Successfully imported CV template functions")
+        except ImportError as e:
+            logger.error(f"Import error: {e}")
+            logger.info(f"Python path: {os.sys.path}")
+            raise Exception(f"CV template functions not found. Error: {str(e)}. Make sure python_cv_templates.py is in create_cv/ folder and dependencies are installed.")
+        
+        logger.info("Rendering template...")
+        started = time.perf_counter()
+        docx_bytes = render_template_to_bytes(template_file, cv_data)
+        if timings is not None:
+            timings["render_template"] = time.perf_counter() - started
+        logger.info(f"Template rendered ({len(docx_bytes)} bytes)")
+        
+        logger.info("Converting to PDF...")
+        started = time.perf_counter()
+        pdf_bytes = convert_docx_bytes_to_pdf(docx_bytes)
+        if timings is not None:
+            timings["convert_to_pdf"] = time.perf_counter() - started
+        logger.info(f"Generated PDF size: {len(pdf_bytes)} bytes")
+        
+        if not pdf_bytes:
+            raise Exception("PDF file is empty")
+        
+        logger.info(f"CV generation completed successfully: {render_id}")
+        return pdf_bytes
+        
+    except Exception as e:
+        logger.error(f"Error in CV generation: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise Exception(f"Failed to generate CV: {str(e)}")
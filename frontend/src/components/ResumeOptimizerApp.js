@@ -76,8 +76,37 @@ const apiService = {
       throw new Error('Failed to generate final CV');
     }
     
-    // Return blob for PDF download
-    return await response.blob();
+    // Rendering runs as a background job: poll its status, then download the PDF
+    const job = await response.json();
+    const deadline = Date.now() + 5 * 60 * 1000;
+    
+    while (Date.now() < deadline) {
+      const statusResponse = await fetch(`${API_BASE_URL}/analysis-status/${analysisId}`);
+      if (!statusResponse.ok) {
+        throw new Error('Failed to check final CV status');
+      }
+      
+      const status = await statusResponse.json();
+      const renderJob = (status.render_jobs || []).find((item) => item.job_id === job.job_id);
+      
+      if (renderJob && renderJob.status === 'failed') {
+        throw new Error(renderJob.error || 'Failed to generate final CV');
+      }
+      
+      if (renderJob && renderJob.status === 'done') {
+        const pdfResponse = await fetch(`${API_BASE_URL}/download-cv/${job.job_id}`);
+        if (!pdfResponse.ok) {
+          throw new Error('Failed to download final CV');
+        }
+        
+        // Return blob for PDF download
+        return await pdfResponse.blob();
+      }
+      
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+    
+    throw new Error('Timed out waiting for final CV');
   }
 };
 
@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# ===============================
+# CACHE DES RÉPONSES LLM
+# ===============================
+#
+# Deux niveaux : un LRU en mémoire devant une base SQLite sur disque.
+# Les valeurs sont les résultats déjà validés par pydantic (model_dump),
+# donc un hit ne refait ni l'appel réseau ni le parsing.
+# Les lectures disque ne commitent rien : les dates d'accès (pour l'ordre
+# d'éviction) sont groupées et écrites avec le prochain set() ou par lots.
+# aget()/aset() font les accès SQLite dans un thread, hors boucle d'événements.
+
+DEFAULT_CACHE_PATH = ".cache/llm_cache.sqlite3"
+
+
+def normalize_content(content: str) -> str:
+    """Normalise les espaces pour que deux textes identiques à la mise en forme près partagent une clé"""
+    return " ".join(content.split())
+
+
+def make_cache_key(agent: str, model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    system_prompt = "\n".join(m["content"] for m in messages if m["role"] == "system")
+    user_content = "\n".join(normalize_content(m["content"]) for m in messages if m["role"] != "system")
+    payload = json.dumps(
+        [agent, model, normalize_content(system_prompt), user_content, float(temperature)],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Cache LRU mémoire + SQLite avec TTL et éviction par taille"""
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        memory_entries: int = 512,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 7 * 24 * 3600,
+        access_batch: int = 64,
+    ):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.access_batch = access_batch
+
+        self._memory: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        # key -> last read time, not yet written to the accessed column
+        self._pending_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_bytes = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " agent TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+            self._conn.commit()
+            self._purge_expired()
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            self._disk_bytes = row[0]
+
+    def _is_expired(self, created: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - created > self.ttl_seconds
+
+    def _remember(self, key: str, created: float, value: Any) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str, now: float) -> Optional[Any]:
+        """Memory tier only; caller holds the lock. Counts hits, not misses"""
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if self._is_expired(created, now):
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        self.hits_memory += 1
+        return value
+
+    def _flush_access(self) -> None:
+        """Write the batched read times; caller holds the lock and commits"""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE llm_cache SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._pending_access.items()],
+            )
+            self._pending_access.clear()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            value = self._memory_get(key, now)
+            if value is not None:
+                return value
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, size, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value_json, size, created = row
+                    if self._is_expired(created, now):
+                        self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self._conn.commit()
+                        self._disk_bytes -= size
+                        self.expired += 1
+                    else:
+                        self._pending_access[key] = now
+                        if len(self._pending_access) >= self.access_batch:
+                            self._flush_access()
+                            self._conn.commit()
+                        value = json.loads(value_json)
+                        self._remember(key, created, value)
+                        self.hits_disk += 1
+                        return value
+
+            self.misses += 1
+            return None
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for coroutines: memory hits inline, SQLite reads in a worker thread"""
+        with self._lock:
+            value = self._memory_get(key, time.time())
+        if value is not None or self._conn is None:
+            if value is None:
+                with self._lock:
+                    self.misses += 1
+            return value
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key: str, agent: str, value: Any) -> None:
+        now = time.time()
+        value_json = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        size = len(value_json.encode("utf-8"))
+        with self._lock:
+            self._remember(key, now, value)
+            self.stores += 1
+            if self._conn is None or size > self.max_disk_bytes:
+                return
+
+            # Eviction picks the least recently read rows: bring read times up to date first
+            self._flush_access()
+            previous = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if previous is not None:
+                self._disk_bytes -= previous[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, agent, value, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, agent, value_json, size, now, now),
+            )
+            self._disk_bytes += size
+            self._evict_to_size()
+            self._conn.commit()
+
+    async def aset(self, key: str, agent: str, value: Any) -> None:
+        """set() for coroutines, with the SQLite write in a worker thread"""
+        if self._conn is None:
+            self.set(key, agent, value)
+        else:
+            await asyncio.to_thread(self.set, key, agent, value)
+
+    def _evict_to_size(self) -> None:
+        """Supprime les entrées les moins récemment lues tant que la base dépasse max_disk_bytes"""
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY accessed ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                self._pending_access.pop(key, None)
+                self._disk_bytes -= size
+                self.evictions += 1
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+
+    def _purge_expired(self) -> None:
+        if not self.ttl_seconds:
+            return
+        cursor = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_seconds,)
+        )
+        self.expired += cursor.rowcount
+        self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._pending_access.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+            self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            lookups = hits + self.misses
+            disk_entries = 0
+            if self._conn is not None:
+                disk_entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {
+                "hits": hits,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[LLMCache]:
+    """Cache partagé configuré par variables d'environnement (None si LLM_CACHE_ENABLED=0)"""
+    global _default_cache
+    if os.getenv("LLM_CACHE_ENABLED", "1") == "0":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH) or None,
+                memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512")),
+                max_disk_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            )
+        return _default_cache
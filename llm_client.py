@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import openai
+
+from llm_replay import create_transports
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# CLIENT HTTP PARTAGÉ
+# ===============================
+#
+# Un seul pool de connexions (keep-alive) pour tous les agents, sync et async,
+# avec des timeouts explicites et un retry exponentiel avec jitter sur les
+# 429/5xx. Les retries du SDK sont désactivés pour que ce module les compte.
+# Un délai global (deadline) borne la durée totale d'un appel, retries compris :
+# un retry n'est lancé que s'il peut finir à temps, en supposant qu'il dure
+# autant que la tentative échouée (un timeout ne relance pas un timeout complet).
+# OPENAI_BASE_URL permet de pointer vers un serveur local pour les tests.
+
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """
+    Full-jitter exponential backoff; honours Retry-After when the server sends one.
+    deadline: seconds from the first attempt after which no retry would finish; None for no limit
+    """
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 20.0, deadline: Optional[float] = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.deadline_exceeded = 0
+        self.sleep_seconds = 0.0
+        self.retries_by_reason: Counter = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def should_retry(self, error: Exception) -> bool:
+        if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+            return True
+        return _status_code(error) in RETRY_STATUS_CODES
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _start(self) -> None:
+        with self._lock:
+            self.attempts += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _finish(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _on_error(self, attempt: int, error: Exception, elapsed: float, attempt_seconds: float) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up"""
+        if attempt >= self.max_retries or not self.should_retry(error):
+            with self._lock:
+                self.gave_up += 1
+            return None
+        delay = self.delay(attempt, error)
+        reason = str(_status_code(error) or type(error).__name__)
+        if self.deadline is not None and elapsed + delay + attempt_seconds > self.deadline:
+            with self._lock:
+                self.gave_up += 1
+                self.deadline_exceeded += 1
+            logger.warning(f"LLM call failed ({reason}) after {elapsed:.1f}s, no retry: it would end past the {self.deadline:.0f}s deadline")
+            return None
+        with self._lock:
+            self.retries += 1
+            self.sleep_seconds += delay
+            self.retries_by_reason[reason] += 1
+        logger.warning(f"LLM call failed ({reason}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        return delay
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            self._start()
+            attempt_started = time.monotonic()
+            try:
+                return fn()
+            except Exception as e:
+                now = time.monotonic()
+                delay = self._on_error(attempt, e, now - started, now - attempt_started)
+                if delay is None:
+                    raise
+            finally:
+                self._finish()
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        attempt = 0
+        started = time.monotonic()
+        while True:
+            self._start()
+            attempt_started = time.monotonic()
+            try:
+                return await fn()
+            except Exception as e:
+                now = time.monotonic()
+                delay = self._on_error(attempt, e, now - started, now - attempt_started)
+                if delay is None:
+                    raise
+            finally:
+                self._finish()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "gave_up": self.gave_up,
+                "deadline": self.deadline,
+                "deadline_exceeded": self.deadline_exceeded,
+                "retry_sleep_seconds": round(self.sleep_seconds, 3),
+                "retries_by_reason": dict(self.retries_by_reason),
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+            }
+
+
+def _pool_stats(http_client: Any) -> Dict[str, Any]:
+    """Open/idle connections of the httpcore pool behind an httpx client, when it can be inspected"""
+    transport = http_client._transport
+    transport = getattr(transport, "inner", transport)
+    try:
+        connections = transport._pool.connections
+    except AttributeError:
+        return {}
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"connections": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+class LLMClients:
+    """OpenAI sync and async clients over pooled keep-alive httpx connections, with one retry policy"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        timeout: float = 60.0,
+        retry: Optional[RetryPolicy] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.transport = transport
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        http_timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        # A custom transport (record/replay) brings its own pool, limits are then set on it
+        self.sync_http = httpx.Client(limits=limits, timeout=http_timeout, transport=transport)
+        self.async_http = httpx.AsyncClient(limits=limits, timeout=http_timeout, transport=async_transport)
+
+        # A local stand-in server or replayed fixtures do not check the key, but the SDK refuses to start without one
+        api_key = api_key or ("local" if base_url or transport is not None else None)
+        self.sync = openai.OpenAI(api_key=api_key, base_url=base_url, http_client=self.sync_http, max_retries=0)
+        self.async_client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self.async_http, max_retries=0)
+        self.retry = retry or RetryPolicy()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url or "default",
+            "max_connections": self.max_connections,
+            "pool": {"sync": _pool_stats(self.sync_http), "async": _pool_stats(self.async_http)},
+            "retry": self.retry.stats(),
+            "fixtures": self.transport.store.stats() if hasattr(self.transport, "store") else None,
+        }
+
+    def close(self) -> None:
+        self.sync_http.close()
+
+    async def aclose(self) -> None:
+        await self.async_http.aclose()
+        self.sync_http.close()
+
+
+def agent_timeout(agent_name: str, default: Optional[float]) -> Optional[float]:
+    """Per-agent request timeout, overridable with LLM_TIMEOUT_<AGENT> (e.g. LLM_TIMEOUT_CV_GENERATOR)"""
+    value = os.getenv(f"LLM_TIMEOUT_{agent_name.upper()}")
+    return float(value) if value else default
+
+
+_default_clients: Optional[LLMClients] = None
+_default_clients_lock = threading.Lock()
+
+
+def get_llm_clients() -> LLMClients:
+    """Process-wide clients configured by OPENAI_BASE_URL, OPENAI_API_KEY and the LLM_* variables"""
+    global _default_clients
+    with _default_clients_lock:
+        if _default_clients is None:
+            max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+            max_keepalive_connections = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+            keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+            # LLM_TRANSPORT=record|replay puts the fixture transport under both clients
+            transport, async_transport = create_transports(
+                httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                )
+            )
+            _default_clients = LLMClients(
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+                connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+                timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+                retry=RetryPolicy(
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+                    base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")),
+                    max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "20")),
+                    # 0 disables the deadline
+                    deadline=float(os.getenv("LLM_RETRY_DEADLINE", "90")) or None,
+                ),
+                transport=transport,
+                async_transport=async_transport,
+            )
+        return _default_clients
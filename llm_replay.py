@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# ENREGISTREMENT / REJEU DES APPELS AU MODÈLE
+# ===============================
+#
+# Transport httpx placé sous les clients OpenAI partagés :
+# - record : l'appel part vers l'API et la réponse est écrite dans un fichier fixture
+# - replay : la réponse vient de la fixture, après une latence synthétique tirée
+#   d'une distribution configurable ; aucun accès réseau
+# Le cache LLM court-circuiterait le transport : le désactiver (LLM_CACHE_ENABLED=0)
+# pour mesurer le pipeline.
+
+DEFAULT_FIXTURES_DIR = "benchmarks/fixtures/llm"
+
+
+def request_key(request: httpx.Request) -> str:
+    """Stable key of an API call: method, path and canonical JSON body"""
+    try:
+        body: Any = json.loads(request.content or b"null")
+        body = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    except ValueError:
+        body = request.content.decode("utf-8", "replace")
+    payload = f"{request.method} {request.url.path}\n{body}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Number of values each latency distribution takes
+LATENCY_ARGS = {"none": 0, "recorded": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+
+def parse_latency(spec: str, seed: Optional[int] = None) -> Callable[[Optional[float]], float]:
+    """
+    Latency sampler in seconds from a spec (all values in milliseconds):
+    none | recorded | fixed:MS | uniform:LOW,HIGH | normal:MEAN,STD | lognormal:MEDIAN,SIGMA
+    The sampler receives the recorded latency, used by "recorded".
+    """
+    rng = random.Random(seed)
+    kind, _, args = spec.partition(":")
+    raw = [float(value) for value in args.split(",") if value.strip()]
+    values = [value / 1000 for value in raw]
+    # Checked here, not on the first sample, so a bad spec fails at startup
+    if kind in LATENCY_ARGS and len(raw) != LATENCY_ARGS[kind]:
+        raise ValueError(f"Latency distribution {kind!r} takes {LATENCY_ARGS[kind]} value(s), got {spec!r}")
+
+    if kind == "none":
+        return lambda recorded: 0.0
+    if kind == "recorded":
+        return lambda recorded: recorded or 0.0
+    if kind == "fixed":
+        return lambda recorded: values[0]
+    if kind == "uniform":
+        return lambda recorded: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda recorded: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        # Median in ms, sigma unitless: "lognormal:2000,0.5"
+        median, sigma = values[0], raw[1]
+        return lambda recorded: rng.lognormvariate(0, sigma) * median
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FixtureStore:
+    """One JSON file per recorded call, named by its request key"""
+
+    def __init__(self, directory: str = DEFAULT_FIXTURES_DIR):
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            fixture = json.loads(self.path_for(key).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fixture
+
+    def save(self, key: str, request: httpx.Request, response: httpx.Response, latency: float) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            request_body = json.loads(request.content or b"null")
+        except ValueError:
+            request_body = request.content.decode("utf-8", "replace")
+        fixture = {
+            "request": {"method": request.method, "path": request.url.path, "body": request_body},
+            "response": {
+                "status": response.status_code,
+                "content_type": response.headers.get("content-type", "application/json"),
+                "body": response.text,
+            },
+            "latency_ms": round(latency * 1000, 1),
+            "recorded_at": time.time(),
+        }
+        tmp_path = self.path_for(key).with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(fixture, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path_for(key))
+        self.recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"directory": str(self.directory), "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+def _fixture_response(request: httpx.Request, fixture: Optional[Dict[str, Any]]) -> httpx.Response:
+    if fixture is None:
+        # A 404 is surfaced by the SDK as NotFoundError, which is not retried
+        body = {"error": {"message": "No recorded fixture for this request", "type": "fixture_missing"}}
+        return httpx.Response(404, json=body, request=request)
+    recorded = fixture["response"]
+    return httpx.Response(
+        recorded["status"],
+        headers={"content-type": recorded["content_type"]},
+        content=recorded["body"].encode("utf-8"),
+        request=request,
+    )
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Record (forward + save) or replay (load + synthetic latency) for the sync client"""
+
+    def __init__(self, mode: str, store: FixtureStore, latency: Callable[[Optional[float]], float], inner: Optional[httpx.BaseTransport] = None):
+        self.mode = mode
+        self.store = store
+        self.latency = latency
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        if self.mode == "replay":
+            fixture = self.store.load(key)
+            time.sleep(self.latency(fixture["latency_ms"] / 1000 if fixture else None))
+            return _fixture_response(request, fixture)
+
+        started = time.perf_counter()
+        response = self.inner.handle_request(request)
+        response.read()
+        if response.status_code < 400:
+            self.store.save(key, request, response, time.perf_counter() - started)
+        return response
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """Same as ReplayTransport for the async client"""
+
+    def __init__(self, mode: str, store: FixtureStore, latency: Callable[[Optional[float]], float], inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.mode = mode
+        self.store = store
+        self.latency = latency
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        if self.mode == "replay":
+            fixture = self.store.load(key)
+            await asyncio.sleep(self.latency(fixture["latency_ms"] / 1000 if fixture else None))
+            return _fixture_response(request, fixture)
+
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        await response.aread()
+        if response.status_code < 400:
+            self.store.save(key, request, response, time.perf_counter() - started)
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def create_transports(
+    limits: Optional[httpx.Limits] = None,
+) -> Tuple[Optional[httpx.BaseTransport], Optional[httpx.AsyncBaseTransport]]:
+    """
+    Transports selected by LLM_TRANSPORT=live|record|replay, or (None, None) for live calls.
+    LLM_FIXTURES_DIR, LLM_REPLAY_LATENCY and LLM_REPLAY_SEED configure record/replay.
+    """
+    mode = os.getenv("LLM_TRANSPORT", "live")
+    if mode == "live":
+        return None, None
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unknown LLM_TRANSPORT: {mode}")
+
+    store = FixtureStore(os.getenv("LLM_FIXTURES_DIR", DEFAULT_FIXTURES_DIR))
+    seed = os.getenv("LLM_REPLAY_SEED")
+    latency = parse_latency(os.getenv("LLM_REPLAY_LATENCY", "recorded"), int(seed) if seed else None)
+    inner_kwargs = {"limits": limits} if limits is not None else {}
+    logger.info(f"LLM transport in {mode} mode ({store.directory})")
+    return (
+        ReplayTransport(mode, store, latency, httpx.HTTPTransport(**inner_kwargs)),
+        AsyncReplayTransport(mode, store, latency, httpx.AsyncHTTPTransport(**inner_kwargs)),
+    )
@@ -0,0 +1,238 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# ORDONNANCEUR DES APPELS AU MODÈLE
+# ===============================
+#
+# Les limites du fournisseur sont par compte : chaque appel passe d'abord par
+# deux seaux à jetons (requêtes/minute et tokens/minute) partagés par tout le
+# process. Les appels interactifs passent devant le travail en masse (batch),
+# et une surcharge se traduit par une courte attente plutôt que par des 429.
+# Les seaux vivent dans chaque process : avec N workers uvicorn, chacun ne
+# reçoit que 1/N des limites du compte (N lu dans WEB_CONCURRENCY).
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Priority of the LLM calls made from the current request/task
+llm_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+POLL_SECONDS = 0.05
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the enclosed calls (and tasks created inside) at the given priority"""
+    token = llm_priority.set(level)
+    try:
+        yield
+    finally:
+        llm_priority.reset(token)
+
+
+class SchedulerTimeout(Exception):
+    """Raised when a call waited longer than max_wait for its turn"""
+
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second, up to one minute of budget"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+    def refill(self, now: float) -> None:
+        if self.unlimited:
+            return
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        if self.unlimited:
+            return 0.0
+        # A request larger than the whole bucket only waits for a full bucket
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.per_minute)
+
+    def take(self, amount: float) -> None:
+        # A negative amount is a refund (usage below the estimate); it never fills past capacity
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level - amount)
+
+
+class LLMScheduler:
+    """
+    Admission control for outbound LLM calls.
+    - requests_per_minute / tokens_per_minute: account budget, 0 for unlimited
+    - max_wait: seconds a call may queue before SchedulerTimeout
+    Only the waiter at the head of the queue (lowest priority value, then FIFO) may take budget.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, max_wait: float = 120.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._queue: list = []
+        self._sequence = itertools.count()
+
+        self.admitted = 0
+        self.timeouts = 0
+        self.max_queue_depth = 0
+        self._waits: Dict[int, deque] = {level: deque(maxlen=1000) for level in PRIORITY_NAMES}
+
+    def _enqueue(self, level: int) -> Tuple[int, int]:
+        entry = (level, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._queue, entry)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        return entry
+
+    def _try_admit(self, entry: Tuple[int, int], tokens: int) -> float:
+        """Take the budget and return 0 if entry may go now, else the seconds worth waiting"""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            if self._queue[0] != entry:
+                return POLL_SECONDS
+            wait = max(self.requests.seconds_until(1), self.tokens.seconds_until(tokens))
+            if wait > 0:
+                return min(wait, POLL_SECONDS * 10)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            heapq.heappop(self._queue)
+            self.admitted += 1
+            return 0.0
+
+    def _leave(self, entry: Tuple[int, int]) -> None:
+        with self._lock:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+
+    def _record(self, level: int, started: float) -> None:
+        waited = time.monotonic() - started
+        with self._lock:
+            self._waits[level].append(waited)
+        if waited >= 1:
+            logger.info(f"LLM call waited {waited:.2f}s for rate budget ({PRIORITY_NAMES.get(level, level)})")
+
+    def _check_timeout(self, entry: Tuple[int, int], started: float) -> None:
+        if time.monotonic() - started > self.max_wait:
+            self._leave(entry)
+            with self._lock:
+                self.timeouts += 1
+            raise SchedulerTimeout(f"No LLM rate budget after {self.max_wait:.0f}s")
+
+    async def acquire(self, tokens: int, level: Optional[int] = None) -> None:
+        level = llm_priority.get() if level is None else level
+        entry = self._enqueue(level)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_admit(entry, tokens)
+                if wait == 0:
+                    break
+                self._check_timeout(entry, started)
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self._leave(entry)
+            raise
+        self._record(level, started)
+
+    def acquire_sync(self, tokens: int, level: Optional[int] = None) -> None:
+        level = llm_priority.get() if level is None else level
+        entry = self._enqueue(level)
+        started = time.monotonic()
+        while True:
+            wait = self._try_admit(entry, tokens)
+            if wait == 0:
+                break
+            self._check_timeout(entry, started)
+            time.sleep(wait)
+        self._record(level, started)
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the response reports real usage"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.take(actual_tokens - estimated_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            waits = {}
+            for level, samples in self._waits.items():
+                ordered = sorted(samples)
+                waits[PRIORITY_NAMES[level]] = {
+                    "count": len(ordered),
+                    "mean_ms": round(1000 * sum(ordered) / len(ordered), 1) if ordered else 0.0,
+                    "p95_ms": round(1000 * ordered[int(0.95 * (len(ordered) - 1))], 1) if ordered else 0.0,
+                    "max_ms": round(1000 * ordered[-1], 1) if ordered else 0.0,
+                }
+            return {
+                "requests_per_minute": self.requests.per_minute,
+                "tokens_per_minute": self.tokens.per_minute,
+                "requests_available": None if self.requests.unlimited else round(self.requests.level, 1),
+                "tokens_available": None if self.tokens.unlimited else round(self.tokens.level),
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": {
+                    name: sum(1 for level, _ in self._queue if level == value) for value, name in PRIORITY_NAMES.items()
+                },
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "timeouts": self.timeouts,
+                "wait": waits,
+            }
+
+
+_default_scheduler: Optional[LLMScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+
+def worker_processes() -> int:
+    """uvicorn worker processes sharing the account limits: WEB_CONCURRENCY, which uvicorn also reads for --workers"""
+    try:
+        return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
+
+def get_scheduler() -> LLMScheduler:
+    """
+    Process-wide scheduler configured by LLM_RPM, LLM_TPM and LLM_MAX_QUEUE_WAIT.
+    LLM_RPM/LLM_TPM are account limits: each of the worker_processes() gets an equal share
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            processes = worker_processes()
+            _default_scheduler = LLMScheduler(
+                requests_per_minute=float(os.getenv("LLM_RPM", "0")) / processes,
+                tokens_per_minute=float(os.getenv("LLM_TPM", "0")) / processes,
+                max_wait=float(os.getenv("LLM_MAX_QUEUE_WAIT", "120")),
+            )
+        return _default_scheduler
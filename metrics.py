@@ -0,0 +1,204 @@
+import bisect
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# ===============================
+# MÉTRIQUES ET TRACES
+# ===============================
+#
+# Compteurs et histogrammes au format texte Prometheus, sans dépendance, plus
+# une trace JSON optionnelle par requête : chaque span() mesure une étape et
+# l'ajoute à la trace de la requête en cours (contextvar), s'il y en a une.
+# Les valeurs sont par process : avec plusieurs workers uvicorn, Prometheus
+# doit scraper chacun d'eux.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "cv_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram(
+    "cv_stage_duration_seconds", "Duration of pipeline stages (PDF extraction, rendering, conversion...)", ("stage",)
+)
+AGENT_SECONDS = Histogram(
+    "cv_agent_call_duration_seconds", "Agent call latency: cache, model calls with retries and rate-limit waits, parsing", ("agent",)
+)
+AGENT_CALLS = Counter("cv_agent_calls_total", "Agent calls by outcome (model, cache_hit, error)", ("agent", "outcome"))
+PDF_CONVERSIONS = Counter(
+    "cv_pdf_conversions_total", "DOCX to PDF conversions in the render workers, by backend and outcome", ("backend", "outcome")
+)
+LLM_TOKENS = Counter("cv_llm_tokens_total", "Tokens reported in completion usage, per agent", ("agent", "kind"))
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Spans and token usage of one request, returned as JSON when tracing is asked for"""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.tokens: List[Dict[str, Any]] = []
+
+    def add_span(self, name: str, labels: Dict[str, Any], started: float, duration: float, error: Optional[str]) -> None:
+        entry = {
+            "name": name,
+            "start_ms": round(1000 * (started - self.started), 2),
+            "duration_ms": round(1000 * duration, 2),
+        }
+        if labels:
+            entry["labels"] = labels
+        if error:
+            entry["error"] = error
+        self.spans.append(entry)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: total duration per span name"""
+        totals: Dict[str, float] = {}
+        for entry in self.spans:
+            name = entry["name"] + (f"-{entry['labels']['agent']}" if "agent" in entry.get("labels", {}) else "")
+            totals[name] = totals.get(name, 0.0) + entry["duration_ms"]
+        return ", ".join(f"{name};dur={duration:.1f}" for name, duration in totals.items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round(1000 * (time.perf_counter() - self.started), 2),
+            "spans": self.spans,
+            "tokens": self.tokens,
+        }
+
+
+current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str, histogram: Histogram = STAGE_SECONDS, **labels: Any) -> Iterator[None]:
+    """Time the enclosed block into histogram (stage=name by default) and the current trace"""
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        histogram.observe(duration, **(labels if histogram is not STAGE_SECONDS else {"stage": name}))
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add_span(name, labels, started, duration, error)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    """Record a stage measured elsewhere, e.g. inside a worker process"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def record_usage(agent: str, usage: Any) -> None:
+    """Count the prompt/completion tokens of a completion's usage field"""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt_tokens, agent=agent, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, agent=agent, kind="completion")
+    trace = current_trace.get()
+    if trace is not None:
+        trace.tokens.append({"agent": agent, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
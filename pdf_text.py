@@ -0,0 +1,199 @@
+import asyncio
+import io
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# EXTRACTION DU TEXTE DES PDF
+# ===============================
+#
+# PyPDF2 est du Python pur : l'extraction tourne dans un thread pour les
+# petits CV, et dans un pool de processus, page par page, pour les gros
+# documents. Chaque page est chronométrée pour repérer les PDF pathologiques.
+# Le budget de temps (page_timeout × pages) est appliqué dans le worker, qui
+# saute les pages restantes une fois le budget dépassé. Une page bloquée ne
+# peut pas être interrompue : en mode processus, le pool est tué et remplacé ;
+# en mode thread, le thread finit en arrière-plan (petits documents seulement).
+
+
+class PdfExtractionError(Exception):
+    pass
+
+
+def count_pages(content: bytes) -> int:
+    return len(PyPDF2.PdfReader(io.BytesIO(content)).pages)
+
+
+def extract_page_range(
+    content: bytes, start: int, stop: int, budget_seconds: Optional[float] = None
+) -> Tuple[List[Tuple[int, str, float]], List[int]]:
+    """
+    Extract pages [start, stop) as (page index, text, seconds) for each.
+    Once budget_seconds is spent no new page is started: the rest are returned as skipped.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(content))
+    chunk_started = time.perf_counter()
+    pages = []
+    for index in range(start, stop):
+        if budget_seconds is not None and time.perf_counter() - chunk_started > budget_seconds:
+            return pages, list(range(index, stop))
+        started = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        pages.append((index, text, time.perf_counter() - started))
+    return pages, []
+
+
+@dataclass
+class ExtractionResult:
+    text: str
+    page_count: int
+    pages_extracted: int
+    mode: str
+    elapsed_seconds: float
+    page_seconds: Dict[int, float] = field(default_factory=dict)
+    timed_out_pages: List[int] = field(default_factory=list)
+
+    @property
+    def truncated(self) -> bool:
+        return self.pages_extracted < self.page_count
+
+    def summary(self, slowest: int = 3) -> Dict[str, object]:
+        slowest_pages = sorted(self.page_seconds.items(), key=lambda item: item[1], reverse=True)[:slowest]
+        return {
+            "pages": self.page_count,
+            "pages_extracted": self.pages_extracted,
+            "truncated": self.truncated,
+            "mode": self.mode,
+            "elapsed_ms": round(self.elapsed_seconds * 1000, 1),
+            "slowest_pages": [{"page": page + 1, "ms": round(seconds * 1000, 1)} for page, seconds in slowest_pages],
+            "timed_out_pages": [page + 1 for page in self.timed_out_pages],
+        }
+
+
+class PdfTextExtractor:
+    """
+    Off-loop PDF text extraction.
+    - max_pages: pages beyond this are ignored
+    - page_timeout: time budget per page, spent per chunk of pages: a worker stops starting pages once
+      its chunk's budget is used, and a chunk still busy one page_timeout later (a page that hangs)
+      is abandoned; its process worker is killed, a thread cannot be and finishes in the background
+    - parallel_min_pages: documents with at least this many pages are split across the process pool
+    """
+
+    def __init__(
+        self,
+        max_pages: int = 50,
+        page_timeout: float = 5.0,
+        parallel_min_pages: int = 12,
+        process_workers: Optional[int] = None,
+        slow_page_seconds: float = 1.0,
+    ):
+        self.max_pages = max_pages
+        self.page_timeout = page_timeout
+        self.parallel_min_pages = parallel_min_pages
+        self.process_workers = process_workers or min(4, os.cpu_count() or 1)
+        self.slow_page_seconds = slow_page_seconds
+        self._threads = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pdf-text")
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+        return self._processes
+
+    async def extract(self, content: bytes) -> ExtractionResult:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+
+        try:
+            page_count = await loop.run_in_executor(self._threads, count_pages, content)
+        except Exception as e:
+            raise PdfExtractionError(f"Failed to read PDF: {e}")
+
+        pages_to_extract = min(page_count, self.max_pages)
+        if pages_to_extract >= self.parallel_min_pages:
+            mode = "process"
+            chunk_size = -(-pages_to_extract // self.process_workers)
+        else:
+            mode = "thread"
+            chunk_size = max(pages_to_extract, 1)
+
+        chunks = [(start, min(start + chunk_size, pages_to_extract)) for start in range(0, pages_to_extract, chunk_size)]
+
+        async def run_chunk(start: int, stop: int, retry: bool = True):
+            budget = self.page_timeout * (stop - start)
+            # Looked up per chunk: a pool killed after a timeout is replaced
+            chunk_executor = self._process_pool() if mode == "process" else self._threads
+            future = loop.run_in_executor(chunk_executor, extract_page_range, content, start, stop, budget)
+            try:
+                # One extra page of grace for the page in progress when the budget runs out
+                return await asyncio.wait_for(future, timeout=budget + self.page_timeout)
+            except asyncio.TimeoutError:
+                if mode == "process":
+                    self._kill_process_pool(chunk_executor)
+                raise
+            except BrokenProcessPool:
+                # Another extraction killed the pool under us: once more on the new one
+                if not retry:
+                    raise
+                return await run_chunk(start, stop, retry=False)
+
+        outcomes = await asyncio.gather(*(run_chunk(start, stop) for start, stop in chunks), return_exceptions=True)
+
+        texts: Dict[int, str] = {}
+        page_seconds: Dict[int, float] = {}
+        timed_out_pages: List[int] = []
+        for (start, stop), outcome in zip(chunks, outcomes):
+            # BrokenProcessPool: the pool was killed over a hung page while this chunk ran
+            if isinstance(outcome, (asyncio.TimeoutError, BrokenProcessPool)):
+                timed_out_pages.extend(range(start, stop))
+                continue
+            if isinstance(outcome, Exception):
+                raise PdfExtractionError(f"Failed to extract text from PDF: {outcome}")
+            pages, skipped = outcome
+            for index, text, seconds in pages:
+                texts[index] = text
+                page_seconds[index] = seconds
+            timed_out_pages.extend(skipped)
+
+        result = ExtractionResult(
+            text="".join(texts[index] for index in sorted(texts)),
+            page_count=page_count,
+            pages_extracted=len(texts),
+            mode=mode,
+            elapsed_seconds=time.perf_counter() - started,
+            page_seconds=page_seconds,
+            timed_out_pages=sorted(timed_out_pages),
+        )
+
+        slow_pages = {page + 1: round(seconds, 2) for page, seconds in page_seconds.items() if seconds >= self.slow_page_seconds}
+        if slow_pages or timed_out_pages:
+            logger.warning(f"Slow PDF extraction - slow pages: {slow_pages}, timed out pages: {[p + 1 for p in timed_out_pages]}")
+        if result.truncated:
+            logger.info(f"PDF extraction capped at {result.pages_extracted}/{page_count} pages")
+        return result
+
+    def _kill_process_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Stop a pool whose worker hangs on a page: terminate its processes, the next chunk gets a new pool"""
+        if self._processes is pool:
+            self._processes = None
+        # ProcessPoolExecutor has no public way to stop a busy worker
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.warning("PDF extraction timed out: process pool killed and replaced")
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
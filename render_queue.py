@@ -0,0 +1,400 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+from artifact_store import ArtifactStore, ArtifactTooLarge
+from cv_rendering import generate_cv_with_template
+from metrics import PDF_CONVERSIONS, observe_stage
+from session_store import BoundedStore
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# FILE DE RENDU DES CV
+# ===============================
+#
+# Le rendu DocxTemplate + la conversion PDF tournent dans un pool de
+# processus borné ; l'API ne fait que soumettre un job et lire son état.
+# L'état des jobs est aussi écrit dans un store partagé pour que les autres
+# workers uvicorn puissent le lire.
+# Un worker mort (OOM, segfault de LibreOffice) casse tout le pool : il est
+# alors recréé, et les jobs qu'il portait sont relancés une fois. Un job qui
+# tourne plus de job_timeout secondes est marqué FAILED et son pool est tué.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RenderQueueFull(Exception):
+    """Raised when too many render jobs are already waiting"""
+
+
+def _converter_snapshot() -> Optional[Dict[str, Any]]:
+    """Stats of this worker's PDF converter, sent back with each result"""
+    from create_cv.pdf_converters import current_converter
+
+    converter = current_converter()
+    if converter is None:
+        return None
+    return {**converter.stats(), "pid": os.getpid()}
+
+
+def _render_worker(cv_data: Dict, template_id: str, job_id: str) -> Dict[str, Any]:
+    """Runs in a worker process: render + convert in memory, return the PDF bytes, timings and converter stats"""
+    started_at = time.time()
+    timings: Dict[str, float] = {}
+    result: Dict[str, Any] = {"started_at": started_at, "timings": timings}
+    try:
+        result["pdf_bytes"] = generate_cv_with_template(cv_data, template_id, job_id, timings)
+    except Exception as e:
+        # Returned rather than raised so the converter stats still reach the parent
+        result["error"] = str(e)
+    result["finished_at"] = time.time()
+    result["converter"] = _converter_snapshot()
+    return result
+
+
+@dataclass
+class RenderJob:
+    job_id: str
+    analysis_id: str
+    template_id: str
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pdf_path: Optional[str] = None
+    pdf_bytes: Optional[bytes] = field(default=None, repr=False)
+    artifact_key: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+    future: Optional[Future] = field(default=None, repr=False)
+    # Worker arguments, kept to resubmit the job once if its pool breaks
+    args: Optional[tuple] = field(default=None, repr=False)
+    executor: Optional[ProcessPoolExecutor] = field(default=None, repr=False)
+    attempts: int = 0
+    running_since: Optional[float] = None
+
+    # Fields that only make sense inside the process that submitted the job
+    LOCAL_FIELDS = ("future", "pdf_bytes", "args", "executor", "attempts", "running_since")
+
+    def to_record(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name not in self.LOCAL_FIELDS}
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "RenderJob":
+        return cls(**record)
+
+    def current_status(self) -> str:
+        # The executor only tells us a job was handed to a worker, not when it began
+        if self.status == QUEUED and self.future is not None and self.future.running():
+            return RUNNING
+        return self.status
+
+    def to_dict(self) -> Dict[str, Any]:
+        status = self.current_status()
+        timings: Dict[str, Optional[float]] = {"queue_seconds": None, "run_seconds": None, "total_seconds": None}
+        if self.started_at is not None:
+            timings["queue_seconds"] = round(self.started_at - self.submitted_at, 3)
+        if self.finished_at is not None:
+            timings["total_seconds"] = round(self.finished_at - self.submitted_at, 3)
+            if self.started_at is not None:
+                timings["run_seconds"] = round(self.finished_at - self.started_at, 3)
+        return {
+            "job_id": self.job_id,
+            "analysis_id": self.analysis_id,
+            "template_id": self.template_id,
+            "status": status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timings": timings,
+            "cached": self.cached,
+            "error": self.error,
+        }
+
+
+class RenderQueue:
+    """
+    Bounded process pool for final CV rendering, with in-memory job tracking.
+    job_timeout: seconds a job may run in a worker before it is failed and its pool killed; None for no limit
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: int = 64,
+        max_retained: int = 500,
+        artifact_store: Optional[ArtifactStore] = None,
+        job_store: Optional[MutableMapping] = None,
+        job_timeout: Optional[float] = 300.0
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.artifact_store = artifact_store
+        self.job_store = job_store if job_store is not None else BoundedStore("render_jobs", max_bytes=8 * 1024 * 1024)
+        self.max_pending = max_pending
+        self.max_retained = max_retained
+        self.job_timeout = job_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._pool_lock = threading.RLock()
+        self._closed = threading.Event()
+        self.pool_restarts = 0
+        self.timeouts = 0
+        self._jobs: "OrderedDict[str, RenderJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Latest converter stats per worker pid, and conversion latencies seen by this process
+        self._converter_stats: Dict[int, Dict[str, Any]] = {}
+        self._convert_seconds: deque = deque(maxlen=512)
+        self._first_conversion_at: Optional[float] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            if self.job_timeout is not None and self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name="render-queue-watchdog", daemon=True)
+                self._watchdog.start()
+            return self._executor
+
+    def _reset_executor(self, executor: Optional[ProcessPoolExecutor], kill: bool = False) -> None:
+        """Drop a broken (or hung, with kill=True) pool; the next submit starts a new one"""
+        if executor is None:
+            return
+        with self._pool_lock:
+            if self._executor is executor:
+                self._executor = None
+                self.pool_restarts += 1
+        if kill:
+            # ProcessPoolExecutor has no public way to stop a busy worker
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, job: RenderJob) -> None:
+        job.attempts += 1
+        job.running_since = None
+        job.executor = self._get_executor()
+        try:
+            job.future = job.executor.submit(_render_worker, *job.args)
+        except BrokenProcessPool:
+            # A worker died since the last submit: the whole pool is unusable
+            logger.warning("Render pool broken, starting a new one")
+            self._reset_executor(job.executor)
+            job.executor = self._get_executor()
+            job.future = job.executor.submit(_render_worker, *job.args)
+        future = job.future
+        future.add_done_callback(lambda done: self._on_done(job, done))
+
+    def _watch(self) -> None:
+        interval = min(1.0, self.job_timeout / 4)
+        while not self._closed.wait(interval):
+            try:
+                self._fail_hung_jobs()
+            except Exception as e:
+                logger.error(f"Render watchdog failed: {e}")
+
+    def _fail_hung_jobs(self) -> None:
+        now = time.monotonic()
+        hung = []
+        with self._lock:
+            # The executor also marks running the calls it has only queued for its workers:
+            # jobs are handed out in order, so only the oldest max_workers are really being rendered
+            running = [
+                job for job in self._jobs.values()
+                if job.status == QUEUED and job.future is not None and job.future.running()
+            ]
+            for job in running[:self.max_workers]:
+                if job.running_since is None:
+                    job.running_since = now
+                elif now - job.running_since > self.job_timeout:
+                    job.status = FAILED
+                    job.finished_at = time.time()
+                    job.error = f"Render timed out after {self.job_timeout:.0f}s"
+                    self.timeouts += 1
+                    hung.append(job)
+        for job in hung:
+            logger.error(f"Render job {job.job_id} timed out, killing its render pool")
+            self._persist(job)
+            self._reset_executor(job.executor, kill=True)
+
+    def _persist(self, job: RenderJob) -> None:
+        try:
+            self.job_store[job.job_id] = job.to_record()
+        except Exception as e:
+            logger.error(f"Failed to persist render job {job.job_id}: {e}")
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def submit(self, cv_data: Dict, template_id: str, analysis_id: str, artifact_key: Optional[str] = None) -> RenderJob:
+        job = RenderJob(
+            job_id=str(uuid.uuid4()), analysis_id=analysis_id, template_id=template_id, artifact_key=artifact_key
+        )
+        job.args = (cv_data, template_id, job.job_id)
+
+        # Same CV data + same template file already rendered: no render, no conversion
+        if self.artifact_store is not None and artifact_key is not None:
+            cached_path = self.artifact_store.get(artifact_key)
+            if cached_path is not None:
+                job.status = DONE
+                job.cached = True
+                job.pdf_path = str(cached_path)
+                job.started_at = job.finished_at = job.submitted_at
+                with self._lock:
+                    self._jobs[job.job_id] = job
+                    self._drop_old_jobs()
+                self._persist(job)
+                logger.info(f"Render job {job.job_id} served from artifact cache")
+                return job
+
+        if self.pending_count() >= self.max_pending:
+            raise RenderQueueFull(f"{self.max_pending} render jobs already pending")
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._drop_old_jobs()
+        self._persist(job)
+
+        self._start(job)
+        logger.info(f"Render job {job.job_id} queued (analysis {analysis_id}, template {template_id})")
+        return job
+
+    def _on_done(self, job: RenderJob, future: Future) -> None:
+        if job.status != QUEUED or future is not job.future:
+            # Failed by the watchdog (its killed pool gives up the future), or already resubmitted
+            return
+        # Cancelled: still queued in a pool killed over another job, which does not count as an attempt
+        cancelled = future.cancelled()
+        if (cancelled or isinstance(future.exception(), BrokenProcessPool)) and not self._closed.is_set():
+            self._reset_executor(job.executor)
+            if cancelled or job.attempts < 2:
+                logger.warning(f"Render pool broke under job {job.job_id}, retrying it on a new pool")
+                if cancelled:
+                    job.attempts -= 1
+                try:
+                    self._start(job)
+                    return
+                except Exception as e:
+                    logger.error(f"Failed to resubmit render job {job.job_id}: {e}")
+        with self._lock:
+            try:
+                result = future.result()
+                self._record_conversion(result)
+                if "error" in result:
+                    raise Exception(result["error"])
+                if self.artifact_store is not None and job.artifact_key is not None:
+                    try:
+                        job.pdf_path = str(self.artifact_store.put_bytes(job.artifact_key, result["pdf_bytes"]))
+                    except ArtifactTooLarge as e:
+                        # Cached, it would be evicted at once and the download would get a 410
+                        logger.warning(f"Render job {job.job_id}: {e}, keeping the PDF in memory")
+                        job.pdf_bytes = result["pdf_bytes"]
+                else:
+                    job.pdf_bytes = result["pdf_bytes"]
+                job.started_at = result["started_at"]
+                job.finished_at = result["finished_at"]
+                job.status = DONE
+                # Stage timings are measured in the worker, the metrics live in this process
+                observe_stage("render_queue_wait", job.started_at - job.submitted_at)
+                for stage, seconds in result.get("timings", {}).items():
+                    observe_stage(stage, seconds)
+                logger.info(f"Render job {job.job_id} done in {job.finished_at - job.submitted_at:.2f}s")
+            except (Exception, CancelledError) as e:
+                job.finished_at = time.time()
+                job.error = str(e)
+                job.status = FAILED
+                logger.error(f"Render job {job.job_id} failed: {e}")
+        self._persist(job)
+
+    def _record_conversion(self, result: Dict[str, Any]) -> None:
+        """Fold a worker's conversion outcome and converter stats into this process; caller holds the lock"""
+        snapshot = result.get("converter")
+        backend = snapshot["backend"] if snapshot else "unknown"
+        if snapshot:
+            self._converter_stats[snapshot["pid"]] = snapshot
+        timings = result.get("timings", {})
+        if "convert_to_pdf" in timings:
+            PDF_CONVERSIONS.inc(backend=backend, outcome="ok")
+            self._convert_seconds.append(timings["convert_to_pdf"])
+            if self._first_conversion_at is None:
+                self._first_conversion_at = time.time() - timings["convert_to_pdf"]
+        elif "error" in result and "render_template" in timings:
+            # Rendered but not converted: the conversion failed
+            PDF_CONVERSIONS.inc(backend=backend, outcome="failed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts and PDF conversion throughput/latency across the worker processes"""
+        with self._lock:
+            statuses: Dict[str, int] = {}
+            for job in self._jobs.values():
+                status = job.current_status()
+                statuses[status] = statuses.get(status, 0) + 1
+            snapshots = list(self._converter_stats.values())
+            latencies = sorted(self._convert_seconds)
+            elapsed = time.time() - self._first_conversion_at if self._first_conversion_at else 0.0
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        conversions = sum(snapshot["conversions"] for snapshot in snapshots)
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "job_timeout": self.job_timeout,
+            "jobs": statuses,
+            "timeouts": self.timeouts,
+            "pool_restarts": self.pool_restarts,
+            "converter": {
+                "backends": sorted({snapshot["backend"] for snapshot in snapshots}),
+                "workers_reporting": len(snapshots),
+                "conversions": conversions,
+                "failures": sum(snapshot["failures"] for snapshot in snapshots),
+                "recycles": sum(snapshot.get("recycles", 0) for snapshot in snapshots),
+                "latency_p50": percentile(0.50),
+                "latency_p95": percentile(0.95),
+                "latency_max": round(latencies[-1], 3) if latencies else None,
+                "throughput_per_second": round(len(latencies) / elapsed, 3) if elapsed else None,
+            },
+        }
+
+    def _drop_old_jobs(self) -> None:
+        """Forget the oldest finished jobs beyond max_retained (PDFs in the artifact store outlive them)"""
+        while len(self._jobs) > self.max_retained:
+            for job_id, job in self._jobs.items():
+                if job.status in (DONE, FAILED):
+                    del self._jobs[job_id]
+                    break
+            else:
+                return
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        """Local job if this process submitted it, else its record from the shared job store"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        record = self.job_store.get(job_id)
+        return RenderJob.from_record(record) if record is not None else None
+
+    def get_many(self, job_ids: List[str]) -> List[RenderJob]:
+        return [job for job in (self.get(job_id) for job_id in job_ids) if job is not None]
+
+    def shutdown(self) -> None:
+        self._closed.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,194 @@
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+# ===============================
+# PARSING DES RÉPONSES DU MODÈLE
+# ===============================
+#
+# Chaîne commune à tous les agents : sortie contrainte par schéma quand le
+# modèle la supporte, sinon mode JSON ; réparation locale du JSON abîmé,
+# validation pydantic, et relance du modèle uniquement pour les champs invalides.
+# Chaque chemin est compté pour savoir combien d'appels il évite.
+
+# Model name prefixes that accept response_format={"type": "json_schema", ...}
+JSON_SCHEMA_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event: str) -> None:
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def parse_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+class ResponseParseError(Exception):
+    """No JSON object could be recovered from the model response"""
+
+
+class ResponseValidationError(Exception):
+    """JSON was recovered but some fields do not validate against the expected model"""
+
+    def __init__(self, data: Dict[str, Any], failed_fields: List[str], errors: List[Dict[str, Any]]):
+        super().__init__(f"Invalid fields: {', '.join(failed_fields)}")
+        self.data = data
+        self.failed_fields = failed_fields
+        self.errors = errors
+
+
+def response_format_for(model_name: str, schema_model: Optional[Type[BaseModel]]) -> Optional[Dict[str, Any]]:
+    """
+    response_format for chat.completions, picked by LLM_STRUCTURED_OUTPUT=auto|json_schema|json_object|off:
+    the pydantic schema when the model supports it, plain JSON mode otherwise
+    """
+    mode = os.getenv("LLM_STRUCTURED_OUTPUT", "auto")
+    if mode == "off":
+        return None
+    if schema_model is not None and (mode == "json_schema" or (mode == "auto" and model_name.startswith(JSON_SCHEMA_MODELS))):
+        _count("schema_constrained")
+        return {
+            "type": "json_schema",
+            # Not strict: free-form dicts (skills_match, personal...) are not allowed in strict schemas
+            "json_schema": {"name": schema_model.__name__, "schema": schema_model.model_json_schema(), "strict": False},
+        }
+    _count("json_mode")
+    return {"type": "json_object"}
+
+
+def strip_code_fences(text: str) -> str:
+    """Enlève les blocs markdown autour du JSON renvoyé par le modèle"""
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+    return text
+
+
+# Strings are matched first so literals and commas inside them are left alone
+_TOKENS = re.compile(r'("(?:\\.|[^"\\])*")|\bTrue\b|\bFalse\b|\bNone\b|,(?=\s*[}\]])')
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _fix_tokens(text: str) -> str:
+    def replace(match: "re.Match") -> str:
+        if match.group(1) is not None:
+            return match.group(1)
+        return _LITERALS.get(match.group(0), "")
+
+    return _TOKENS.sub(replace, text)
+
+
+def _close_truncated(text: str) -> str:
+    """Close the strings, arrays and objects left open by a response cut short"""
+    stack = []
+    in_string = escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if not stack and not in_string:
+        return text
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    # A key without its value, then any dangling comma
+    text = re.sub(r'"(?:\\.|[^"\\])*"\s*:\s*$', "", text).rstrip()
+    text = re.sub(r",\s*$", "", text)
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """Best-effort local fix of the usual defects: prose around the object, trailing commas, Python literals, truncation"""
+    text = strip_code_fences(text).replace("\u201c", '"').replace("\u201d", '"')
+    start = text.find("{")
+    if start == -1:
+        return text
+    end = text.rfind("}")
+    text = text[start:end + 1] if end > start else text[start:]
+    return _fix_tokens(_close_truncated(_fix_tokens(text)))
+
+
+def load_json(text: str) -> Dict[str, Any]:
+    """Decode a JSON object from a model response, repairing it locally if needed"""
+    try:
+        data = json.loads(text)
+        _count("direct")
+    except json.JSONDecodeError:
+        try:
+            data = json.loads(strip_code_fences(text))
+            _count("fences_stripped")
+        except json.JSONDecodeError:
+            try:
+                data = json.loads(repair_json(text))
+                _count("repaired")
+            except json.JSONDecodeError as e:
+                _count("unrecoverable")
+                raise ResponseParseError(f"Could not decode JSON: {e}")
+    if not isinstance(data, dict):
+        _count("unrecoverable")
+        raise ResponseParseError(f"Expected a JSON object, got {type(data).__name__}")
+    return data
+
+
+def validate(data: Dict[str, Any], model: Type[BaseModel]) -> BaseModel:
+    try:
+        return model(**data)
+    except ValidationError as e:
+        _count("validation_failed")
+        errors = e.errors()
+        failed_fields = sorted({str(error["loc"][0]) for error in errors if error.get("loc")})
+        raise ResponseValidationError(data, failed_fields, errors)
+
+
+def parse_model(text: str, model: Type[BaseModel]) -> BaseModel:
+    return validate(load_json(text), model)
+
+
+def reask_messages(messages: List[Dict[str, str]], response_content: str, error: ResponseValidationError) -> List[Dict[str, str]]:
+    """Follow-up turn asking the model to resend only the fields that failed validation"""
+    problems = "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors[:10])
+    return messages + [
+        {"role": "assistant", "content": response_content},
+        {
+            "role": "user",
+            "content": (
+                f"Some fields of your JSON are missing or invalid ({problems}). "
+                f"Return a JSON object containing ONLY these corrected fields: {', '.join(error.failed_fields)}."
+            ),
+        },
+    ]
+
+
+def merge_reask(error: ResponseValidationError, response_content: str, model: Type[BaseModel]) -> BaseModel:
+    """Overlay the re-asked fields on the first response and validate again"""
+    _count("reask")
+    try:
+        partial = load_json(response_content)
+        data = {**error.data, **{field: partial[field] for field in error.failed_fields if field in partial}}
+        result = validate(data, model)
+    except (ResponseParseError, ResponseValidationError):
+        _count("reask_failed")
+        raise
+    _count("reask_recovered")
+    return result
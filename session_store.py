@@ -0,0 +1,370 @@
+import base64
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# ===============================
+# STOCKAGE BORNÉ DES SESSIONS
+# ===============================
+#
+# Remplace les dicts globaux de backend.py : chaque entrée expire après
+# ttl_seconds sans accès, et les moins récemment utilisées sont évincées
+# dès que la taille estimée dépasse max_bytes.
+
+
+class StoreValueTooLarge(ValueError):
+    """A single value is larger than the whole store: it would be evicted as soon as stored"""
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate deep size in bytes of JSON-like data (dict/list/str/bytes/numbers)"""
+    seen = set()
+
+    def _size(obj: Any) -> int:
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        size = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            size += sum(_size(k) + _size(v) for k, v in obj.items())
+        elif isinstance(obj, (list, tuple, set)):
+            size += sum(_size(item) for item in obj)
+        return size
+
+    return _size(value)
+
+
+class BoundedStore(MutableMapping):
+    """
+    Dict-like store with idle TTL and LRU eviction by entry count and estimated bytes.
+    Values must be re-assigned after in-place mutation so their size is re-counted.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = 2 * 3600,
+        sizeof: Callable[[Any], int] = estimate_size,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+    ):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+
+        # key -> (value, size, last_access)
+        self._data: "OrderedDict[str, tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - last_access > self.ttl_seconds
+
+    def _remove(self, key: str) -> Any:
+        value, size, _ = self._data.pop(key)
+        self._bytes -= size
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+        return value
+
+    def purge_expired(self) -> None:
+        now = time.time()
+        with self._lock:
+            # Oldest access first: stop at the first entry still alive
+            while self._data:
+                key, (_, _, last_access) = next(iter(self._data.items()))
+                if not self._expired(last_access, now):
+                    break
+                self._remove(key)
+                self.expirations += 1
+
+    def _evict(self) -> None:
+        while self._data and (
+            self._bytes > self.max_bytes
+            or (self.max_entries is not None and len(self._data) > self.max_entries)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            value, size, last_access = self._data[key]
+            now = time.time()
+            if self._expired(last_access, now):
+                self._remove(key)
+                self.expirations += 1
+                raise KeyError(key)
+            self._data[key] = (value, size, now)
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            raise StoreValueTooLarge(f"{self.name}: value of {size} bytes exceeds the store limit of {self.max_bytes} bytes")
+        with self._lock:
+            if key in self._data:
+                _, previous_size, _ = self._data.pop(key)
+                self._bytes -= previous_size
+            self._data[key] = (value, size, time.time())
+            self._bytes += size
+            self.purge_expired()
+            self._evict()
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            if self._expired(entry[2], time.time()):
+                self._remove(key)
+                self.expirations += 1
+                return False
+            return True
+
+    def __iter__(self) -> Iterator[str]:
+        self.purge_expired()
+        with self._lock:
+            return iter(list(self._data.keys()))
+
+    def __len__(self) -> int:
+        self.purge_expired()
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        self.purge_expired()
+        with self._lock:
+            return {
+                "name": self.name,
+                "backend": "memory",
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# ===============================
+# BACKEND SQLITE PARTAGÉ
+# ===============================
+#
+# Même interface (MutableMapping + stats) mais stocké dans SQLite en mode WAL,
+# pour que plusieurs workers uvicorn d'un même nœud partagent les sessions.
+# Une implémentation réseau (Redis, Postgres...) n'a qu'à fournir la même interface.
+
+COMPRESS_MIN_BYTES = 512
+# Expiry and size checks scan the table, so they run every N writes rather than on each one
+MAINTENANCE_EVERY = 64
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, bytes):
+        return {"__bytes__": base64.b64encode(obj).decode("ascii")}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_object_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def encode_value(value: Any) -> bytes:
+    """Compact JSON, zlib-compressed above COMPRESS_MIN_BYTES; the first byte tells which"""
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(raw, 1)
+    return b"j" + raw
+
+
+def decode_value(blob: bytes) -> Any:
+    marker, payload = blob[:1], blob[1:]
+    if marker == b"z":
+        payload = zlib.decompress(payload)
+    return json.loads(payload, object_hook=_json_object_hook)
+
+
+class SQLiteStore(MutableMapping):
+    """
+    Store backed by one SQLite table per namespace, with the same idle TTL and
+    LRU-by-bytes limits as BoundedStore. Safe across threads and processes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str = ".cache/sessions.sqlite3",
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 2 * 3600,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+    ):
+        if not name.isidentifier():
+            raise ValueError(f"Invalid store name: {name}")
+        self.name = name
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._local = threading.local()
+        self.evictions = 0
+        self.expirations = 0
+        self._writes = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_accessed ON {name} (accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expired(self, accessed: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - accessed > self.ttl_seconds
+
+    def _delete_rows(self, rows) -> None:
+        conn = self._conn()
+        for key, blob in rows:
+            conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+            if self.on_evict is not None:
+                self.on_evict(key, decode_value(blob))
+
+    def purge_expired(self) -> None:
+        if not self.ttl_seconds:
+            return
+        rows = self._conn().execute(
+            f"SELECT key, value FROM {self.name} WHERE accessed < ?", (time.time() - self.ttl_seconds,)
+        ).fetchall()
+        self._delete_rows(rows)
+        self.expirations += len(rows)
+
+    def _evict(self) -> None:
+        conn = self._conn()
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.name}").fetchone()[0]
+        while total > self.max_bytes:
+            row = conn.execute(
+                f"SELECT key, value, size FROM {self.name} ORDER BY accessed ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return
+            self._delete_rows([row[:2]])
+            total -= row[2]
+            self.evictions += 1
+
+    def __getitem__(self, key: str) -> Any:
+        conn = self._conn()
+        row = conn.execute(f"SELECT value, accessed FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        blob, accessed = row
+        now = time.time()
+        if self._expired(accessed, now):
+            self._delete_rows([(key, blob)])
+            self.expirations += 1
+            raise KeyError(key)
+        conn.execute(f"UPDATE {self.name} SET accessed = ? WHERE key = ?", (now, key))
+        return decode_value(blob)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        blob = encode_value(value)
+        if len(blob) > self.max_bytes:
+            raise StoreValueTooLarge(f"{self.name}: value of {len(blob)} bytes exceeds the store limit of {self.max_bytes} bytes")
+        conn = self._conn()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.name} (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), time.time()),
+        )
+        self._writes += 1
+        if self._writes % MAINTENANCE_EVERY == 0:
+            self.purge_expired()
+            self._evict()
+
+    def __delitem__(self, key: str) -> None:
+        row = self._conn().execute(f"SELECT key, value FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        self._delete_rows([row])
+
+    def __contains__(self, key: object) -> bool:
+        row = self._conn().execute(f"SELECT accessed FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        return row is not None and not self._expired(row[0], time.time())
+
+    def __iter__(self) -> Iterator[str]:
+        self.purge_expired()
+        return iter([row[0] for row in self._conn().execute(f"SELECT key FROM {self.name}")])
+
+    def __len__(self) -> int:
+        self.purge_expired()
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        self.purge_expired()
+        entries, size = self._conn().execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.name}"
+        ).fetchone()
+        return {
+            "name": self.name,
+            "backend": "sqlite",
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def create_store(
+    name: str,
+    max_bytes: int,
+    ttl_seconds: Optional[float],
+    on_evict: Optional[Callable[[str, Any], None]] = None,
+) -> MutableMapping:
+    """Store for one namespace, picked by SESSION_BACKEND=memory|sqlite"""
+    backend = os.getenv("SESSION_BACKEND", "memory")
+    if backend == "sqlite":
+        return SQLiteStore(
+            name,
+            path=os.getenv("SESSION_DB_PATH", ".cache/sessions.sqlite3"),
+            max_bytes=max_bytes,
+            ttl_seconds=ttl_seconds,
+            on_evict=on_evict,
+        )
+    if backend == "memory":
+        return BoundedStore(name, max_bytes=max_bytes, ttl_seconds=ttl_seconds, on_evict=on_evict)
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
@@ -0,0 +1,255 @@
+import re
+import unicodedata
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# ===============================
+# MATCHING LOCAL DES COMPÉTENCES
+# ===============================
+#
+# Un automate Aho-Corasick sur un vocabulaire de compétences (avec synonymes),
+# construit une seule fois, permet de vérifier en quelques millisecondes
+# quelles compétences de l'offre apparaissent dans le texte du CV.
+# Un faux "présent" coûte plus cher qu'un "incertain", tranché ensuite par le
+# modèle : pas d'alias trop vagues ("py", "node", "spring", "ml"...), et les
+# mots courants qui nomment aussi une techno (AMBIGUOUS_ALIASES : "tableau" en
+# français, "swift", "spark"...) ne rendent une compétence qu'incertaine.
+
+SKILL_SYNONYMS: Dict[str, List[str]] = {
+    "python": ["python", "python3"],
+    "javascript": ["javascript", "js", "ecmascript"],
+    "typescript": ["typescript"],
+    "java": ["java"],
+    "c#": ["c#", "csharp", "c sharp", ".net", "dotnet"],
+    "c++": ["c++", "cpp"],
+    "golang": ["golang", "go lang"],
+    "rust": ["rust"],
+    "php": ["php"],
+    "ruby": ["ruby", "ruby on rails", "rails"],
+    "scala": ["scala"],
+    "kotlin": ["kotlin"],
+    "swift": ["swift"],
+    "sql": ["sql", "t-sql", "tsql", "pl/sql"],
+    "postgresql": ["postgresql", "postgres", "psql"],
+    "mysql": ["mysql", "mariadb"],
+    "mongodb": ["mongodb", "mongo"],
+    "redis": ["redis"],
+    "elasticsearch": ["elasticsearch", "elastic search", "opensearch"],
+    "react": ["react", "reactjs", "react.js"],
+    "angular": ["angular", "angularjs"],
+    "vue": ["vue", "vuejs", "vue.js"],
+    "node.js": ["node.js", "nodejs"],
+    "django": ["django"],
+    "flask": ["flask"],
+    "fastapi": ["fastapi"],
+    "spring boot": ["spring boot", "springboot", "spring framework", "spring mvc"],
+    "docker": ["docker", "containerization", "conteneurisation"],
+    "kubernetes": ["kubernetes", "k8s", "openshift"],
+    "terraform": ["terraform"],
+    "ansible": ["ansible"],
+    "ci/cd": ["ci/cd", "cicd", "ci cd", "continuous integration", "continuous delivery", "continuous deployment", "gitlab ci", "github actions", "jenkins"],
+    "devops": ["devops"],
+    "git": ["git", "gitlab", "github", "bitbucket"],
+    "linux": ["linux", "unix", "bash", "shell scripting"],
+    "aws": ["aws", "amazon web services"],
+    "azure": ["azure", "microsoft azure"],
+    "gcp": ["gcp", "google cloud", "google cloud platform"],
+    "microsoft fabric": ["microsoft fabric", "ms fabric"],
+    "power bi": ["power bi", "powerbi"],
+    "tableau": ["tableau"],
+    "spark": ["spark", "pyspark", "apache spark"],
+    "databricks": ["databricks"],
+    "airflow": ["airflow", "apache airflow"],
+    "kafka": ["kafka", "apache kafka"],
+    "etl": ["etl", "elt", "data pipelines", "data pipeline", "pipelines de données"],
+    "data warehouse": ["data warehouse", "data warehousing", "dwh", "lakehouse", "data lake"],
+    "medallion architecture": ["medallion architecture", "medallion"],
+    "pandas": ["pandas"],
+    "numpy": ["numpy"],
+    "machine learning": ["machine learning", "apprentissage automatique"],
+    "deep learning": ["deep learning", "pytorch", "tensorflow", "keras"],
+    "nlp": ["nlp", "natural language processing"],
+    "llm": ["llm", "llms", "large language models", "genai", "generative ai"],
+    "rest api": ["rest api", "rest apis", "restful"],
+    "graphql": ["graphql"],
+    "microservices": ["microservices", "micro-services", "microservice"],
+    "agile": ["agile", "scrum", "kanban"],
+    "mentoring": ["mentoring", "mentorship", "coaching", "mentorat", "team mentoring"],
+    "testing": ["unit testing", "tdd", "pytest", "jest", "automated testing", "tests unitaires"],
+    "html": ["html", "html5"],
+    "css": ["css", "css3", "sass", "scss", "tailwind"],
+}
+
+# Ordinary words (English or French) that are also skill names: seen in a CV they
+# only make the skill uncertain. In a job skill phrase they still name the skill
+AMBIGUOUS_ALIASES = {"tableau", "swift", "rust", "spark", "agile", "rails"}
+
+# Job skill phrases whose terms are kept per matcher; the cache is reset when full
+TERMS_CACHE_SIZE = 2048
+
+STOPWORDS = {
+    "and", "or", "the", "with", "of", "in", "for", "a", "an", "to", "on", "strong", "good", "solid",
+    "experience", "knowledge", "skills", "skill", "ability", "abilities", "years", "year", "plus",
+    "proficiency", "understanding", "familiarity", "working", "hands", "expertise", "excellent",
+    "et", "de", "des", "du", "la", "le", "les", "en", "avec", "expérience", "connaissance",
+}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents, keep only characters that can belong to skill names"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^a-z0-9+#./\s-]", " ", text)
+    # Trailing sentence punctuation would otherwise glue onto the last word ("python.")
+    text = re.sub(r"[./-](?=\s|$)", " ", text)
+    return " " + " ".join(text.split()) + " "
+
+
+def _joins_word(char: str) -> bool:
+    # "c" must not match inside "c++", "java" inside "java-ee", nor "js" inside "node.js"
+    # (sentence-ending dots are already removed by normalize_text)
+    return char.isalnum() or char in "+#-."
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every occurrence of every pattern in one pass over the text"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> Iterable[Tuple[int, str]]:
+        """Yield (start index, pattern) for each occurrence"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield index - len(pattern) + 1, pattern
+
+
+@dataclass
+class SkillMatchResult:
+    must_have_present: List[str] = field(default_factory=list)
+    must_have_absent: List[str] = field(default_factory=list)
+    must_have_uncertain: List[str] = field(default_factory=list)
+    nice_to_have_present: List[str] = field(default_factory=list)
+    nice_to_have_absent: List[str] = field(default_factory=list)
+    nice_to_have_uncertain: List[str] = field(default_factory=list)
+
+    @property
+    def all_required_present(self) -> bool:
+        return not self.must_have_absent and not self.must_have_uncertain
+
+    @property
+    def required_decided(self) -> bool:
+        """Every must-have skill is either clearly present or clearly absent"""
+        return not self.must_have_uncertain
+
+    def coverage(self) -> Optional[int]:
+        total = len(self.must_have_present) + len(self.must_have_absent) + len(self.must_have_uncertain)
+        if not total:
+            return None
+        return round(100 * len(self.must_have_present) / total)
+
+
+class SkillMatcher:
+    """Synonym-aware skill index, built once and reused for every CV"""
+
+    def __init__(self, synonyms: Dict[str, List[str]] = SKILL_SYNONYMS, ambiguous: Iterable[str] = AMBIGUOUS_ALIASES):
+        self._canonical: Dict[str, str] = {}
+        for canonical, aliases in synonyms.items():
+            for alias in [canonical] + aliases:
+                self._canonical[normalize_text(alias).strip()] = canonical
+        self._automaton = AhoCorasick(self._canonical)
+        self._ambiguous = {normalize_text(alias).strip() for alias in ambiguous}
+        self._terms_cache: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+
+    def _vocabulary_hits(self, normalized: str, weak: Optional[Set[str]] = None) -> Set[str]:
+        """
+        Canonical skills mentioned in normalized text, on word boundaries.
+        With a weak set, skills only named by an ambiguous alias go there instead
+        """
+        hits = set()
+        for start, alias in self._automaton.find_all(normalized):
+            end = start + len(alias)
+            if not _joins_word(normalized[start - 1]) and not _joins_word(normalized[end]):
+                target = weak if weak is not None and alias in self._ambiguous else hits
+                target.add(self._canonical[alias])
+        return hits
+
+    def _skill_terms(self, skill: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """Canonical vocabulary skills named by a job skill phrase, plus its other significant words"""
+        terms = self._terms_cache.get(skill)
+        if terms is None:
+            normalized = normalize_text(skill)
+            canonicals = tuple(sorted(self._vocabulary_hits(normalized)))
+            words = tuple(word for word in normalized.split() if len(word) > 2 and word not in STOPWORDS)
+            terms = (canonicals, words)
+            if len(self._terms_cache) >= TERMS_CACHE_SIZE:
+                self._terms_cache.clear()
+            self._terms_cache[skill] = terms
+        return terms
+
+    def _classify(self, skill: str, cv_normalized: str, cv_hits: Set[str], cv_weak: Set[str]) -> str:
+        phrase = normalize_text(skill)
+        if phrase.strip() and phrase.strip() not in self._ambiguous and phrase in cv_normalized:
+            return "present"
+
+        canonicals, words = self._skill_terms(skill)
+        if canonicals:
+            found = [canonical for canonical in canonicals if canonical in cv_hits]
+            if len(found) == len(canonicals):
+                return "present"
+            if not found and not any(canonical in cv_weak for canonical in canonicals):
+                return "absent"
+            return "uncertain"
+
+        # Unknown skill: only call it absent when none of its words appear in the CV
+        if not words:
+            return "uncertain"
+        if any(f" {word} " in cv_normalized for word in words):
+            return "uncertain"
+        return "absent"
+
+    def match(self, cv_text: str, must_have_skills: List[str], nice_to_have_skills: Optional[List[str]] = None) -> SkillMatchResult:
+        cv_normalized = normalize_text(cv_text)
+        cv_weak: Set[str] = set()
+        cv_hits = self._vocabulary_hits(cv_normalized, cv_weak)
+        result = SkillMatchResult()
+        for skill in must_have_skills:
+            getattr(result, f"must_have_{self._classify(skill, cv_normalized, cv_hits, cv_weak)}").append(skill)
+        for skill in nice_to_have_skills or []:
+            getattr(result, f"nice_to_have_{self._classify(skill, cv_normalized, cv_hits, cv_weak)}").append(skill)
+        return result
@@ -0,0 +1,26 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules live at the repository root, not in an installed package
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# The OpenAI SDK wants a key even though tests never reach the network,
+# and agents must not share the on-disk LLM cache with a real run
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+
+
+@pytest.fixture
+def stub_agents(monkeypatch):
+    """Agents answer with the canned JSON of benchmarks/stub_backend.py, restored after the test"""
+    from agent import AsyncAgentMixin, BaseAgent
+    from benchmarks.stub_backend import install_stubs
+
+    # Registered first so monkeypatch puts the real methods back on teardown
+    monkeypatch.setattr(AsyncAgentMixin, "_acomplete", AsyncAgentMixin._acomplete)
+    monkeypatch.setattr(BaseAgent, "_complete", BaseAgent._complete)
+    install_stubs("none", seed=0)
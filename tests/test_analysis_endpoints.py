@@ -0,0 +1,151 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend
+
+from test_upload_endpoint import upload
+
+JOB_POSTS = ["Data engineer, Python and Fabric", "Backend developer, Django", "DevOps engineer, Kubernetes"]
+
+
+@pytest.fixture
+def client(stub_agents):
+    return TestClient(backend.app)
+
+
+@pytest.fixture
+def cv_id(client):
+    return upload(client).json()["cv_id"]
+
+
+@pytest.fixture
+def scored_by_post(monkeypatch):
+    """Relevance depends on the job post, and posts containing "broken" fail"""
+    scores = {JOB_POSTS[0]: 80, JOB_POSTS[1]: 40, JOB_POSTS[2]: 65}
+    analyze_job_offer, analyze_profile = backend.optimizer.analyze_job_offer, backend.optimizer.analyze_profile
+
+    async def job_offer(job_description):
+        if "broken" in job_description:
+            raise RuntimeError("model answer could not be parsed")
+        job_analysis = await analyze_job_offer(job_description)
+        return job_analysis.model_copy(update={"job_title": job_description})
+
+    async def profile(cv_text, job_analysis):
+        profile_analysis = await analyze_profile(cv_text, job_analysis)
+        return profile_analysis.model_copy(update={"relevance_score_overall": scores[job_analysis.job_title]})
+
+    monkeypatch.setattr(backend.optimizer, "analyze_job_offer", job_offer)
+    monkeypatch.setattr(backend.optimizer, "analyze_profile", profile)
+
+
+def test_batch_ranks_job_posts_and_reports_failures(client, cv_id, scored_by_post):
+    response = client.post("/api/analyze-batch", json={"cv_id": cv_id, "job_descriptions": JOB_POSTS + ["broken post"]})
+    assert response.status_code == 200
+    body = response.json()
+
+    assert [(result["rank"], result["index"]) for result in body["results"]] == [(1, 0), (2, 2), (3, 1)]
+    assert body["failed"] == [{"index": 3, "error": "model answer could not be parsed"}]
+    # Each ranked post has its own analysis, ready for generate-resume
+    analysis_id = body["results"][0]["analysis_id"]
+    assert backend.sessions[analysis_id]["job_description"] == JOB_POSTS[0]
+
+
+@pytest.mark.parametrize(
+    "payload, status",
+    [
+        ({"cv_id": "unknown", "job_descriptions": JOB_POSTS}, 404),
+        ({"job_descriptions": []}, 400),
+        ({"job_descriptions": ["post"] * (backend.MAX_BATCH_SIZE + 1)}, 400),
+    ],
+)
+def test_batch_rejects_invalid_requests(client, cv_id, payload, status):
+    response = client.post("/api/analyze-batch", json={"cv_id": cv_id, **payload})
+    assert response.status_code == status
+
+
+def sse_events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_sends_one_event_per_step_then_the_result(client, cv_id):
+    response = client.post("/api/analyze-stream", json={"cv_id": cv_id, "job_description": JOB_POSTS[0]})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/event-stream")
+
+    events = sse_events(response)
+    assert [event for event, _ in events] == ["job_analysis", "profile_analysis", "gap_analysis", "result"]
+    assert events[0][1] == {"job_title": "Senior Data Engineer"}
+    assert events[1][1] == {"overall_match": 62}
+    result = events[-1][1]
+    assert result["analysis_mode"] == "staged" and result["analysis_id"] in backend.sessions
+
+
+def test_stream_reports_a_failed_step_as_an_error_event(client, cv_id, monkeypatch):
+    async def failing(cv_text, job_analysis):
+        raise RuntimeError("profile agent timed out")
+
+    monkeypatch.setattr(backend.optimizer, "analyze_profile", failing)
+    response = client.post("/api/analyze-stream", json={"cv_id": cv_id, "job_description": JOB_POSTS[0]})
+
+    # Headers are already sent: the failure arrives in the stream, after the steps that finished
+    events = sse_events(response)
+    assert [event for event, _ in events] == ["job_analysis", "error"]
+    assert "profile agent timed out" in events[-1][1]["detail"]
+
+
+def test_stream_of_unknown_cv_is_a_404(client):
+    assert client.post("/api/analyze-stream", json={"cv_id": "unknown", "job_description": "x"}).status_code == 404
+
+
+@pytest.fixture
+def agent_calls(stub_agents, monkeypatch):
+    from agent import AsyncAgentMixin
+
+    calls = []
+    stub = AsyncAgentMixin._acomplete
+
+    async def counting(self, messages, temperature):
+        calls.append(self.cache_name)
+        return await stub(self, messages, temperature)
+
+    monkeypatch.setattr(AsyncAgentMixin, "_acomplete", counting)
+    return calls
+
+
+def analyze(client, cv_id, **payload):
+    response = client.post("/api/analyze", json={"cv_id": cv_id, "job_description": JOB_POSTS[0], **payload})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_fused_mode_makes_one_model_call_for_the_same_result(client, cv_id, agent_calls):
+    staged = analyze(client, cv_id, mode="staged")
+    assert agent_calls[:2] == ["job_analyzer", "profile_analyzer"] and "fused_analyzer" not in agent_calls
+    agent_calls.clear()
+
+    fused = analyze(client, cv_id, mode="fused")
+    assert agent_calls == ["fused_analyzer"]
+    assert fused["analysis_mode"] == "fused"
+    # Same gap rules on the fused answer: same scores, gaps and decision
+    assert staged["needs_user_input"] and staged["missing_skills"]
+    for key in ("overall_match", "skills_match", "needs_user_input", "missing_skills"):
+        assert fused.get(key) == staged.get(key)
+    session = backend.sessions[fused["analysis_id"]]
+    assert session["job_analysis"]["job_title"] == "Senior Data Engineer"
+
+
+def test_analysis_mode_defaults_to_the_configured_one(client, cv_id, agent_calls, monkeypatch):
+    monkeypatch.setattr(backend, "ANALYSIS_MODE", "fused")
+    assert analyze(client, cv_id)["analysis_mode"] == "fused" and agent_calls == ["fused_analyzer"]
+
+
+def test_fused_mode_streams_every_step(client, cv_id, agent_calls):
+    response = client.post("/api/analyze-stream", json={"cv_id": cv_id, "job_description": JOB_POSTS[0], "mode": "fused"})
+    events = sse_events(response)
+    assert [event for event, _ in events] == ["job_analysis", "profile_analysis", "gap_analysis", "result"]
+    assert agent_calls == ["fused_analyzer"]
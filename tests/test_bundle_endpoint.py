@@ -0,0 +1,90 @@
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend
+import render_queue
+from artifact_store import ArtifactStore
+from render_queue import RenderQueue
+
+from test_render_queue import fake_worker
+
+ANALYSIS_ID = "analysis-bundle"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_queue, "_render_worker", fake_worker)
+    queue = RenderQueue(max_workers=2, max_pending=4, artifact_store=ArtifactStore(str(tmp_path / "artifacts")))
+    monkeypatch.setattr(backend, "render_queue", queue)
+    monkeypatch.setattr(backend, "artifact_store", queue.artifact_store)
+    yield TestClient(backend.app)
+    queue.shutdown()
+    backend.sessions.pop(ANALYSIS_ID, None)
+
+
+def start_analysis(cv_data):
+    backend.sessions[ANALYSIS_ID] = {"optimized_cv": cv_data}
+
+
+def request_bundle(client, **payload):
+    return client.post("/api/generate-final-cv-bundle", json={"analysis_id": ANALYSIS_ID, **payload})
+
+
+def zip_contents(response):
+    assert response.status_code == 200 and response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as bundle:
+        return {name: bundle.read(name) for name in bundle.namelist()}
+
+
+def test_handles_then_bundle_download(client):
+    start_analysis({"name": "a", "sleep": 0.5})
+    response = request_bundle(client)
+    assert response.status_code == 202
+    body = response.json()
+    assert [job["template_id"] for job in body["jobs"]] == ["template1", "template2"]
+
+    # Still rendering: 409 unless the client asks to wait
+    assert client.get(body["bundle_url"]).status_code == 409
+    contents = zip_contents(client.get(body["bundle_url"], params={"wait": True}))
+    assert contents == {"optimized_cv_template1.pdf": b"%PDF template1", "optimized_cv_template2.pdf": b"%PDF template2"}
+    assert len(backend.sessions[ANALYSIS_ID]["render_job_ids"]) == 2
+
+
+def test_zip_reports_failed_templates_in_errors_json(client):
+    start_analysis({"name": "b", "fail_templates": ["template2"]})
+    contents = zip_contents(request_bundle(client, format="zip"))
+
+    assert contents["optimized_cv_template1.pdf"] == b"%PDF template1"
+    assert json.loads(contents["errors.json"]) == {"template2": "conversion failed"}
+
+
+def test_zip_of_only_failed_renders_is_an_error(client):
+    start_analysis({"fail": True})
+    response = request_bundle(client, format="zip", template_ids=["template1"])
+    assert response.status_code == 500 and "conversion failed" in response.json()["detail"]
+
+
+def test_bundle_is_all_or_nothing_when_the_queue_is_full(client):
+    start_analysis({"name": "c"})
+    # Another analysis fills the queue: two more renders would not fit
+    for template_id in ["template1", "template2", "template1", "template2"]:
+        backend.render_queue.submit({"name": template_id, "sleep": 1}, template_id, "other", artifact_key=None)
+
+    assert request_bundle(client).status_code == 503
+    assert "render_bundles" not in backend.sessions[ANALYSIS_ID]
+
+
+@pytest.mark.parametrize("analysis_id", [ANALYSIS_ID, "unknown"])
+def test_unknown_bundle_is_a_404(client, analysis_id):
+    start_analysis({"name": "d"})
+    assert client.get(f"/api/download-cv-bundle/{analysis_id}/unknown").status_code == 404
+
+
+def test_unknown_template_is_rejected(client):
+    start_analysis({"name": "e"})
+    response = request_bundle(client, template_ids=["template1", "template9"])
+    assert response.status_code == 400 and "template9" in response.json()["detail"]
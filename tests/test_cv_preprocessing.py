@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+
+import backend
+from benchmarks.sample_pdf import make_pdf
+from cv_preprocessing import CVPreprocessor, count_tokens, normalize_text, remove_noise_lines, split_sections
+
+HEADER = "Martin Dupont\nData engineer - Brussels"
+EXPERIENCE = "Expérience professionnelle\nTechWave, 2021-2024\n- Python services and GitLab CI/CD"
+SKILLS = "Compétences\n- Python, SQL, Docker"
+INTERESTS = "Centres d'intérêt\n" + "\n".join(f"{sport}: " + " ".join(["races, clubs and mountain photography"] * 10) for sport in ["Trail", "Climbing", "Ski"])
+CV_TEXT = "\n".join([HEADER, INTERESTS, EXPERIENCE, SKILLS])
+
+
+def test_text_within_budget_is_only_normalised():
+    result = CVPreprocessor(token_budget=10_000).process(CV_TEXT)
+    assert result.text == CV_TEXT
+    assert result.sections == ["header", "interests", "experience", "skills"]
+    assert result.dropped_sections == result.truncated_sections == [] and result.tokens_saved == 0
+
+
+def test_lowest_priority_sections_are_dropped_to_fit_the_budget():
+    budget = count_tokens("\n".join([HEADER, EXPERIENCE, SKILLS])) + 5
+    result = CVPreprocessor(token_budget=budget).process(CV_TEXT)
+
+    assert result.dropped_sections == ["interests"] and result.truncated_sections == []
+    # Kept sections stay in document order
+    assert result.text == "\n".join([HEADER, EXPERIENCE, SKILLS])
+    assert result.tokens <= budget < result.original_tokens
+
+
+def test_section_over_the_budget_is_truncated_line_by_line():
+    experience = "Experience\n" + "\n".join(f"- Project {index}: data pipelines on Azure" for index in range(40))
+    result = CVPreprocessor(token_budget=60).process(f"{HEADER}\n{experience}")
+
+    assert result.truncated_sections == ["experience"]
+    assert result.text.startswith(f"{HEADER}\nExperience\n- Project 0") and "Project 39" not in result.text
+    assert result.tokens <= 60
+
+
+def test_noise_lines_are_removed():
+    footer = "Martin Dupont - CV - confidential"
+    pages = f"Python develop-\nment\n• Docker\nPage 1 of 2\n{footer}\nSQL\nSQL\n2/2\n{footer}"
+    lines = remove_noise_lines(normalize_text(pages).split("\n"))
+    # Hyphenation joined, bullets unified, page numbers and the repeated footer dropped
+    assert lines == ["Python development", "- Docker", footer, "SQL"]
+
+
+def test_headings_are_recognised_without_accents_or_case():
+    sections = split_sections(["Martin", "EXPÉRIENCES PROFESSIONNELLES", "TechWave", "Formation", "ULB"])
+    assert [name for name, _ in sections] == ["header", "experience", "education"]
+
+
+def test_upload_keeps_full_text_and_sends_trimmed_text(monkeypatch):
+    monkeypatch.setattr(backend, "cv_preprocessor", CVPreprocessor(token_budget=30))
+    pdf = make_pdf(["Martin Dupont", "Skills", "Python, SQL, Docker", "Interests", "Trail running " * 8])
+    cv_id = TestClient(backend.app).post(
+        "/api/upload-cv", files={"cv_file": ("cv.pdf", pdf, "application/pdf")}
+    ).json()["cv_id"]
+
+    assert "Trail running" in backend.get_cv_full_text(cv_id)
+    assert "Trail running" not in backend.get_cv_text(cv_id)
+    assert backend.get_cv_content(cv_id)["preprocessing"]["dropped_sections"] == ["interests"]
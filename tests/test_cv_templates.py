@@ -0,0 +1,119 @@
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import ROOT
+from create_cv.python_cv_templates import DocxTemplate, clear_template_cache, get_template, render_template_to_bytes
+
+CV_DATA = {
+    "personal": {
+        "name": "Martin Dupont",
+        "title": "Data Engineer",
+        "email": "martin@example.com",
+        "phone": "+32 470 00 00 00",
+        "location": "Brussels",
+        "address": "Rue de la Loi 1",
+        "summary": "Python developer moving to data engineering.",
+    },
+    "education": [{"degree": "Master", "school": "ULB", "start": "2013", "end": "2018"}],
+    "experience": [
+        {"title": "Full-Stack Developer", "company": "TechWave", "start": "2021", "end": "Present", "summary": "Python services."}
+    ],
+    "skills": ["Python", "Docker"],
+    "links": {"linkedin": "linkedin.com/in/martin"},
+}
+
+
+def document_text(docx_bytes: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as docx:
+        return docx.read("word/document.xml").decode("utf-8")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_template_cache()
+    yield
+    clear_template_cache()
+
+
+@pytest.mark.parametrize("template", ["template1.docx", "template2.docx"])
+def test_renders_real_template(template):
+    xml = document_text(render_template_to_bytes(str(ROOT / "create_cv" / template), CV_DATA))
+
+    assert "Martin Dupont" in xml
+    assert "TechWave" in xml
+    assert "{{" not in xml
+
+
+def test_template_xml_is_patched_once(monkeypatch):
+    template = str(ROOT / "create_cv" / "template1.docx")
+    patched = []
+    original = DocxTemplate.patch_xml
+    monkeypatch.setattr(DocxTemplate, "patch_xml", lambda self, xml: patched.append(1) or original(self, xml))
+
+    get_template(template).prepare()
+    prepared = len(patched)
+    first = document_text(render_template_to_bytes(template, CV_DATA))
+    second = document_text(render_template_to_bytes(template, {**CV_DATA, "skills": ["Rust"]}))
+
+    # Body, headers and footers patched when prepared, never again on render
+    assert prepared >= 1 and len(patched) == prepared
+    assert "Docker" in first and "Docker" not in second and "Rust" in second
+
+
+def test_cached_template_renders_independently():
+    template = str(ROOT / "create_cv" / "template1.docx")
+    first = document_text(render_template_to_bytes(template, CV_DATA))
+    other = {**CV_DATA, "personal": {**CV_DATA["personal"], "name": "Alice Martin"}}
+    second = document_text(render_template_to_bytes(template, other))
+
+    assert "Martin Dupont" in first and "Alice Martin" not in first
+    assert "Alice Martin" in second and "Martin Dupont" not in second
+
+
+def test_concurrent_renders_do_not_share_state():
+    template = str(ROOT / "create_cv" / "template1.docx")
+    names = [f"Candidate {number}" for number in range(8)]
+
+    def render(name):
+        return document_text(render_template_to_bytes(template, {**CV_DATA, "personal": {**CV_DATA["personal"], "name": name}}))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(render, names))
+
+    for name, xml in zip(names, results):
+        assert name in xml
+        assert all(other not in xml for other in names if other != name)
+
+
+def test_batch_render_docx_and_resume(tmp_path):
+    import json
+    from argparse import Namespace
+
+    from create_cv import batch_render
+
+    contexts = tmp_path / "contexts.jsonl"
+    contexts.write_text(
+        json.dumps({"id": "cv-1", **CV_DATA}) + "\n" + json.dumps({"id": "cv-2", **CV_DATA}) + "\n", encoding="utf-8"
+    )
+    args = Namespace(
+        input=str(contexts),
+        templates=",".join(str(ROOT / "create_cv" / name) for name in ("template1.docx", "template2.docx")),
+        out=str(tmp_path / "out"),
+        workers=2,
+        id_field="id",
+        docx=True,
+        no_pdf=True,
+        fresh=False,
+    )
+
+    assert batch_render.run(args) == 0
+    assert "Martin Dupont" in document_text((tmp_path / "out" / "cv-2" / "template2.docx").read_bytes())
+    manifest = (tmp_path / "out" / batch_render.MANIFEST_NAME).read_text(encoding="utf-8").splitlines()
+    assert len(manifest) == 4
+
+    # Second run resumes: every pair is already done
+    assert batch_render.run(args) == 0
+    assert len((tmp_path / "out" / batch_render.MANIFEST_NAME).read_text(encoding="utf-8").splitlines()) == 4
@@ -0,0 +1,63 @@
+import asyncio
+import sqlite3
+
+from llm_cache import LLMCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return LLMCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_disk_hit_after_memory_eviction(tmp_path):
+    cache = make_cache(tmp_path, memory_entries=1)
+    cache.set("a", "agent", {"value": 1})
+    cache.set("b", "agent", {"value": 2})
+
+    assert cache.get("a") == {"value": 1}
+    assert cache.stats()["hits_disk"] == 1
+    assert cache.get("missing") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_reads_batch_access_times(tmp_path):
+    cache = make_cache(tmp_path, memory_entries=1, access_batch=3)
+    for key in ("a", "b", "c", "d"):
+        cache.set(key, "agent", key)
+
+    cache.get("a")
+    cache.get("b")
+    assert set(cache._pending_access) == {"a", "b"}
+    cache.get("c")
+    # Third read reached the batch size: written in one go
+    assert cache._pending_access == {}
+
+
+def test_async_api_round_trip(tmp_path):
+    cache = make_cache(tmp_path, memory_entries=1)
+
+    async def scenario():
+        await cache.aset("a", "agent", [1, 2])
+        await cache.aset("b", "agent", [3])
+        return await cache.aget("a"), await cache.aget("a"), await cache.aget("c")
+
+    assert asyncio.run(scenario()) == ([1, 2], [1, 2], None)
+    stats = cache.stats()
+    assert (stats["hits_disk"], stats["hits_memory"], stats["misses"]) == (1, 1, 1)
+
+
+def test_agent_keeps_result_when_cache_store_fails(tmp_path):
+    from agent import JobAnalyzerAgent
+
+    class LockedCache(LLMCache):
+        def set(self, key, agent, value):
+            raise sqlite3.OperationalError("database is locked")
+
+    agent = JobAnalyzerAgent(cache=LockedCache(path=None))
+    agent._complete = lambda messages, temperature: (
+        '{"job_title": "Data Engineer", "must_have_skills": ["Python"], "nice_to_have_skills": [],'
+        ' "company_type": "", "work_environment": [], "ats_keywords": [], "tone_of_voice": "",'
+        ' "key_responsibilities": [], "company_culture_indicators": [], "technical_domains": [],'
+        ' "urgency_level": "", "remote_work_policy": ""}'
+    )
+
+    assert agent.analyze_job_offer("Data Engineer, Python").job_title == "Data Engineer"
@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+import llm_client
+from llm_client import RetryPolicy
+
+
+def timeout_error() -> openai.APITimeoutError:
+    return openai.APITimeoutError(request=httpx.Request("POST", "http://llm.test/v1/chat/completions"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock: sleeping and failed attempts advance it instead of waiting"""
+    now = [0.0]
+    monkeypatch.setattr(llm_client.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(llm_client.time, "sleep", lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+def failing(clock, seconds: float, errors: list):
+    calls = []
+
+    def attempt():
+        calls.append(clock[0])
+        clock[0] += seconds
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return attempt, calls
+
+
+def test_timeout_is_not_retried_past_the_deadline(clock):
+    policy = RetryPolicy(max_retries=4, base_delay=0.5, deadline=90)
+    attempt, calls = failing(clock, 60, [timeout_error()] * 5)
+
+    with pytest.raises(openai.APITimeoutError):
+        policy.call(attempt)
+
+    # A second 60s attempt could not end before 90s
+    assert len(calls) == 1
+    assert policy.stats()["deadline_exceeded"] == 1 and policy.retries == 0
+
+
+def test_fast_errors_are_still_retried_within_the_deadline(clock):
+    policy = RetryPolicy(max_retries=4, base_delay=0.5, deadline=90)
+    attempt, calls = failing(clock, 0.2, [timeout_error()] * 3)
+
+    assert policy.call(attempt) == "ok"
+    assert len(calls) == 4 and policy.deadline_exceeded == 0
+
+
+def test_no_deadline_keeps_retrying_up_to_max_retries(clock):
+    policy = RetryPolicy(max_retries=2, base_delay=0.5, deadline=None)
+    attempt, calls = failing(clock, 60, [timeout_error()] * 5)
+
+    with pytest.raises(openai.APITimeoutError):
+        policy.call(attempt)
+    assert len(calls) == 3 and policy.gave_up == 1
+
+
+def test_async_call_honours_the_deadline(clock, monkeypatch):
+    async def sleep(seconds):
+        clock[0] += seconds
+
+    monkeypatch.setattr(llm_client.asyncio, "sleep", sleep)
+    policy = RetryPolicy(max_retries=4, base_delay=0.5, deadline=30)
+    attempt, calls = failing(clock, 20, [timeout_error()] * 5)
+
+    async def async_attempt():
+        return attempt()
+
+    with pytest.raises(openai.APITimeoutError):
+        asyncio.run(policy.acall(async_attempt))
+    assert len(calls) == 1 and policy.deadline_exceeded == 1
@@ -0,0 +1,29 @@
+import pytest
+
+from llm_replay import parse_latency
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("none", 0.0),
+        ("recorded", 1.5),
+        ("fixed:250", 0.25),
+        ("uniform:100,100", 0.1),
+        ("normal:300,0", 0.3),
+        ("lognormal:2000,0", 2.0),
+    ],
+)
+def test_latency_specs_are_in_milliseconds(spec, expected):
+    assert parse_latency(spec, seed=0)(1.5) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("spec", ["fixed", "fixed:1,2", "uniform:100", "normal:", "lognormal:2000", "none:5"])
+def test_missing_or_extra_values_fail_when_parsed(spec):
+    with pytest.raises(ValueError):
+        parse_latency(spec)
+
+
+def test_unknown_distribution():
+    with pytest.raises(ValueError, match="Unknown latency distribution"):
+        parse_latency("poisson:3")
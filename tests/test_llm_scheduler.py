@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+import llm_scheduler
+from llm_scheduler import BULK, INTERACTIVE, LLMScheduler, SchedulerTimeout, TokenBucket, priority
+
+
+def test_refund_never_fills_past_capacity():
+    scheduler = LLMScheduler(tokens_per_minute=10_000)
+    scheduler.acquire_sync(1_000)
+    # Real usage far below the estimate: the refund stops at a full bucket
+    scheduler.settle(5_000, 200)
+    assert scheduler.tokens.level == scheduler.tokens.capacity
+
+
+def test_settle_charges_usage_above_estimate():
+    scheduler = LLMScheduler(tokens_per_minute=10_000)
+    scheduler.acquire_sync(1_000)
+    scheduler.settle(1_000, 3_000)
+    assert 7_000 <= scheduler.tokens.level < 7_100
+
+
+def test_unlimited_bucket_ignores_takes():
+    bucket = TokenBucket(0)
+    bucket.take(-500)
+    bucket.take(10**9)
+    assert bucket.unlimited and bucket.seconds_until(10**9) == 0.0
+
+
+def drained(requests_per_minute: float, **kwargs) -> LLMScheduler:
+    scheduler = LLMScheduler(requests_per_minute=requests_per_minute, **kwargs)
+    scheduler.requests.level = 0
+    return scheduler
+
+
+def test_interactive_calls_pass_queued_bulk_calls():
+    # 10 requests/s once the bucket is empty: calls are admitted one by one
+    scheduler = drained(600)
+    admitted = []
+
+    async def call(name, level):
+        with priority(level):
+            await scheduler.acquire(1)
+        admitted.append(name)
+
+    async def main():
+        bulk = [asyncio.create_task(call(f"bulk-{index}", BULK)) for index in range(3)]
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(call("interactive", INTERACTIVE))
+        await asyncio.gather(*bulk, interactive)
+
+    asyncio.run(main())
+    assert admitted[0] == "interactive"
+    assert admitted[1:] == ["bulk-0", "bulk-1", "bulk-2"]
+
+
+def test_queue_wait_is_recorded_by_priority():
+    scheduler = drained(600)
+    asyncio.run(scheduler.acquire(1, level=BULK))
+    scheduler.acquire_sync(1, level=INTERACTIVE)
+
+    stats = scheduler.stats()
+    assert stats["admitted"] == 2 and stats["queue_depth"] == 0
+    assert stats["wait"]["bulk"]["count"] == 1 and stats["wait"]["bulk"]["max_ms"] >= 50
+    assert stats["wait"]["interactive"]["count"] == 1 and stats["wait"]["interactive"]["max_ms"] >= 50
+
+
+@pytest.mark.parametrize("use_async", [True, False])
+def test_scheduler_timeout_leaves_the_queue(use_async):
+    scheduler = drained(6, max_wait=0.1)
+    with pytest.raises(SchedulerTimeout):
+        if use_async:
+            asyncio.run(scheduler.acquire(1))
+        else:
+            scheduler.acquire_sync(1)
+
+    stats = scheduler.stats()
+    assert stats["timeouts"] == 1 and stats["queue_depth"] == 0 and stats["admitted"] == 0
+
+
+def test_account_limits_are_shared_between_workers(monkeypatch):
+    monkeypatch.setenv("LLM_RPM", "600")
+    monkeypatch.setenv("LLM_TPM", "90000")
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setattr(llm_scheduler, "_default_scheduler", None)
+
+    scheduler = llm_scheduler.get_scheduler()
+    assert (scheduler.requests.per_minute, scheduler.tokens.per_minute) == (200, 30000)
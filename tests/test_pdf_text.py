@@ -0,0 +1,64 @@
+import asyncio
+import io
+import time
+
+import PyPDF2
+
+from pdf_text import PdfTextExtractor
+
+
+def blank_pdf(pages: int) -> bytes:
+    writer = PyPDF2.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def slow_pages(monkeypatch, seconds: float) -> None:
+    def extract_text(self, *args, **kwargs):
+        time.sleep(seconds)
+        return "page text "
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", extract_text)
+
+
+def test_extracts_all_pages_within_budget():
+    extractor = PdfTextExtractor(parallel_min_pages=100)
+    try:
+        result = asyncio.run(extractor.extract(blank_pdf(3)))
+    finally:
+        extractor.shutdown()
+
+    assert (result.page_count, result.pages_extracted, result.mode) == (3, 3, "thread")
+    assert not result.truncated and result.timed_out_pages == []
+
+
+def test_worker_skips_pages_once_budget_spent(monkeypatch):
+    slow_pages(monkeypatch, 0.3)
+    extractor = PdfTextExtractor(page_timeout=0.2, parallel_min_pages=100)
+    try:
+        result = asyncio.run(extractor.extract(blank_pdf(4)))
+    finally:
+        extractor.shutdown()
+
+    # 4 pages x 0.2s = 0.8s budget: the 4th page would start at 0.9s, so the worker returns without it
+    assert result.pages_extracted == 3
+    assert result.timed_out_pages == [3]
+
+
+def test_hung_page_kills_process_worker(monkeypatch):
+    # Patched before the pool forks, so the workers hang too
+    slow_pages(monkeypatch, 30)
+    extractor = PdfTextExtractor(page_timeout=0.2, parallel_min_pages=2, process_workers=2)
+    try:
+        started = time.perf_counter()
+        result = asyncio.run(extractor.extract(blank_pdf(2)))
+        elapsed = time.perf_counter() - started
+        assert elapsed < 5
+        assert result.pages_extracted == 0 and result.timed_out_pages == [0, 1]
+        # The hung pool was dropped; the next document gets a fresh one
+        assert extractor._processes is None
+    finally:
+        extractor.shutdown()
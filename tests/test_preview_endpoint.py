@@ -0,0 +1,108 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import backend
+import render_queue
+from artifact_store import ArtifactStore
+from render_queue import DONE, FAILED, RenderQueue
+
+from test_render_queue import fake_worker
+
+ANALYSIS_ID = "analysis-preview"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_queue, "_render_worker", fake_worker)
+    queue = RenderQueue(max_workers=1, max_pending=4, artifact_store=ArtifactStore(str(tmp_path / "artifacts")))
+    monkeypatch.setattr(backend, "render_queue", queue)
+    monkeypatch.setattr(backend, "artifact_store", queue.artifact_store)
+    monkeypatch.setattr(backend, "preview_store", ArtifactStore(str(tmp_path / "previews"), suffix=".png"))
+    monkeypatch.setattr(backend, "PREVIEW_RENDER_LIMIT", 2)
+    yield TestClient(backend.app)
+    queue.shutdown()
+    backend.sessions.pop(ANALYSIS_ID, None)
+
+
+def start_analysis(cv_data):
+    backend.sessions[ANALYSIS_ID] = {"optimized_cv": cv_data}
+
+
+def preview(client):
+    return client.get(f"/api/template-preview/template1?analysis_id={ANALYSIS_ID}")
+
+
+def wait_finished(job_id, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = backend.render_queue.get(job_id)
+        if job.status in (DONE, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_failed_render_is_resubmitted_within_the_budget(client):
+    start_analysis({"fail": True})
+
+    first = preview(client)
+    assert first.status_code == 202
+    assert wait_finished(first.json()["job_id"]).status == FAILED
+
+    # The failed job does not pin the preview to a 500: a new render starts
+    second = preview(client)
+    assert second.status_code == 202 and second.json()["job_id"] != first.json()["job_id"]
+    wait_finished(second.json()["job_id"])
+
+    # Budget spent: the failure is reported as a rate limit, with a time to come back
+    third = preview(client)
+    assert third.status_code == 429 and "conversion failed" in third.json()["detail"]
+    assert int(third.headers["retry-after"]) > 0
+
+
+def test_pdf_evicted_before_rasterization_is_rendered_again(client, monkeypatch):
+    start_analysis({"name": "a"})
+    job = wait_finished(preview(client).json()["job_id"])
+    assert job.status == DONE
+
+    def evicted(key, pdf_path, size):
+        # Eviction between artifact_store.get() and the read in the worker thread
+        pdf_path.unlink()
+        return pdf_path.read_bytes()
+
+    monkeypatch.setattr(backend, "build_preview", evicted)
+    response = preview(client)
+    assert response.status_code == 202 and response.json()["job_id"] != job.job_id
+
+
+def test_pdf_too_large_for_the_cache_is_served_from_memory(client, monkeypatch):
+    monkeypatch.setattr(backend.artifact_store, "max_bytes", 5)
+    monkeypatch.setattr(backend, "rasterize_first_page", lambda pdf_bytes, size: b"PNG " + pdf_bytes)
+    start_analysis({"name": "a"})
+    job = wait_finished(preview(client).json()["job_id"])
+    assert job.status == DONE and job.pdf_path is None
+
+    download = client.get(f"/api/download-cv/{job.job_id}")
+    assert download.status_code == 200 and download.content == b"%PDF template1"
+    # Rasterized from the job's bytes instead of rendering again
+    response = preview(client)
+    assert response.status_code == 200 and response.content == b"PNG %PDF template1"
+
+
+def test_preview_renders_are_rate_limited_per_analysis(client):
+    start_analysis({"name": "a", "sleep": 0.5})
+    assert preview(client).status_code == 202
+    assert client.get(f"/api/template-preview/template2?analysis_id={ANALYSIS_ID}").status_code == 202
+
+    # The pending job is reused without counting against the budget
+    assert preview(client).status_code == 202
+
+    # A third template (or the same CV data, changed) would need a new render
+    session = backend.sessions[ANALYSIS_ID]
+    session["optimized_cv"] = {"name": "b"}
+    backend.sessions[ANALYSIS_ID] = session
+    limited = preview(client)
+    assert limited.status_code == 429 and "retry-after" in limited.headers
+    assert len(backend.sessions[ANALYSIS_ID]["render_job_ids"]) == 2
@@ -0,0 +1,134 @@
+import os
+import time
+
+import pytest
+
+import render_queue
+from artifact_store import ArtifactStore
+from render_queue import DONE, FAILED, RenderQueue, RenderQueueFull
+
+
+def fake_worker(cv_data, template_id, job_id):
+    """Stands in for DOCX render + PDF conversion in the worker process"""
+    if cv_data.get("fail") or template_id in cv_data.get("fail_templates", ()):
+        raise RuntimeError("conversion failed")
+    if cv_data.get("crash"):
+        # A worker killed by the OOM killer or a converter segfault
+        os._exit(1)
+    time.sleep(cv_data.get("sleep", 0))
+    started_at = time.time()
+    return {
+        "pdf_bytes": f"%PDF {template_id}".encode(),
+        "started_at": started_at,
+        "finished_at": time.time(),
+        "timings": {"render_template": 0.01, "convert_to_pdf": 0.2},
+        "converter": {"backend": "fake", "conversions": 1, "failures": 0, "pid": 1},
+    }
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    # Patched before the pool forks, so the workers run the fake too
+    monkeypatch.setattr(render_queue, "_render_worker", fake_worker)
+    queue = RenderQueue(max_workers=2, max_pending=2, artifact_store=ArtifactStore(str(tmp_path / "artifacts")))
+    yield queue
+    queue.shutdown()
+
+
+def wait_finished(queue, job_id, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.status in (DONE, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_lifecycle_and_artifact_reuse(queue):
+    job = queue.submit({"name": "a"}, "template1", "analysis-1", artifact_key="key-a")
+    assert job.current_status() in ("queued", "running")
+
+    job = wait_finished(queue, job.job_id)
+    assert job.status == DONE
+    assert open(job.pdf_path, "rb").read() == b"%PDF template1"
+    assert job.to_dict()["timings"]["total_seconds"] is not None
+
+    # Same artifact key: served from the store without a render
+    again = queue.submit({"name": "a"}, "template1", "analysis-1", artifact_key="key-a")
+    assert again.status == DONE and again.cached
+
+
+def test_job_without_artifact_store_keeps_bytes(queue):
+    queue.artifact_store = None
+    job = wait_finished(queue, queue.submit({"name": "b"}, "template2", "analysis-1").job_id)
+    assert job.pdf_bytes == b"%PDF template2"
+
+
+def test_pdf_larger_than_the_artifact_store_stays_in_memory(queue):
+    queue.artifact_store.max_bytes = 5
+    job = wait_finished(queue, queue.submit({"name": "g"}, "template1", "analysis-1", artifact_key="key-g").job_id)
+    assert job.status == DONE and job.pdf_path is None
+    assert job.pdf_bytes == b"%PDF template1" and queue.artifact_store.stats()["entries"] == 0
+
+
+def test_failed_job_reports_error(queue):
+    job = wait_finished(queue, queue.submit({"fail": True}, "template1", "analysis-1", artifact_key="key-f").job_id)
+    assert job.status == FAILED
+    assert "conversion failed" in job.error
+
+
+def test_record_visible_from_job_store(queue):
+    job = wait_finished(queue, queue.submit({"name": "c"}, "template1", "analysis-1", artifact_key="key-c").job_id)
+    # Another worker process only sees the shared record
+    queue._jobs.clear()
+    record = queue.get(job.job_id)
+    assert record.status == DONE and record.pdf_path == job.pdf_path
+    assert [found.job_id for found in queue.get_many([job.job_id, "unknown"])] == [job.job_id]
+
+
+def test_queue_full(queue):
+    queue.submit({"sleep": 1}, "template1", "analysis-1", artifact_key="slow-1")
+    queue.submit({"sleep": 1}, "template1", "analysis-1", artifact_key="slow-2")
+    with pytest.raises(RenderQueueFull):
+        queue.submit({"sleep": 1}, "template1", "analysis-1", artifact_key="slow-3")
+
+
+def test_worker_error_result_and_converter_stats(queue):
+    ok = wait_finished(queue, queue.submit({"name": "d"}, "template1", "analysis-1", artifact_key="key-d").job_id)
+    assert ok.status == DONE
+
+    # Workers return conversion errors as data so their converter stats still come back
+    queue._record_conversion({"error": "unoconvert failed", "timings": {"render_template": 0.01}, "converter": {"backend": "fake", "conversions": 1, "failures": 1, "pid": 1}})
+    converter = queue.stats()["converter"]
+    assert converter["backends"] == ["fake"]
+    assert (converter["conversions"], converter["failures"]) == (1, 1)
+    assert converter["latency_p50"] == 0.2
+
+
+def test_dead_worker_pool_is_replaced(queue, monkeypatch):
+    job = wait_finished(queue, queue.submit({"crash": True}, "template1", "analysis-1", artifact_key="key-crash").job_id)
+    # Retried once on a new pool, then reported
+    assert job.status == FAILED and job.attempts == 2
+    assert "terminated abruptly" in job.error
+
+    # Later renders get a working pool instead of BrokenProcessPool
+    job = wait_finished(queue, queue.submit({"name": "e"}, "template1", "analysis-1", artifact_key="key-e").job_id)
+    assert job.status == DONE
+    assert queue.stats()["pool_restarts"] >= 1
+
+
+def test_hung_job_times_out_and_others_are_resubmitted(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_queue, "_render_worker", fake_worker)
+    queue = RenderQueue(max_workers=1, max_pending=4, artifact_store=ArtifactStore(str(tmp_path / "artifacts")), job_timeout=0.5)
+    try:
+        hung = queue.submit({"sleep": 30}, "template1", "analysis-1", artifact_key="key-hung")
+        waiting = queue.submit({"name": "f"}, "template1", "analysis-1", artifact_key="key-f")
+
+        hung = wait_finished(queue, hung.job_id)
+        assert hung.status == FAILED and "timed out" in hung.error
+        # Queued behind the hung job in the killed pool: rendered on the new one
+        assert wait_finished(queue, waiting.job_id).status == DONE
+        assert queue.stats()["timeouts"] == 1
+    finally:
+        queue.shutdown()
@@ -0,0 +1,85 @@
+import json
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from response_parsing import (
+    ResponseParseError,
+    ResponseValidationError,
+    load_json,
+    merge_reask,
+    parse_model,
+    reask_messages,
+    repair_json,
+)
+
+
+class Analysis(BaseModel):
+    title: str
+    skills: List[str]
+    score: int
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ('Here you go:\n```json\n{"a": 1}\n```', {"a": 1}),
+        ('Sure! {"a": [1, 2,], "b": {"c": 3,},} Hope this helps.', {"a": [1, 2], "b": {"c": 3}}),
+        ('{"ok": True, "ko": False, "none": None}', {"ok": True, "ko": False, "none": None}),
+        ('{"text": "True, None, [1,]"}', {"text": "True, None, [1,]"}),
+        ("{“a”: 1}", {"a": 1}),
+    ],
+)
+def test_repair_json(raw, expected):
+    assert json.loads(repair_json(raw)) == expected
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ('{"a": [1, 2', {"a": [1, 2]}),
+        ('{"a": "cut sho', {"a": "cut sho"}),
+        ('{"a": 1, "b":', {"a": 1}),
+        ('{"a": {"b": [1, {"c": 2}', {"a": {"b": [1, {"c": 2}]}}),
+    ],
+)
+def test_repair_json_closes_truncated_output(raw, expected):
+    assert json.loads(repair_json(raw)) == expected
+
+
+def test_load_json_rejects_unrecoverable_and_non_objects():
+    with pytest.raises(ResponseParseError):
+        load_json("no json here")
+    with pytest.raises(ResponseParseError):
+        load_json("[1, 2]")
+
+
+def test_validation_error_lists_failed_fields():
+    with pytest.raises(ResponseValidationError) as excinfo:
+        parse_model('{"title": "Engineer", "skills": "Python", "score": "high"}', Analysis)
+
+    assert excinfo.value.failed_fields == ["score", "skills"]
+    assert excinfo.value.data["title"] == "Engineer"
+
+
+def test_reask_merges_only_failed_fields():
+    with pytest.raises(ResponseValidationError) as excinfo:
+        parse_model('{"title": "Engineer", "skills": ["Python"], "score": "high"}', Analysis)
+    error = excinfo.value
+
+    messages = reask_messages([{"role": "user", "content": "analyze"}], "first answer", error)
+    assert messages[-2] == {"role": "assistant", "content": "first answer"}
+    assert "score" in messages[-1]["content"]
+
+    # The re-asked answer may carry other fields: only the failed ones are taken
+    result = merge_reask(error, '{"score": 80, "title": "Ignored"}', Analysis)
+    assert result == Analysis(title="Engineer", skills=["Python"], score=80)
+
+
+def test_reask_still_invalid_raises():
+    with pytest.raises(ResponseValidationError) as excinfo:
+        parse_model('{"title": "Engineer", "skills": ["Python"]}', Analysis)
+
+    with pytest.raises(ResponseValidationError):
+        merge_reask(excinfo.value, '{"score": "still not a number"}', Analysis)
@@ -0,0 +1,101 @@
+import secrets
+
+import pytest
+
+import session_store
+from session_store import BoundedStore, SQLiteStore, StoreValueTooLarge, decode_value, encode_value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: now[0])
+    return now
+
+
+def test_bounded_store_evicts_least_recently_used_by_bytes():
+    evicted = []
+    store = BoundedStore("t", max_bytes=300, ttl_seconds=None, sizeof=lambda value: 100,
+                         on_evict=lambda key, value: evicted.append(key))
+    store["a"], store["b"], store["c"] = 1, 2, 3
+    store["a"]  # touch: "b" is now the oldest
+    store["d"] = 4
+
+    assert evicted == ["b"]
+    assert set(store) == {"a", "c", "d"}
+    assert store.stats()["bytes"] == 300 and store.evictions == 1
+
+
+def test_bounded_store_evicts_by_entry_count():
+    store = BoundedStore("t", max_entries=2, ttl_seconds=None)
+    store["a"], store["b"], store["c"] = 1, 2, 3
+    assert list(store) == ["b", "c"]
+
+
+def test_bounded_store_recounts_replaced_value():
+    store = BoundedStore("t", max_bytes=1000, ttl_seconds=None, sizeof=len)
+    store["a"] = "x" * 600
+    store["a"] = "x" * 100
+    store["b"] = "x" * 800
+    assert set(store) == {"a", "b"} and store.stats()["bytes"] == 900
+
+
+def test_bounded_store_expires_idle_entries(clock):
+    evicted = []
+    store = BoundedStore("t", ttl_seconds=60, on_evict=lambda key, value: evicted.append(key))
+    store["a"], store["b"] = 1, 2
+    clock[0] += 45
+    store["a"]
+    clock[0] += 30
+
+    assert "b" not in store
+    assert store.get("a") == 1
+    assert evicted == ["b"] and store.expirations == 1
+
+
+def test_sqlite_store_round_trip_and_ttl(tmp_path, clock):
+    store = SQLiteStore("uploads", path=str(tmp_path / "s.sqlite3"), ttl_seconds=60)
+    store["cv"] = {"text": "é" * 2000, "pdf": b"%PDF-1.4", "pages": [1, 2]}
+
+    assert store["cv"] == {"text": "é" * 2000, "pdf": b"%PDF-1.4", "pages": [1, 2]}
+    clock[0] += 61
+    assert "cv" not in store
+    assert store.get("cv") is None and store.expirations == 1
+
+
+def test_sqlite_store_evicts_oldest_over_max_bytes(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(session_store, "MAINTENANCE_EVERY", 1)
+    evicted = []
+    store = SQLiteStore("uploads", path=str(tmp_path / "s.sqlite3"), max_bytes=250, ttl_seconds=None,
+                        on_evict=lambda key, value: evicted.append(key))
+    for key in "abc":
+        clock[0] += 1
+        store[key] = "x" * 100
+
+    assert evicted == ["a"]
+    assert sorted(store) == ["b", "c"] and store.evictions == 1
+
+
+def test_encode_value_compresses_large_values():
+    small, large = {"a": 1}, {"text": "lorem ipsum " * 200}
+    assert encode_value(small)[:1] == b"j" and encode_value(large)[:1] == b"z"
+    assert decode_value(encode_value(large)) == large
+
+
+def test_bounded_store_rejects_value_larger_than_the_store():
+    store = BoundedStore("t", max_bytes=300, ttl_seconds=None, sizeof=len)
+    store["a"] = "x" * 100
+
+    with pytest.raises(StoreValueTooLarge):
+        store["a"] = "x" * 301
+    # Rejected before anything is evicted or replaced
+    assert store["a"] == "x" * 100 and store.evictions == 0
+
+
+def test_sqlite_store_rejects_value_larger_than_the_store(tmp_path):
+    store = SQLiteStore("uploads", path=str(tmp_path / "s.sqlite3"), max_bytes=250, ttl_seconds=None)
+    store["a"] = "x" * 10
+
+    with pytest.raises(StoreValueTooLarge):
+        store["b"] = secrets.token_hex(1000)
+    assert sorted(store) == ["a"] and store.evictions == 0
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from skill_matcher import SkillMatcher, normalize_text
+
+CV_TEXT = """
+Senior data engineer. 6 ans d'expérience en Python, PySpark et SQL (PostgreSQL).
+Pipelines sur Azure Databricks, orchestration Apache Airflow, conteneurisation Docker.
+Mentorat d'une équipe de 4 développeurs. CI/CD avec GitHub Actions.
+"""
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return SkillMatcher()
+
+
+@pytest.mark.parametrize(
+    "skill, expected",
+    [
+        ("Python", "must_have_present"),
+        ("Spark", "must_have_present"),  # PySpark is an alias
+        ("Postgres", "must_have_present"),
+        ("CI/CD pipelines", "must_have_present"),
+        ("Kubernetes", "must_have_absent"),
+    ],
+)
+def test_classification(matcher, skill, expected):
+    result = matcher.match(CV_TEXT, [skill])
+    assert getattr(result, expected) == [skill]
+
+
+def test_partial_and_unknown_skills_are_uncertain(matcher):
+    result = matcher.match(CV_TEXT, ["Python and Java", "Senior engineering"], ["Team leadership"])
+
+    # One of two known skills, and an unknown phrase sharing a word with the CV
+    assert result.must_have_uncertain == ["Python and Java", "Senior engineering"]
+    # Unknown phrase with no word in the CV
+    assert result.nice_to_have_absent == ["Team leadership"]
+    assert result.coverage() == 0 and not result.required_decided
+
+
+def test_match_counts_and_coverage(matcher):
+    result = matcher.match(CV_TEXT, ["Python", "Docker", "Terraform"], ["Airflow"])
+    assert result.must_have_present == ["Python", "Docker"]
+    assert result.must_have_absent == ["Terraform"]
+    assert result.nice_to_have_present == ["Airflow"]
+    assert result.coverage() == 67 and result.required_decided and not result.all_required_present
+
+
+@pytest.mark.parametrize(
+    "cv_text, skill",
+    [
+        ("Contributed a py-spy profiling guide.", "Python"),
+        ("Spring 2021: internship in Lyon.", "Spring Boot"),
+        ("Led the node migration of our network.", "Node.js"),
+        ("Shipped 40 containers of goods per week.", "Docker"),
+        ("Textile fabric quality control.", "Microsoft Fabric"),
+        ("Dosage in ml for lab samples.", "Machine learning"),
+    ],
+)
+def test_ambiguous_words_do_not_count_as_skills(matcher, cv_text, skill):
+    assert skill not in matcher.match(cv_text, [skill]).must_have_present
+
+
+@pytest.mark.parametrize(
+    "cv_text, skill",
+    [
+        ("Création d'un tableau de bord des ventes sous Excel.", "Tableau"),
+        ("Swift onboarding of new hires.", "Swift"),
+        ("Removed rust from industrial equipment.", "Rust"),
+        ("Brought a spark of creativity to the team.", "Spark"),
+        ("Agile mind, quick learner.", "Agile"),
+        ("Maintenance of railway rails.", "Ruby"),
+    ],
+)
+def test_everyday_words_make_skills_uncertain_not_present(matcher, cv_text, skill):
+    # Left to the gap-analysis model, which reads the context
+    assert matcher.match(cv_text, [skill]).must_have_uncertain == [skill]
+
+
+def test_qualified_names_of_ambiguous_skills_are_present(matcher):
+    cv_text = "Dashboards in Tableau, PySpark jobs, Apache Spark tuning and Ruby on Rails APIs."
+    result = matcher.match(cv_text, ["Spark", "Ruby"], ["Tableau"])
+    assert result.must_have_present == ["Spark", "Ruby"]
+    assert result.nice_to_have_uncertain == ["Tableau"]
+
+
+def test_node_js_does_not_count_as_javascript(matcher):
+    assert matcher.match("Backend services in Node.js", ["JavaScript"]).must_have_absent == ["JavaScript"]
+    assert matcher.match("React and JS tooling", ["JavaScript"]).must_have_present == ["JavaScript"]
+
+
+def test_word_boundaries(matcher):
+    assert matcher.match("Expert C++ developer", ["C"]).must_have_present == []
+    assert matcher.match("JavaScript and TypeScript", ["Java"]).must_have_absent == ["Java"]
+
+
+def test_skill_terms_cache_is_per_instance():
+    first, second = SkillMatcher(), SkillMatcher({"python": ["python"]})
+    first.match(CV_TEXT, ["Kubernetes"])
+    assert "Kubernetes" in first._terms_cache and not second._terms_cache
+    assert second.match(CV_TEXT, ["Kubernetes"]).must_have_absent == ["Kubernetes"]
+
+
+def test_normalize_text_strips_accents_and_trailing_punctuation():
+    assert normalize_text("Expérience: Python.") == " experience python "
+
+
+def test_optimizer_matches_skills_on_full_text(monkeypatch):
+    from agent import CVOptimizer, JobAnalysis
+
+    optimizer = CVOptimizer()
+    seen = []
+
+    async def analyze_gaps(profile_analysis, skill_match=None):
+        seen.append(skill_match)
+        return True, None
+
+    monkeypatch.setattr(optimizer.async_gap_analyzer, "analyze_gaps", analyze_gaps)
+    job = JobAnalysis(
+        job_title="Data engineer", must_have_skills=["Python", "Airflow"], nice_to_have_skills=[],
+        company_type="", work_environment=[], ats_keywords=[], tone_of_voice="", key_responsibilities=[],
+        company_culture_indicators=[], technical_domains=[], urgency_level="", remote_work_policy="",
+    )
+    # Airflow only appears in the part trimmed from the prompt text
+    asyncio.run(optimizer.analyze_gaps(None, "Python developer", job, match_text=CV_TEXT))
+    asyncio.run(optimizer.analyze_gaps(None, "Python developer", job))
+
+    assert seen[0].must_have_present == ["Python", "Airflow"]
+    assert seen[1].must_have_absent == ["Airflow"]
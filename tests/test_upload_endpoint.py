@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import backend
+from benchmarks.sample_pdf import make_pdf
+from session_store import BoundedStore
+
+CV_PDF = make_pdf(["Martin Dupont", "Data engineer", "Python, SQL, Docker"])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(backend, "cv_contents", BoundedStore("cv_contents", ttl_seconds=None))
+    monkeypatch.setattr(backend, "uploaded_files", BoundedStore("uploaded_files", ttl_seconds=None))
+    monkeypatch.setattr(backend, "upload_dedup_stats", {"hits": 0, "misses": 0})
+    return TestClient(backend.app)
+
+
+def upload(client, pdf=CV_PDF):
+    return client.post("/api/upload-cv", files={"cv_file": ("cv.pdf", pdf, "application/pdf")})
+
+
+def test_same_file_is_extracted_once(client, monkeypatch):
+    extracted = []
+    extract = backend.extract_text_from_pdf
+
+    async def counting_extract(content):
+        extracted.append(content)
+        return await extract(content)
+
+    monkeypatch.setattr(backend, "extract_text_from_pdf", counting_extract)
+    first, second = upload(client).json(), upload(client).json()
+    other = upload(client, make_pdf(["Jeanne Martin", "Product manager"])).json()
+
+    assert len(extracted) == 2 and len(backend.cv_contents) == 2
+    # Each upload keeps its own cv_id, sharing the extracted text
+    assert len({first["cv_id"], second["cv_id"], other["cv_id"]}) == 3
+    assert backend.get_cv_text(first["cv_id"]) == backend.get_cv_text(second["cv_id"])
+    assert second["extraction"] == first["extraction"]
+    dedup = client.get("/api/debug/stores").json()["upload_dedup"]
+    assert dedup == {"hits": 1, "misses": 2, "hit_rate": 0.3333}
+
+
+def test_cv_larger_than_the_content_store_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(backend, "cv_contents", BoundedStore("cv_contents", max_bytes=100, ttl_seconds=None))
+
+    response = upload(client)
+    # Not accepted and then evicted at once, which gave "CV not found" on the analysis
+    assert response.status_code == 413 and "CV_CONTENT_STORE_MAX_BYTES" in response.json()["detail"]
+    assert len(backend.cv_contents) == 0 and len(backend.uploaded_files) == 0